@@ -0,0 +1,52 @@
+"""
+Mixins comunes para las vistas de la API REST de EcoPrenda.
+"""
+
+import hashlib
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from ..models import VersionTabla
+from ..serializers import optimizar_queryset
+
+
+class AutoPrefetchMixin:
+    """
+    Agrega al queryset de la vista los select_related/prefetch_related que
+    necesita su serializer, calculados a partir de los campos declarados.
+
+    Se aplica en `filter_queryset`, así cubre tanto `list()` como
+    `get_object()` aunque la vista sobrescriba `get_queryset`. Usa el
+    serializer con el contexto de la petición, así respeta `?fields=` y
+    `?expand=`.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return optimizar_queryset(queryset, self.get_serializer())
+
+
+def get_condicional_por_version(*modelos):
+    """
+    Decorador para métodos GET de ViewSets: responde con un ETag calculado a
+    partir de VersionTabla de `modelos` (las tablas que aparecen en la
+    respuesta). Si el cliente envía un If-None-Match vigente se devuelve 304
+    sin ejecutar la vista.
+
+    No se envía Last-Modified: su resolución es de un segundo, así que una
+    escritura en el mismo segundo que la respuesta anterior daría un 304 con
+    datos viejos. Sin él, If-Modified-Since se ignora.
+
+    El ETag incluye la ruta completa (filtros, cursor, ?fields=) y el
+    Accept, porque cada combinación es una representación distinta.
+    """
+    tablas = tuple(sorted(m._meta.db_table for m in modelos))
+
+    def etag(request, *args, **kwargs):
+        actuales = VersionTabla.obtener(tablas)
+        sello = '|'.join(f'{t}:{actuales.get(t, (0, None))[0]}' for t in tablas)
+        variante = f'{sello}|{request.get_full_path()}|{request.META.get("HTTP_ACCEPT", "")}'
+        return hashlib.md5(variante.encode()).hexdigest()
+
+    return method_decorator(condition(etag_func=etag))
@@ -0,0 +1,66 @@
+"""
+Paginación común para la API REST de EcoPrenda.
+Define la paginación por cursor usada por todos los endpoints de listado.
+"""
+
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from ..serializers import optimizar_queryset
+
+
+class EcoPrendaCursorPagination(CursorPagination):
+    """
+    Paginación por cursor para todos los listados de la API.
+
+    El cursor evita los OFFSET costosos en tablas grandes y mantiene las
+    páginas estables aunque se inserten filas nuevas entre peticiones.
+    El orden por defecto es '-pk'; una vista puede definir `cursor_ordering`
+    para usar otro campo único e inmutable.
+
+    Parámetros de consulta:
+        cursor: Cursor opaco devuelto en 'next'/'previous'
+        page_size: Tamaño de página (máximo `max_page_size`)
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-pk'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+
+class PaginacionAccionesMixin:
+    """
+    Mixin para ViewSets y vistas genéricas: pagina también las acciones
+    personalizadas (@action) que devuelven listados y no pasan por `list()`.
+    """
+
+    def respuesta_paginada(self, queryset, serializer_class=None):
+        """Serializa `queryset` paginado con el paginador de la vista."""
+        serializer_class = serializer_class or self.get_serializer_class()
+        contexto = self.get_serializer_context()
+        queryset = optimizar_queryset(queryset, serializer_class(context=contexto))
+        pagina = self.paginate_queryset(queryset)
+        if pagina is not None:
+            serializer = serializer_class(pagina, many=True, context=contexto)
+            return self.get_paginated_response(serializer.data)
+        serializer = serializer_class(queryset, many=True, context=contexto)
+        return Response(serializer.data)
+
+
+def paginar_respuesta(request, queryset, serializer_class, paginador_class=EcoPrendaCursorPagination):
+    """
+    Pagina un listado desde una vista de función (@api_view) o un APIView
+    simple, que no tienen `paginate_queryset` propio.
+    """
+    paginador = paginador_class()
+    contexto = {'request': request}
+    queryset = optimizar_queryset(queryset, serializer_class(context=contexto))
+    pagina = paginador.paginate_queryset(queryset, request)
+    serializer = serializer_class(pagina, many=True, context=contexto)
+    return paginador.get_paginated_response(serializer.data)
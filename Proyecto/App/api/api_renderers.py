@@ -0,0 +1,66 @@
+"""
+Renderer y parser JSON rápidos para la API REST de EcoPrenda.
+
+Usan orjson cuando está instalado y, si no, delegan en las clases JSON de
+DRF (módulo json de la biblioteca estándar), así la API funciona igual en
+entornos sin la dependencia.
+"""
+
+import decimal
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+_encoder_drf = JSONEncoder()
+
+
+def serializar_por_defecto(obj):
+    """
+    Tipos que orjson no serializa de forma nativa, con la misma salida que DRF.
+    Los DecimalField (carbono_evitar_kg, costo_envio) ya llegan como texto
+    desde el serializer; un Decimal suelto (p. ej. un Sum en un dict) se
+    emite como número, igual que el encoder de DRF. Lazy strings, QuerySet,
+    generadores, etc. también pasan por el encoder de DRF.
+    """
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    return _encoder_drf.default(obj)
+
+
+class EcoPrendaJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer sobre orjson. Respeta la indentación pedida en el Accept
+    (orjson solo admite 2 espacios) y, sin orjson, se comporta como el de DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        opciones = orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            opciones |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=serializar_por_defecto, option=opciones)
+
+
+class EcoPrendaJSONParser(JSONParser):
+    """JSONParser sobre orjson, con el de DRF como respaldo."""
+    renderer_class = EcoPrendaJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
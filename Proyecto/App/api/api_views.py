@@ -2,29 +2,60 @@ from rest_framework import viewsets, status, generics
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, F, Window
+from django.db.models.functions import RowNumber
+from django.db import transaction
 from django.utils import timezone
 import logging
 
 from ..models import (
     Usuario, Prenda, Transaccion, TipoTransaccion,
-    Fundacion, Mensaje, ImpactoAmbiental, Logro, UsuarioLogro, CampanaFundacion
+    Fundacion, Mensaje, ImpactoAmbiental, Logro, UsuarioLogro, CampanaFundacion, VersionTabla
 )
 from ..serializers import (
     UsuarioSerializer, PrendaSerializer, TransaccionSerializer,
     TipoTransaccionSerializer, FundacionSerializer, MensajeSerializer,
     ImpactoAmbientalSerializer, EstadisticasSerializer, ImpactoTotalSerializer,
     LogroSerializer, UsuarioLogroSerializer, CampanaFundacionSerializer,
-    PrendaSimpleSerializer,
+    PrendaSimpleSerializer, optimizar_queryset,
 )
 from ..clarifai_utils import analizar_imagen_completa
+from ..carbon_utils import calcular_impacto_prenda
+from ..busqueda import buscar_prendas_texto
+from ..subidas import programar_subidas_desde_url
+from .api_pagination import PaginacionAccionesMixin, paginar_respuesta
+from .api_mixins import AutoPrefetchMixin, get_condicional_por_version
+from ..cache_utils import cache_corto, clave_cache
+from ..fragmentos import invalidar_fragmentos
+from ..transiciones import TransicionInvalida, cambiar_estado
+from ..views.auth import get_usuario_actual
+
+logger = logging.getLogger(__name__)
+
+# Máximo de prendas por petición en /api/prendas/bulk/
+PRENDAS_BULK_MAX = 100
+
+# Resultados de /api/prendas/buscar/
+BUSQUEDA_LIMITE = 20
+BUSQUEDA_LIMITE_MAX = 100
+
+# Transacciones recientes por tipo que devuelve /api/transacciones/por_tipo/
+MUESTRA_POR_TIPO = 5
+MUESTRA_POR_TIPO_MAX = 20
+
+
+def conteo_transacciones_por_tipo():
+    """Total de transacciones de cada tipo (incluye tipos sin transacciones) en una consulta."""
+    return TipoTransaccion.objects.annotate(
+        total=Count('transaccion')
+    ).values('id', 'nombre_tipo', 'total').order_by('id')
 
 # Funciones basadas en vistas
 
 @api_view(['GET', 'POST'])
 def prenda_list(request):
     """
-    GET: Lista todas las prendas con filtros opcionales por categoria, talla, estado.
+    GET: Lista paginada de prendas con filtros opcionales por categoria, talla, estado.
     POST: Crea una nueva prenda.
     """
     if request.method == 'GET':
@@ -42,8 +73,7 @@ def prenda_list(request):
         if estado:
             prendas = prendas.filter(estado=estado)
         
-        serializer = PrendaSerializer(prendas, many=True)
-        return Response(serializer.data)
+        return paginar_respuesta(request, prendas, PrendaSerializer)
     
     elif request.method == 'POST':
         serializer = PrendaSerializer(data=request.data)
@@ -60,13 +90,14 @@ def prenda_detail(request, pk):
     PUT: Actualiza una prenda.
     DELETE: Elimina una prenda.
     """
+    contexto = {'request': request}
     try:
-        prenda = Prenda.objects.get(pk=pk)
+        prenda = optimizar_queryset(Prenda.objects.all(), PrendaSerializer(context=contexto)).get(pk=pk)
     except Prenda.DoesNotExist:
         return Response({'error': 'Prenda no encontrada'}, status=status.HTTP_404_NOT_FOUND)
     
     if request.method == 'GET':
-        serializer = PrendaSerializer(prenda)
+        serializer = PrendaSerializer(prenda, context=contexto)
         return Response(serializer.data)
     
     elif request.method == 'PUT':
@@ -85,14 +116,13 @@ def prenda_detail(request, pk):
 
 class UsuarioListAPIView(APIView):
     """
-    GET: Lista todos los usuarios.
+    GET: Lista paginada de usuarios.
     POST: Crea un nuevo usuario.
     """
     
     def get(self, request):
         usuarios = Usuario.objects.all()
-        serializer = UsuarioSerializer(usuarios, many=True)
-        return Response(serializer.data)
+        return paginar_respuesta(request, usuarios, UsuarioSerializer)
     
     def post(self, request):
         serializer = UsuarioSerializer(data=request.data)
@@ -142,26 +172,26 @@ class UsuarioDetailAPIView(APIView):
 
 # Vistas basadas en genéricos (generics)
 
-class TransaccionListCreateAPIView(generics.ListCreateAPIView):
+class TransaccionListCreateAPIView(AutoPrefetchMixin, generics.ListCreateAPIView):
     """Lista y crea transacciones."""
     queryset = Transaccion.objects.all()
     serializer_class = TransaccionSerializer
 
 
-class TransaccionDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class TransaccionDetailAPIView(AutoPrefetchMixin, generics.RetrieveUpdateDestroyAPIView):
     """Obtiene, actualiza y elimina transacciones."""
     queryset = Transaccion.objects.all()
     serializer_class = TransaccionSerializer
     lookup_field = 'pk'
 
 
-class FundacionListCreateAPIView(generics.ListCreateAPIView):
+class FundacionListCreateAPIView(AutoPrefetchMixin, generics.ListCreateAPIView):
     """Lista y crea fundaciones."""
     queryset = Fundacion.objects.all()
     serializer_class = FundacionSerializer
 
 
-class FundacionDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class FundacionDetailAPIView(AutoPrefetchMixin, generics.RetrieveUpdateDestroyAPIView):
     """Obtiene, actualiza y elimina fundaciones."""
     queryset = Fundacion.objects.all()
     serializer_class = FundacionSerializer
@@ -170,7 +200,7 @@ class FundacionDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 
 # Conjuntos de vistas (ViewSets)
 
-class PrendaViewSet(viewsets.ModelViewSet):
+class PrendaViewSet(AutoPrefetchMixin, PaginacionAccionesMixin, viewsets.ModelViewSet):
     """ViewSet para Prendas - CRUD completo"""
     queryset = Prenda.objects.all()
     serializer_class = PrendaSerializer
@@ -187,6 +217,169 @@ class PrendaViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(user=usuario)
         
         return queryset
+
+    @get_condicional_por_version(Prenda, Usuario, Fundacion, ImpactoAmbiental)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['post', 'patch'])
+    def bulk(self, request):
+        """
+        Alta (POST) o actualización parcial (PATCH) de varias prendas.
+
+        Requiere sesión iniciada (401 si no).
+
+        POST: lista de prendas como en /api/prendas/. Se validan todas, las
+        válidas se insertan con bulk_create junto a su ImpactoAmbiental y las
+        que traen imagen_prenda (URL) se encolan como subidas (subidas.py).
+        El dueño es siempre el usuario de la sesión: se ignora 'user'.
+        PATCH: lista de objetos con id_prenda y los campos a cambiar. Solo
+        se modifican prendas del usuario de la sesión; 'user' no se puede cambiar.
+
+        Responde con un resultado por elemento, en el mismo orden:
+        201/200 si todos son válidos, 207 si hay mezcla, 400 si ninguno.
+        """
+        usuario = get_usuario_actual(request)
+        if usuario is None:
+            return Response({'error': 'Debes iniciar sesión'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        elementos = request.data
+        if not isinstance(elementos, list) or not elementos:
+            return Response({'error': 'Se espera una lista de prendas'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(elementos) > PRENDAS_BULK_MAX:
+            return Response(
+                {'error': f'Máximo {PRENDAS_BULK_MAX} prendas por petición'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not all(isinstance(e, dict) for e in elementos):
+            return Response({'error': 'Cada elemento debe ser un objeto'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            resultados, validos = self._bulk_crear(usuario, elementos)
+            codigo_ok = status.HTTP_201_CREATED
+        else:
+            resultados, validos = self._bulk_actualizar(usuario, elementos)
+            codigo_ok = status.HTTP_200_OK
+
+        if validos == len(elementos):
+            codigo = codigo_ok
+        elif validos:
+            codigo = status.HTTP_207_MULTI_STATUS
+        else:
+            codigo = status.HTTP_400_BAD_REQUEST
+        return Response({'validos': validos, 'errores': len(elementos) - validos, 'resultados': resultados}, status=codigo)
+
+    def _contexto_bulk(self, usuario):
+        """Contexto con el usuario de la sesión ya cargado (el único dueño posible)."""
+        contexto = self.get_serializer_context()
+        contexto['precargados'] = {Usuario: {usuario.pk: usuario}}
+        return contexto
+
+    def _bulk_crear(self, usuario, elementos):
+        contexto = self._contexto_bulk(usuario)
+        resultados, nuevas = [], []
+        for indice, elemento in enumerate(elementos):
+            serializer = PrendaSerializer(data={**elemento, 'user': usuario.pk}, context=contexto)
+            if serializer.is_valid():
+                nuevas.append((indice, Prenda(**serializer.validated_data)))
+                resultados.append(None)
+            else:
+                resultados.append({'indice': indice, 'estado': 'error', 'errores': serializer.errors})
+
+        if nuevas:
+            with transaction.atomic():
+                prendas = Prenda.objects.bulk_create([prenda for _, prenda in nuevas])
+                # El impacto solo depende de la categoría: se calcula una vez por categoría
+                impactos_por_categoria = {}
+                for prenda in prendas:
+                    if prenda.categoria not in impactos_por_categoria:
+                        impactos_por_categoria[prenda.categoria] = calcular_impacto_prenda(prenda.categoria)
+                ahora = timezone.now()
+                ImpactoAmbiental.objects.bulk_create([
+                    ImpactoAmbiental(
+                        prenda=prenda,
+                        carbono_evitar_kg=impactos_por_categoria[prenda.categoria]['carbono_evitado_kg'],
+                        energia_ahorrada_kwh=impactos_por_categoria[prenda.categoria]['energia_ahorrada_kwh'],
+                        fecha_calculo=ahora,
+                    )
+                    for prenda in prendas
+                ])
+                # bulk_create no emite post_save: se actualizan las versiones a mano
+                VersionTabla.incrementar(Prenda._meta.db_table)
+                VersionTabla.incrementar(ImpactoAmbiental._meta.db_table)
+
+                con_imagen = {
+                    prenda.id_prenda: prenda.imagen_prenda for prenda in prendas
+                    if prenda.imagen_prenda and 'res.cloudinary.com' not in prenda.imagen_prenda
+                }
+                if con_imagen:
+                    programar_subidas_desde_url('prenda', con_imagen)
+
+            for (indice, _), prenda in zip(nuevas, prendas):
+                resultados[indice] = {'indice': indice, 'estado': 'creada', 'id_prenda': prenda.id_prenda}
+            logger.info(f"Alta masiva: {len(prendas)} prendas creadas, {len(con_imagen)} imágenes encoladas")
+
+        return resultados, len(nuevas)
+
+    def _bulk_actualizar(self, usuario, elementos):
+        contexto = self._contexto_bulk(usuario)
+        ids = {e.get('id_prenda') for e in elementos if isinstance(e.get('id_prenda'), int)}
+        # Las prendas de otros usuarios se responden como no encontradas
+        existentes = Prenda.objects.filter(user=usuario).in_bulk(ids)
+        resultados, modificadas, campos = [], {}, set()
+        for indice, elemento in enumerate(elementos):
+            prenda = existentes.get(elemento.get('id_prenda'))
+            if prenda is None:
+                resultados.append({'indice': indice, 'estado': 'error', 'errores': {'id_prenda': ['Prenda no encontrada']}})
+                continue
+            cambios = {campo: valor for campo, valor in elemento.items() if campo != 'user'}
+            serializer = PrendaSerializer(prenda, data=cambios, partial=True, context=contexto)
+            if not serializer.is_valid():
+                resultados.append({'indice': indice, 'estado': 'error', 'errores': serializer.errors})
+                continue
+            for campo, valor in serializer.validated_data.items():
+                setattr(prenda, campo, valor)
+                campos.add(campo)
+            modificadas[prenda.id_prenda] = prenda
+            resultados.append({'indice': indice, 'estado': 'actualizada', 'id_prenda': prenda.id_prenda})
+
+        if modificadas and campos:
+            with transaction.atomic():
+                Prenda.objects.bulk_update(list(modificadas.values()), sorted(campos))
+                VersionTabla.incrementar(Prenda._meta.db_table)
+                invalidar_fragmentos(Prenda, list(modificadas))
+        return resultados, len(resultados) - sum(1 for r in resultados if r['estado'] == 'error')
+    
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        """
+        Búsqueda de texto completo ordenada por relevancia.
+
+        Parámetros:
+            q: Texto a buscar en nombre, categoría y descripción
+            limite: Resultados a devolver (por defecto 20, máximo 100)
+            categoria, talla, estado: Filtros opcionales
+        El ranking no es compatible con el cursor: se devuelven los `limite` mejores.
+        """
+        texto = request.query_params.get('q', '').strip()
+        if not texto:
+            return Response({'error': 'Se requiere el parámetro q'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limite = int(request.query_params.get('limite', BUSQUEDA_LIMITE))
+        except ValueError:
+            limite = BUSQUEDA_LIMITE
+        limite = max(1, min(limite, BUSQUEDA_LIMITE_MAX))
+
+        prendas = Prenda.objects.all()
+        for campo in ('categoria', 'talla', 'estado'):
+            valor = request.query_params.get(campo)
+            if valor:
+                prendas = prendas.filter(**{campo: valor})
+        prendas = buscar_prendas_texto(prendas, texto).order_by('-rango', '-pk')
+        prendas = optimizar_queryset(prendas, self.get_serializer())[:limite]
+
+        serializer = self.get_serializer(prendas, many=True)
+        return Response({'q': texto, 'total': len(serializer.data), 'results': serializer.data})
     
     @action(detail=False, methods=['get'])
     def categorias(self, request):
@@ -205,7 +398,7 @@ class PrendaViewSet(viewsets.ModelViewSet):
         return Response({'message': 'No hay impacto registrado'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class UsuarioViewSet(viewsets.ModelViewSet):
+class UsuarioViewSet(AutoPrefetchMixin, PaginacionAccionesMixin, viewsets.ModelViewSet):
     """ViewSet para Usuarios - CRUD completo"""
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
@@ -215,33 +408,34 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         """Obtiene todas las prendas de un usuario"""
         usuario = self.get_object()
         prendas = Prenda.objects.filter(user=usuario)
-        serializer = PrendaSerializer(prendas, many=True)
-        return Response(serializer.data)
+        return self.respuesta_paginada(prendas, PrendaSerializer)
     
     @action(detail=True, methods=['get'])
     def transacciones(self, request, pk=None):
         """Obtiene todas las transacciones de un usuario"""
         usuario = self.get_object()
-        transacciones = Transaccion.objects.filter(user_origen=usuario) | Transaccion.objects.filter(user_destino=usuario)
-        serializer = TransaccionSerializer(transacciones.distinct(), many=True)
-        return Response(serializer.data)
+        transacciones = Transaccion.objects.filter(Q(user_origen=usuario) | Q(user_destino=usuario))
+        return self.respuesta_paginada(transacciones, TransaccionSerializer)
 
 
-class FundacionViewSet(viewsets.ModelViewSet):
+class FundacionViewSet(AutoPrefetchMixin, PaginacionAccionesMixin, viewsets.ModelViewSet):
     """ViewSet para Fundaciones - CRUD completo"""
     queryset = Fundacion.objects.all()
     serializer_class = FundacionSerializer
+
+    @get_condicional_por_version(Fundacion)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     @action(detail=True, methods=['get'])
     def donaciones(self, request, pk=None):
         """Obtiene todas las donaciones recibidas por una fundación"""
         fundacion = self.get_object()
-        donaciones = Transaccion.objects.filter(id_fundacion=fundacion)
-        serializer = TransaccionSerializer(donaciones, many=True)
-        return Response(serializer.data)
+        donaciones = Transaccion.objects.filter(fundacion=fundacion)
+        return self.respuesta_paginada(donaciones, TransaccionSerializer)
 
 
-class TipoTransaccionViewSet(viewsets.ModelViewSet):
+class TipoTransaccionViewSet(AutoPrefetchMixin, PaginacionAccionesMixin, viewsets.ModelViewSet):
     """ViewSet para Tipos de Transacción - CRUD completo"""
     queryset = TipoTransaccion.objects.all()
     serializer_class = TipoTransaccionSerializer
@@ -250,28 +444,29 @@ class TipoTransaccionViewSet(viewsets.ModelViewSet):
     def transacciones(self, request, pk=None):
         """Obtiene todas las transacciones de un tipo específico"""
         tipo = self.get_object()
-        transacciones = Transaccion.objects.filter(id_tipo=tipo)
-        serializer = TransaccionSerializer(transacciones, many=True)
-        return Response(serializer.data)
+        transacciones = Transaccion.objects.filter(tipo=tipo)
+        return self.respuesta_paginada(transacciones, TransaccionSerializer)
     
     @action(detail=False, methods=['get'])
     def estadisticas(self, request):
-        """Estadísticas por tipo de transacción"""
-        tipos_stats = []
-        for tipo in TipoTransaccion.objects.all():
-            count = Transaccion.objects.filter(id_tipo=tipo).count()
-            tipos_stats.append({
-                'id': tipo.id_tipo,
-                'nombre': tipo.nombre_tipo,
-                'total_transacciones': count
-            })
-        return Response(tipos_stats)
-
-
-class MensajeViewSet(viewsets.ModelViewSet):
+        """Estadísticas por tipo de transacción (una sola consulta agrupada)"""
+        def calcular():
+            return [
+                {'id': tipo['id'], 'nombre': tipo['nombre_tipo'], 'total_transacciones': tipo['total']}
+                for tipo in conteo_transacciones_por_tipo()
+            ]
+        return Response(cache_corto(clave_cache('api', 'tipos-transaccion', 'estadisticas'), calcular))
+
+
+class MensajeViewSet(AutoPrefetchMixin, PaginacionAccionesMixin, viewsets.ModelViewSet):
     """ViewSet para Mensajes - CRUD completo"""
     queryset = Mensaje.objects.all()
     serializer_class = MensajeSerializer
+
+    @property
+    def cursor_ordering(self):
+        """La conversación se lee en orden cronológico; el resto usa el orden por defecto del cursor."""
+        return ('fecha_envio', 'pk') if self.action == 'conversacion' else None
     
     def get_queryset(self):
         """Permite filtrar mensajes por emisor o receptor"""
@@ -280,11 +475,11 @@ class MensajeViewSet(viewsets.ModelViewSet):
         receptor = self.request.query_params.get('receptor', None)
         
         if emisor:
-            queryset = queryset.filter(id_emisor=emisor)
+            queryset = queryset.filter(emisor=emisor)
         if receptor:
-            queryset = queryset.filter(id_receptor=receptor)
+            queryset = queryset.filter(receptor=receptor)
         
-        return queryset.order_by('-fecha_envio')
+        return queryset
     
     @action(detail=False, methods=['get'])
     def conversacion(self, request):
@@ -299,12 +494,11 @@ class MensajeViewSet(viewsets.ModelViewSet):
             )
         
         mensajes = Mensaje.objects.filter(
-            (Q(id_emisor=usuario1_id) & Q(id_receptor=usuario2_id)) |
-            (Q(id_emisor=usuario2_id) & Q(id_receptor=usuario1_id))
-        ).order_by('fecha_envio')
+            (Q(emisor=usuario1_id) & Q(receptor=usuario2_id)) |
+            (Q(emisor=usuario2_id) & Q(receptor=usuario1_id))
+        )
         
-        serializer = MensajeSerializer(mensajes, many=True)
-        return Response(serializer.data)
+        return self.respuesta_paginada(mensajes, MensajeSerializer)
     
     @action(detail=False, methods=['post'])
     def enviar(self, request):
@@ -316,7 +510,7 @@ class MensajeViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ImpactoAmbientalViewSet(viewsets.ModelViewSet):
+class ImpactoAmbientalViewSet(AutoPrefetchMixin, PaginacionAccionesMixin, viewsets.ModelViewSet):
     """ViewSet para Impacto Ambiental - CRUD completo"""
     queryset = ImpactoAmbiental.objects.all()
     serializer_class = ImpactoAmbientalSerializer
@@ -331,12 +525,11 @@ class ImpactoAmbientalViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        impactos = ImpactoAmbiental.objects.filter(id_prenda=prenda_id)
-        serializer = ImpactoAmbientalSerializer(impactos, many=True)
-        return Response(serializer.data)
+        impactos = ImpactoAmbiental.objects.filter(prenda=prenda_id)
+        return self.respuesta_paginada(impactos, ImpactoAmbientalSerializer)
 
 
-class TransaccionViewSet(viewsets.ModelViewSet):
+class TransaccionViewSet(AutoPrefetchMixin, PaginacionAccionesMixin, viewsets.ModelViewSet):
     """ViewSet para Transacciones - CRUD completo"""
     queryset = Transaccion.objects.all()
     serializer_class = TransaccionSerializer
@@ -350,40 +543,61 @@ class TransaccionViewSet(viewsets.ModelViewSet):
         fundacion = self.request.query_params.get('fundacion', None)
         
         if tipo:
-            queryset = queryset.filter(id_tipo=tipo)
+            queryset = queryset.filter(tipo=tipo)
         if usuario:
             queryset = queryset.filter(
-                Q(id_usuario_origen=usuario) | Q(id_usuario_destino=usuario)
+                Q(user_origen=usuario) | Q(user_destino=usuario)
             )
         if estado:
             queryset = queryset.filter(estado=estado)
         if fundacion:
-            queryset = queryset.filter(id_fundacion=fundacion)
+            queryset = queryset.filter(fundacion=fundacion)
         
-        return queryset.order_by('-fecha_transaccion')
+        return queryset
     
     @action(detail=False, methods=['get'])
     def por_tipo(self, request):
-        """Obtiene transacciones agrupadas por tipo"""
-        tipos = TipoTransaccion.objects.all()
-        resultado = []
-        
-        for tipo in tipos:
-            transacciones = Transaccion.objects.filter(id_tipo=tipo)
-            resultado.append({
-                'tipo': tipo.nombre_tipo,
-                'total': transacciones.count(),
-                'transacciones': TransaccionSerializer(transacciones, many=True).data
-            })
-        
+        """
+        Conteo de transacciones por tipo con una muestra acotada de las más recientes.
+        El listado completo de un tipo está en /api/tipos-transaccion/{id}/transacciones/.
+
+        Parámetros:
+            muestra: Transacciones recientes por tipo (por defecto 5, máximo 20)
+        """
+        try:
+            limite = int(request.query_params.get('muestra', MUESTRA_POR_TIPO))
+        except ValueError:
+            limite = MUESTRA_POR_TIPO
+        limite = max(0, min(limite, MUESTRA_POR_TIPO_MAX))
+
+        # Una consulta con los conteos y otra con las N más recientes de cada tipo
+        muestras = {}
+        if limite:
+            recientes = Transaccion.objects.annotate(
+                fila=Window(RowNumber(), partition_by=[F('tipo_id')], order_by=F('pk').desc())
+            ).filter(fila__lte=limite).order_by('tipo_id', '-pk')
+            for transaccion in optimizar_queryset(recientes, TransaccionSerializer):
+                muestras.setdefault(transaccion.tipo_id, []).append(transaccion)
+
+        contexto = self.get_serializer_context()
+        resultado = [
+            {
+                'tipo_id': tipo['id'],
+                'tipo': tipo['nombre_tipo'],
+                'total': tipo['total'],
+                'muestra': TransaccionSerializer(
+                    muestras.get(tipo['id'], []), many=True, context=contexto
+                ).data,
+            }
+            for tipo in conteo_transacciones_por_tipo()
+        ]
         return Response(resultado)
     
     @action(detail=False, methods=['get'])
     def pendientes(self, request):
         """Obtiene todas las transacciones pendientes"""
-        transacciones = Transaccion.objects.filter(estado='Pendiente')
-        serializer = TransaccionSerializer(transacciones, many=True)
-        return Response(serializer.data)
+        transacciones = Transaccion.objects.filter(estado='PENDIENTE')
+        return self.respuesta_paginada(transacciones, TransaccionSerializer)
     
     @action(detail=True, methods=['post'])
     def cambiar_estado(self, request, pk=None):
@@ -397,15 +611,24 @@ class TransaccionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        estados_validos = ['Pendiente', 'Aceptada', 'Rechazada', 'Completada', 'Cancelada']
-        if nuevo_estado not in estados_validos:
+        # Se acepta la etiqueta ('Completada') o el código ('COMPLETADA')
+        estados_validos = {
+            'Pendiente': 'PENDIENTE', 'Aceptada': 'ACEPTADA', 'Rechazada': 'RECHAZADA',
+            'Completada': 'COMPLETADA', 'Cancelada': 'CANCELADA',
+        }
+        codigo = estados_validos.get(nuevo_estado) or (
+            nuevo_estado if nuevo_estado in estados_validos.values() else None
+        )
+        if codigo is None:
             return Response(
-                {'error': f'Estado inválido. Estados válidos: {estados_validos}'}, 
+                {'error': f'Estado inválido. Estados válidos: {list(estados_validos)}'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        transaccion.estado = nuevo_estado
-        transaccion.save()
+        try:
+            transaccion = cambiar_estado(transaccion, codigo)
+        except TransicionInvalida as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
         
         serializer = TransaccionSerializer(transaccion)
         return Response(serializer.data)
@@ -414,57 +637,55 @@ class TransaccionViewSet(viewsets.ModelViewSet):
 # Puntos finales personalizados (Endpoints)
 
 class EstadisticasAPIView(APIView):
-    """Estadísticas generales del sistema."""
+    """Estadísticas generales del sistema (tres consultas agregadas, cacheadas unos segundos)."""
     
     def get(self, request):
-        total_usuarios = Usuario.objects.count()
-        total_prendas = Prenda.objects.count()
-        total_transacciones = Transaccion.objects.count()
-        total_donaciones = Transaccion.objects.filter(id_tipo__nombre_tipo='Donación').count()
-        
-        impacto = ImpactoAmbiental.objects.aggregate(
-            carbono=Sum('carbono_evitar_kg'),
-            energia=Sum('energia_ahorrada_kwh')
+        data = cache_corto(clave_cache('api', 'estadisticas'), self.calcular_estadisticas)
+        return Response(EstadisticasSerializer(data).data)
+
+    @staticmethod
+    def calcular_estadisticas():
+        # Cada impacto pertenece a una sola prenda: el LEFT JOIN no duplica las sumas
+        prendas = Prenda.objects.aggregate(
+            total=Count('pk', distinct=True),
+            carbono=Sum('impactoambiental__carbono_evitar_kg'),
+            energia=Sum('impactoambiental__energia_ahorrada_kwh'),
         )
-        
-        data = {
-            'total_usuarios': total_usuarios,
-            'total_prendas': total_prendas,
-            'total_transacciones': total_transacciones,
-            'total_donaciones': total_donaciones,
-            'carbono_evitado_total': impacto['carbono'] or 0,
-            'energia_ahorrada_total': impacto['energia'] or 0
+        transacciones = Transaccion.objects.aggregate(
+            total=Count('pk'),
+            donaciones=Count('pk', filter=Q(tipo_id=TipoTransaccion.id_de(TipoTransaccion.DONACION))),
+        )
+        return {
+            'total_usuarios': Usuario.objects.count(),
+            'total_prendas': prendas['total'],
+            'total_transacciones': transacciones['total'],
+            'total_donaciones': transacciones['donaciones'],
+            'carbono_evitado_total': prendas['carbono'] or 0,
+            'energia_ahorrada_total': prendas['energia'] or 0
         }
-        
-        serializer = EstadisticasSerializer(data=data)
-        if serializer.is_valid():
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class ImpactoTotalAPIView(APIView):
     """Impacto ambiental total del sistema."""
     
     def get(self, request):
-        impacto = ImpactoAmbiental.objects.aggregate(
-            total_carbono=Sum('carbono_evitar_kg'),
-            total_energia=Sum('energia_ahorrada_kwh'),
-            total_prendas_impactadas=Count('id_prenda')
-        )
-        
-        serializer = ImpactoTotalSerializer(data=impacto)
-        if serializer.is_valid():
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        def calcular():
+            return ImpactoAmbiental.objects.aggregate(
+                total_carbono=Sum('carbono_evitar_kg'),
+                total_energia=Sum('energia_ahorrada_kwh'),
+                total_prendas_impactadas=Count('prenda')
+            )
+        impacto = cache_corto(clave_cache('api', 'impacto-total'), calcular)
+        return Response(ImpactoTotalSerializer(impacto).data)
 
 # ---- Logros ----
-class LogroViewSet(viewsets.ModelViewSet):
+class LogroViewSet(AutoPrefetchMixin, PaginacionAccionesMixin, viewsets.ModelViewSet):
     """CRUD completo para Logro"""
     queryset = Logro.objects.all()
     serializer_class = LogroSerializer
 
 # ---- UsuarioLogro ----
-class UsuarioLogroViewSet(viewsets.ModelViewSet):
+class UsuarioLogroViewSet(AutoPrefetchMixin, PaginacionAccionesMixin, viewsets.ModelViewSet):
     """CRUD completo para logros obtenidos por usuario"""
     queryset = UsuarioLogro.objects.all()
     serializer_class = UsuarioLogroSerializer
@@ -475,22 +696,21 @@ class UsuarioLogroViewSet(viewsets.ModelViewSet):
         usuario_id = request.query_params.get('usuario_id')
         if not usuario_id:
             return Response({'error': 'Parametro usuario_id obligatorio'}, status=status.HTTP_400_BAD_REQUEST)
-        logros = UsuarioLogro.objects.filter(usuario_id=usuario_id)
-        serializer = self.get_serializer(logros, many=True)
-        return Response(serializer.data)
+        logros = UsuarioLogro.objects.filter(user_id=usuario_id)
+        return self.respuesta_paginada(logros)
     
 # ---- Campañas de Fundación ----
-class CampanaFundacionViewSet(viewsets.ModelViewSet):
+class CampanaFundacionViewSet(AutoPrefetchMixin, PaginacionAccionesMixin, viewsets.ModelViewSet):
     """CRUD para campañas solidarias"""
     queryset = CampanaFundacion.objects.all()
     serializer_class = CampanaFundacionSerializer
 
     # Custom: campañas activas
     @action(detail=False, methods=['get'])
+    @get_condicional_por_version(CampanaFundacion, Fundacion)
     def activas(self, request):
         campanas = CampanaFundacion.objects.filter(activa=True)
-        serializer = self.get_serializer(campanas, many=True)
-        return Response(serializer.data)
+        return self.respuesta_paginada(campanas)
     
     # Custom: campañas por fundación
     @action(detail=False, methods=['get'])
@@ -498,15 +718,23 @@ class CampanaFundacionViewSet(viewsets.ModelViewSet):
         fundacion_id = request.query_params.get('fundacion_id')
         if not fundacion_id:
             return Response({'error': 'Parametro fundacion_id obligatorio'}, status=status.HTTP_400_BAD_REQUEST)
-        campanas = CampanaFundacion.objects.filter(id_fundacion=fundacion_id)
-        serializer = self.get_serializer(campanas, many=True)
-        return Response(serializer.data)
+        campanas = CampanaFundacion.objects.filter(fundacion_id=fundacion_id)
+        return self.respuesta_paginada(campanas)
 
 # ---- Prenda Simple: lista sin relaciones ----
-class PrendaSimpleListAPIView(generics.ListAPIView):
-    """Lista de prendas sin relaciones (optimizada)"""
+class PrendaSimpleListAPIView(AutoPrefetchMixin, generics.ListAPIView):
+    """
+    Lista de prendas sin relaciones (optimizada).
+    Equivale a /api/prendas/ con los campos de PrendaSimpleSerializer como
+    `?fields=` por defecto; el cliente puede pedir otros.
+    """
     queryset = Prenda.objects.all()
-    serializer_class = PrendaSimpleSerializer
+    serializer_class = PrendaSerializer
+
+    def get_serializer_context(self):
+        contexto = super().get_serializer_context()
+        contexto['campos_por_defecto'] = PrendaSimpleSerializer.Meta.fields
+        return contexto
 
 
 @api_view(['POST'])
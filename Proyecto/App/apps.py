@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AppConfig(AppConfig):
     name = 'App'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
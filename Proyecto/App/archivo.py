@@ -0,0 +1,203 @@
+"""
+Archivo de transacciones antiguas (TransaccionArchivada).
+
+Las pantallas de todos los días (mis transacciones, gestión de donaciones,
+pendientes) solo miran transacciones abiertas o recientes, pero `transaccion`
+guarda para siempre cada propuesta, rechazo y cancelación. El comando
+`archivar_transacciones` mueve por lotes las que terminaron (COMPLETADA,
+RECHAZADA, CANCELADA) hace más de ARCHIVO_MESES meses a
+`transaccion_archivada`: la copia y el borrado van en el mismo bloque
+atómico, así una transacción nunca está en las dos tablas ni en ninguna. Las
+que aún tienen eventos sin despachar (eventos.py) esperan al siguiente turno.
+
+Los reportes que necesitan el historial completo (resúmenes, contadores,
+exportación con ?archivo=1) arman su consulta una vez y la aplican a ambas
+tablas con `union_historica` (UNION ALL): las dos tienen los mismos campos.
+
+En PostgreSQL el archivo puede particionarse por rango anual de
+`fecha_transaccion` (`archivar_transacciones --particionar`); después, cada
+lote crea antes las particiones de los años que mueve.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import NotSupportedError, connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import EventoTransaccion, Transaccion, TransaccionArchivada
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_ARCHIVABLES = ('COMPLETADA', 'RECHAZADA', 'CANCELADA')
+ARCHIVO_MESES = getattr(settings, 'ARCHIVO_MESES', 12)
+LOTE_POR_DEFECTO = 500
+
+# Campos copiados tal cual (todos los de TransaccionArchivada salvo la fecha de archivo)
+CAMPOS_ARCHIVADOS = [
+    campo.attname for campo in TransaccionArchivada._meta.concrete_fields if campo.name != 'fecha_archivado'
+]
+
+
+# ==============================================================================
+# CONSULTAS SOBRE AMBAS TABLAS
+# ==============================================================================
+
+def consultas_historicas(construir, incluir_archivo=True):
+    """[construir(transacciones activas), construir(archivadas)] (o solo la primera)."""
+    modelos = (Transaccion, TransaccionArchivada) if incluir_archivo else (Transaccion,)
+    return [construir(modelo.objects.all()) for modelo in modelos]
+
+
+def union_historica(construir, incluir_archivo=True):
+    """
+    Aplica `construir` (queryset -> queryset) a ambas tablas y las une con
+    UNION ALL en una sola consulta. `construir` debe usar solo campos que
+    existan en las dos (los de Transaccion) y terminar en values() o
+    values_list() si agrupa; las filas agrupadas llegan una vez por tabla.
+    """
+    activas, *archivadas = consultas_historicas(construir, incluir_archivo)
+    return activas.union(*archivadas, all=True) if archivadas else activas
+
+
+# ==============================================================================
+# ARCHIVADO
+# ==============================================================================
+
+def fecha_limite(meses=None):
+    """Las transacciones de antes de esta fecha se pueden archivar."""
+    meses = ARCHIVO_MESES if meses is None else meses
+    return timezone.now() - timedelta(days=30 * meses)
+
+
+def archivables(limite):
+    """Transacciones terminadas antes de `limite` y sin eventos pendientes."""
+    pendientes = EventoTransaccion.objects.filter(transaccion=OuterRef('pk'), fecha_procesado__isnull=True)
+    return Transaccion.objects.filter(
+        estado__in=ESTADOS_ARCHIVABLES, fecha_transaccion__lt=limite
+    ).filter(~Exists(pendientes))
+
+
+def _archivar_lote(limite, lote):
+    with transaction.atomic():
+        # skip_locked: no esperar filas que otra petición está cambiando
+        ids = list(
+            archivables(limite).select_for_update(skip_locked=True)
+            .order_by('pk').values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            return 0
+        filas = list(Transaccion.objects.filter(pk__in=ids).values(*CAMPOS_ARCHIVADOS))
+        if archivo_particionado():
+            crear_particiones(fila['fecha_transaccion'].year for fila in filas)
+        ahora = timezone.now()
+        TransaccionArchivada.objects.bulk_create(
+            TransaccionArchivada(**fila, fecha_archivado=ahora) for fila in filas
+        )
+        # Los eventos ya despachados se van con la transacción (CASCADE)
+        Transaccion.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def archivar_transacciones(meses=None, lote=LOTE_POR_DEFECTO):
+    """
+    Mueve al archivo, lote a lote, las transacciones terminadas hace más de
+    `meses` meses. Cada lote es una transacción de base de datos propia.
+
+    Returns:
+        Transacciones archivadas
+    """
+    limite = fecha_limite(meses)
+    total = 0
+    while True:
+        movidas = _archivar_lote(limite, lote)
+        total += movidas
+        if movidas < lote:
+            break
+    if total:
+        logger.info(f"Transacciones archivadas: {total} (anteriores a {limite:%Y-%m-%d})")
+    return total
+
+
+# ==============================================================================
+# PARTICIONES (solo PostgreSQL)
+# ==============================================================================
+
+def _tabla():
+    return TransaccionArchivada._meta.db_table
+
+
+def archivo_particionado():
+    """True si `transaccion_archivada` es una tabla particionada de PostgreSQL."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [_tabla()],
+        )
+        return cursor.fetchone() is not None
+
+
+def crear_particiones(anios):
+    """Crea (si faltan) las particiones anuales de `anios`."""
+    tabla = connection.ops.quote_name(_tabla())
+    with connection.cursor() as cursor:
+        for anio in sorted(set(anios)):
+            particion = connection.ops.quote_name(f'{_tabla()}_{anio}')
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {particion} PARTITION OF {tabla} "
+                f"FOR VALUES FROM ('{anio}-01-01') TO ('{anio + 1}-01-01')"
+            )
+
+
+def particionar_archivo():
+    """
+    Convierte `transaccion_archivada` en una tabla particionada por rango
+    anual de `fecha_transaccion`, con una partición por defecto para lo que
+    quede fuera. La clave primaria pasa a ser (id_transaccion,
+    fecha_transaccion), como exige PostgreSQL; los índices se recrean sobre
+    la tabla nueva.
+
+    Returns:
+        False si ya estaba particionada
+
+    Raises:
+        NotSupportedError: Si la base de datos no es PostgreSQL
+    """
+    if connection.vendor != 'postgresql':
+        raise NotSupportedError('El particionado del archivo solo está disponible en PostgreSQL.')
+    if archivo_particionado():
+        return False
+
+    nombre = _tabla()
+    tabla = connection.ops.quote_name(nombre)
+    anterior = connection.ops.quote_name(f'{nombre}_sin_particion')
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [nombre, nombre],
+        )
+        indices = [fila[0] for fila in cursor.fetchall()]
+        cursor.execute(f"SELECT DISTINCT EXTRACT(YEAR FROM fecha_transaccion)::int FROM {tabla}")
+        anios = [fila[0] for fila in cursor.fetchall()]
+
+        cursor.execute(f"ALTER TABLE {tabla} RENAME TO {anterior}")
+        cursor.execute(
+            f"CREATE TABLE {tabla} (LIKE {anterior} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE (fecha_transaccion)"
+        )
+        cursor.execute(f"CREATE TABLE {connection.ops.quote_name(f'{nombre}_default')} PARTITION OF {tabla} DEFAULT")
+        crear_particiones(anios)
+        cursor.execute(f"INSERT INTO {tabla} SELECT * FROM {anterior}")
+        # Al borrar la tabla vieja quedan libres los nombres de su clave e índices
+        cursor.execute(f"DROP TABLE {anterior}")
+        cursor.execute(f"ALTER TABLE {tabla} ADD PRIMARY KEY (id_transaccion, fecha_transaccion)")
+        for definicion in indices:  # Se leyeron con el nombre original de la tabla
+            cursor.execute(definicion)
+    logger.info(f"Archivo de transacciones particionado por año ({len(anios)} particiones)")
+    return True
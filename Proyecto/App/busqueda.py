@@ -0,0 +1,205 @@
+"""
+Búsqueda de texto completo de prendas.
+
+- PostgreSQL: columna generada `prenda.busqueda` (tsvector, configuración
+  'spanish' con stemming) e índice GIN. Al ser una columna generada, la base
+  de datos la mantiene al día en cada INSERT/UPDATE, incluidos bulk_create
+  y update().
+- SQLite (desarrollo): tabla virtual FTS5 `prenda_fts` de contenido externo,
+  sincronizada con triggers. No hay stemming en español; cada término se
+  busca como prefijo y sin tildes ('pantalon' encuentra 'Pantalón').
+- Otros motores, o si la estructura no existe: icontains sobre nombre y
+  descripción, como antes.
+
+Las estructuras se crean en la migración 0003 y se pueden regenerar con
+`python manage.py reconstruir_busqueda`.
+
+En SQLite, una migración que reconstruye la tabla prenda (AlterField, o
+AddField que SQLite no resuelve con ALTER TABLE ADD COLUMN) borra los
+triggers sin avisar. Esas migraciones deben terminar con
+`migrations.RunPython(recrear_indice_sqlite, migrations.RunPython.noop)`.
+El check App.E001 (checks.py) y `indice_disponible` detectan los triggers
+faltantes.
+"""
+
+import logging
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+# Pesos por columna: nombre pesa más que categoría y que descripción
+SQL_POSTGRES = [
+    """
+    ALTER TABLE prenda ADD COLUMN IF NOT EXISTS busqueda tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish'::regconfig, coalesce(nombre, '')), 'A') ||
+        setweight(to_tsvector('spanish'::regconfig, coalesce(categoria, '')), 'B') ||
+        setweight(to_tsvector('spanish'::regconfig, coalesce(descripcion, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS prenda_busqueda_gin ON prenda USING GIN (busqueda)",
+]
+
+SQL_POSTGRES_ELIMINAR = [
+    "DROP INDEX IF EXISTS prenda_busqueda_gin",
+    "ALTER TABLE prenda DROP COLUMN IF EXISTS busqueda",
+]
+
+SQL_SQLITE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS prenda_fts USING fts5(
+        nombre, categoria, descripcion,
+        content='prenda', content_rowid='id_prenda',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prenda_fts_ai AFTER INSERT ON prenda BEGIN
+        INSERT INTO prenda_fts(rowid, nombre, categoria, descripcion)
+        VALUES (new.id_prenda, new.nombre, new.categoria, new.descripcion);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prenda_fts_ad AFTER DELETE ON prenda BEGIN
+        INSERT INTO prenda_fts(prenda_fts, rowid, nombre, categoria, descripcion)
+        VALUES ('delete', old.id_prenda, old.nombre, old.categoria, old.descripcion);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prenda_fts_au AFTER UPDATE ON prenda BEGIN
+        INSERT INTO prenda_fts(prenda_fts, rowid, nombre, categoria, descripcion)
+        VALUES ('delete', old.id_prenda, old.nombre, old.categoria, old.descripcion);
+        INSERT INTO prenda_fts(rowid, nombre, categoria, descripcion)
+        VALUES (new.id_prenda, new.nombre, new.categoria, new.descripcion);
+    END
+    """,
+    # Indexa las filas que ya existían
+    "INSERT INTO prenda_fts(prenda_fts) VALUES ('rebuild')",
+]
+
+# Triggers que mantienen prenda_fts al día
+TRIGGERS_SQLITE = ('prenda_fts_ai', 'prenda_fts_ad', 'prenda_fts_au')
+
+SQL_SQLITE_ELIMINAR = [
+    "DROP TRIGGER IF EXISTS prenda_fts_ai",
+    "DROP TRIGGER IF EXISTS prenda_fts_ad",
+    "DROP TRIGGER IF EXISTS prenda_fts_au",
+    "DROP TABLE IF EXISTS prenda_fts",
+]
+
+
+def crear_indice_busqueda(connection):
+    """Crea (o completa) las estructuras de búsqueda para el motor de `connection`."""
+    sentencias = {'postgresql': SQL_POSTGRES, 'sqlite': SQL_SQLITE}.get(connection.vendor)
+    if not sentencias:
+        logger.info(f"Búsqueda de texto completo no disponible para {connection.vendor}; se usará icontains")
+        return False
+    with connection.cursor() as cursor:
+        for sql in sentencias:
+            cursor.execute(sql)
+    return True
+
+
+def eliminar_indice_busqueda(connection):
+    sentencias = {'postgresql': SQL_POSTGRES_ELIMINAR, 'sqlite': SQL_SQLITE_ELIMINAR}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for sql in sentencias:
+            cursor.execute(sql)
+
+
+def recrear_indice_sqlite(apps, schema_editor):
+    """
+    Operación RunPython para migraciones que reconstruyen la tabla prenda en
+    SQLite: recrea los triggers y reindexa. En otros motores no hace nada.
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        eliminar_indice_busqueda(connection)
+        crear_indice_busqueda(connection)
+
+
+def triggers_faltantes(connection):
+    """Triggers de TRIGGERS_SQLITE que no están en sqlite_master (vacío fuera de SQLite o sin índice)."""
+    if connection.vendor != 'sqlite' or 'prenda_fts' not in connection.introspection.table_names():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'prenda'")
+        existentes = {fila[0] for fila in cursor.fetchall()}
+    return [nombre for nombre in TRIGGERS_SQLITE if nombre not in existentes]
+
+
+def _indice_disponible(connection):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            columnas = connection.introspection.get_table_description(cursor, 'prenda')
+        return any(columna.name == 'busqueda' for columna in columnas)
+    if connection.vendor == 'sqlite':
+        if 'prenda_fts' not in connection.introspection.table_names():
+            return False
+        faltantes = triggers_faltantes(connection)
+        if faltantes:
+            # Sin triggers el índice queda desactualizado: mejor icontains que resultados viejos
+            logger.error(
+                f"Faltan los triggers {', '.join(faltantes)} de prenda_fts; se usará icontains. "
+                "Ejecuta `python manage.py reconstruir_busqueda`."
+            )
+            return False
+        return True
+    return False
+
+
+# Resultado de _indice_disponible por alias de conexión
+_disponible = {}
+
+
+def indice_disponible(alias='default'):
+    if alias not in _disponible:
+        _disponible[alias] = _indice_disponible(connections[alias])
+    return _disponible[alias]
+
+
+def _consulta_fts5(texto):
+    """'Camisa roja' -> '"camisa"* "roja"*' (todos los términos, como prefijo)."""
+    return ' '.join(f'"{termino}"*' for termino in re.findall(r'\w+', texto.lower()))
+
+
+def buscar_prendas_texto(queryset, texto):
+    """
+    Filtra `queryset` (de Prenda) por `texto` y anota `rango` (mayor = más
+    relevante). No ordena: el llamador decide si ordena por `-rango`.
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return queryset.annotate(rango=Value(0.0, output_field=FloatField()))
+
+    alias = queryset.db
+    vendor = connections[alias].vendor
+    if not indice_disponible(alias):
+        return queryset.filter(
+            Q(nombre__icontains=texto) | Q(descripcion__icontains=texto)
+        ).annotate(rango=Value(0.0, output_field=FloatField()))
+
+    if vendor == 'postgresql':
+        consulta = "websearch_to_tsquery('spanish'::regconfig, %s)"
+        return queryset.alias(
+            coincide=RawSQL(f'"prenda"."busqueda" @@ {consulta}', [texto], output_field=BooleanField())
+        ).filter(coincide=True).annotate(
+            rango=RawSQL(f'ts_rank("prenda"."busqueda", {consulta})', [texto], output_field=FloatField())
+        )
+
+    # SQLite / FTS5: bm25 devuelve valores negativos (más bajo = mejor)
+    consulta = _consulta_fts5(texto)
+    if not consulta:
+        return queryset.none().annotate(rango=Value(0.0, output_field=FloatField()))
+    return queryset.filter(
+        id_prenda__in=RawSQL('SELECT rowid FROM prenda_fts WHERE prenda_fts MATCH %s', [consulta])
+    ).annotate(
+        rango=RawSQL(
+            'SELECT -bm25(prenda_fts, 10.0, 5.0, 1.0) FROM prenda_fts '
+            'WHERE prenda_fts MATCH %s AND prenda_fts.rowid = "prenda"."id_prenda"',
+            [consulta], output_field=FloatField()
+        )
+    )
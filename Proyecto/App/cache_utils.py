@@ -0,0 +1,42 @@
+"""
+Utilidades de caché de corta duración para EcoPrenda.
+Envuelve el framework de caché de Django para datos agregados que toleran
+unos segundos de desfase (estadísticas, conteos, facetas).
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Prefijo común de las claves para no chocar con otras apps del proyecto
+PREFIJO_CACHE = 'ecoprenda'
+
+
+def clave_cache(*partes):
+    """Construye una clave de caché con el prefijo del proyecto: 'ecoprenda:a:b'."""
+    return ':'.join([PREFIJO_CACHE, *(str(parte) for parte in partes)])
+
+
+def cache_corto(clave, calcular, segundos=None):
+    """
+    Devuelve el valor cacheado en `clave` o lo calcula con `calcular()`.
+
+    Args:
+        clave: Clave de caché (usar `clave_cache`)
+        calcular: Función sin argumentos que produce el valor
+        segundos: TTL; por defecto settings.API_ESTADISTICAS_CACHE_SEGUNDOS.
+                  Con 0 o None no se usa la caché.
+
+    Returns:
+        El valor cacheado o recién calculado
+    """
+    if segundos is None:
+        segundos = getattr(settings, 'API_ESTADISTICAS_CACHE_SEGUNDOS', 0)
+    if not segundos:
+        return calcular()
+
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, segundos)
+    return valor
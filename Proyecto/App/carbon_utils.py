@@ -233,31 +233,14 @@ def obtener_impacto_total_usuario(usuario):
     Returns:
         dict con impacto total acumulado
     """
-    from .models import ImpactoAmbiental, Transaccion
+    from .models import ResumenMensualImpacto
+    from .resumenes import totales_por_tipo
     
-    # Obtener todas las transacciones del usuario
-    transacciones = Transaccion.objects.filter(
-        user_origen=usuario,
-        estado='COMPLETADA'
-    )
-    
-    # Sumar impactos
-    total_carbono = 0
-    total_energia = 0
-    total_agua = 0
-    
-    for transaccion in transacciones:
-        try:
-            impacto = ImpactoAmbiental.objects.get(prenda=transaccion.prenda)
-            total_carbono += float(impacto.carbono_evitar_kg or 0)
-            total_energia += float(impacto.energia_ahorrada_kwh or 0)
-        except ImpactoAmbiental.DoesNotExist:
-            # Calcular si no existe
-            categoria = transaccion.prenda.categoria
-            impacto_calc = calcular_impacto_prenda(categoria)
-            total_carbono += impacto_calc['carbono_evitado_kg']
-            total_energia += impacto_calc['energia_ahorrada_kwh']
-            total_agua += impacto_calc['agua_ahorrada_litros']
+    # Sumar los resúmenes mensuales del usuario (resumenes.py)
+    desglose = totales_por_tipo(ResumenMensualImpacto.AMBITO_USUARIO, usuario.pk)
+    total_carbono = sum(d['carbono'] for d in desglose.values())
+    total_energia = sum(d['energia'] for d in desglose.values())
+    total_agua = sum(d['agua'] for d in desglose.values())
     
     # Calcular equivalencias del total
     equivalencias = calcular_equivalencias(total_carbono, total_energia, total_agua)
@@ -266,7 +249,7 @@ def obtener_impacto_total_usuario(usuario):
         'total_carbono_kg': round(total_carbono, 2),
         'total_energia_kwh': round(total_energia, 2),
         'total_agua_litros': round(total_agua, 0),
-        'total_transacciones': transacciones.count(),
+        'total_transacciones': sum(d['cantidad'] for d in desglose.values()),
         'equivalencias': equivalencias
     }
 
@@ -307,6 +290,9 @@ def generar_informe_impacto(usuario=None, fundacion=None):
     """
     Genera un informe detallado de impacto ambiental.
     
+    Lee los resúmenes mensuales (resumenes.py): O(meses × tipos) filas en vez
+    de una consulta por transacción completada.
+    
     Args:
         usuario: Usuario específico (opcional)
         fundacion: Fundación específica (opcional)
@@ -314,68 +300,37 @@ def generar_informe_impacto(usuario=None, fundacion=None):
     Returns:
         dict con informe completo
     """
-    from .models import Transaccion, ImpactoAmbiental
+    from .models import ResumenMensualImpacto
+    from .resumenes import totales_por_tipo
     
     if usuario:
-        # Informe de usuario
-        transacciones = Transaccion.objects.filter(
-            user_origen=usuario,
-            estado='COMPLETADA'
-        ).select_related('prenda', 'tipo')
-        
+        # Informe de usuario: transacciones completadas en que entregó la prenda
+        ambito, ambito_id = ResumenMensualImpacto.AMBITO_USUARIO, usuario.pk
         titulo = f"Impacto de {usuario.nombre}"
     
     elif fundacion:
-        # Informe de fundación
-        transacciones = Transaccion.objects.filter(
-            fundacion=fundacion,
-            estado='COMPLETADA',
-            tipo__nombre_tipo='Donación'
-        ).select_related('prenda', 'user_origen')
-        
+        # Informe de fundación: donaciones completadas recibidas
+        ambito, ambito_id = ResumenMensualImpacto.AMBITO_FUNDACION, fundacion.pk
         titulo = f"Impacto de {fundacion.nombre}"
     
     else:
         # Informe global
-        transacciones = Transaccion.objects.filter(
-            estado='COMPLETADA'
-        ).select_related('prenda', 'tipo')
-        
+        ambito, ambito_id = ResumenMensualImpacto.AMBITO_PLATAFORMA, 0
         titulo = "Impacto Global de EcoPrenda"
     
     # Desglose por tipo de transacción
-    desglose = {}
-    for trans in transacciones:
-        tipo = trans.tipo.nombre_tipo
-        if tipo not in desglose:
-            desglose[tipo] = {
-                'cantidad': 0,
-                'carbono': 0,
-                'energia': 0,
-                'agua': 0
-            }
-        
-        try:
-            impacto = ImpactoAmbiental.objects.get(prenda=trans.prenda)
-            carbono = float(impacto.carbono_evitar_kg or 0)
-            energia = float(impacto.energia_ahorrada_kwh or 0)
-        except ImpactoAmbiental.DoesNotExist:
-            impacto_calc = calcular_impacto_prenda(trans.prenda.categoria)
-            carbono = impacto_calc['carbono_evitado_kg']
-            energia = impacto_calc['energia_ahorrada_kwh']
-        
-        desglose[tipo]['cantidad'] += 1
-        desglose[tipo]['carbono'] += carbono
-        desglose[tipo]['energia'] += energia
+    desglose = totales_por_tipo(ambito, ambito_id)
     
     # Totales
     total_carbono = sum(d['carbono'] for d in desglose.values())
     total_energia = sum(d['energia'] for d in desglose.values())
-    total_agua = total_carbono * 500
+    total_agua = sum(d['agua'] for d in desglose.values())
     
     return {
         'titulo': titulo,
-        'total_transacciones': transacciones.count(),
+        'ambito': ambito,
+        'ambito_id': ambito_id,
+        'total_transacciones': sum(d['cantidad'] for d in desglose.values()),
         'desglose': desglose,
         'totales': {
             'carbono_kg': round(total_carbono, 2),
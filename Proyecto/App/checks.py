@@ -0,0 +1,25 @@
+"""
+Checks de sistema de EcoPrenda (`python manage.py check --database default`;
+`migrate` también los ejecuta).
+"""
+
+from django.core.checks import Error, Tags, register
+from django.db import connections
+
+from .busqueda import triggers_faltantes
+
+
+@register(Tags.database)
+def revisar_triggers_busqueda(app_configs, databases=None, **kwargs):
+    """App.E001: en SQLite, una reconstrucción de la tabla prenda borró los triggers de prenda_fts."""
+    errores = []
+    for alias in databases or []:
+        faltantes = triggers_faltantes(connections[alias])
+        if faltantes:
+            errores.append(Error(
+                f"Faltan los triggers de búsqueda {', '.join(faltantes)} en la base '{alias}'.",
+                hint='Una migración reconstruyó la tabla prenda. Ejecuta `python manage.py reconstruir_busqueda` '
+                     'y agrega RunPython(busqueda.recrear_indice_sqlite) a esa migración.',
+                id='App.E001',
+            ))
+    return errores
@@ -4,6 +4,9 @@ Proporciona funciones helper para subida, transformación y eliminación de imá
 """
 
 import logging
+import re
+from functools import lru_cache
+
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
@@ -162,18 +165,11 @@ def subir_imagen_prenda(imagen, id_prenda):
     Returns:
         dict: Resultado de Cloudinary
     """
-    transformaciones = {
-        'width': 800,
-        'height': 800,
-        'crop': 'limit',  # No recortar, solo limitar tamaño máximo
-        'quality': 'auto:good',
-    }
-    
     return subir_imagen_cloudinary(
         imagen=imagen,
         carpeta='ecoprenda/prendas',
         public_id=f'prenda_{id_prenda}',
-        transformaciones=transformaciones
+        transformaciones=TRANSFORMACION_SUBIDA_PRENDA
     )
 
 
@@ -188,19 +184,11 @@ def subir_imagen_usuario(imagen, id_usuario):
     Returns:
         dict: Resultado de Cloudinary
     """
-    transformaciones = {
-        'width': 400,
-        'height': 400,
-        'crop': 'fill',  # Recortar para mantener aspecto cuadrado
-        'gravity': 'face',  # Enfocar en la cara si detecta una
-        'quality': 'auto:good',
-    }
-    
     return subir_imagen_cloudinary(
         imagen=imagen,
         carpeta='ecoprenda/usuarios',
         public_id=f'usuario_{id_usuario}',
-        transformaciones=transformaciones
+        transformaciones=TRANSFORMACION_SUBIDA_USUARIO
     )
 
 
@@ -215,19 +203,11 @@ def subir_logo_fundacion(imagen, id_fundacion):
     Returns:
         dict: Resultado de Cloudinary
     """
-    transformaciones = {
-        'width': 500,
-        'height': 500,
-        'crop': 'fit',  # Ajustar manteniendo aspecto
-        'quality': 'auto:best',  # Mejor calidad para logos
-        'background': 'transparent',  # Fondo transparente si es PNG
-    }
-    
     return subir_imagen_cloudinary(
         imagen=imagen,
         carpeta='ecoprenda/fundaciones',
         public_id=f'fundacion_{id_fundacion}',
-        transformaciones=transformaciones
+        transformaciones=TRANSFORMACION_SUBIDA_FUNDACION
     )
 
 
@@ -267,6 +247,12 @@ def obtener_miniaturas(public_id):
     Returns:
         dict: URLs de diferentes tamaños
     """
+    return dict(_miniaturas(public_id))
+
+
+@lru_cache(maxsize=1024)
+def _miniaturas(public_id):
+    """Las URLs solo dependen del public_id: se calculan una vez por proceso."""
     tamaños = {
         'thumbnail': {'width': 150, 'height': 150, 'crop': 'thumb'},
         'small': {'width': 300, 'height': 300, 'crop': 'limit'},
@@ -278,7 +264,7 @@ def obtener_miniaturas(public_id):
     for nombre, transformacion in tamaños.items():
         urls[nombre] = obtener_url_transformada(public_id, transformacion)
     
-    return urls
+    return tuple(urls.items())
 
 
 def validar_imagen(imagen, max_size_mb=5):
@@ -349,6 +335,30 @@ def extraer_public_id_de_url(url):
 # TRANSFORMACIONES COMUNES
 # ==============================================================================
 
+# Transformaciones aplicadas al subir (también las usa subidas.py)
+TRANSFORMACION_SUBIDA_PRENDA = {
+    'width': 800,
+    'height': 800,
+    'crop': 'limit',  # No recortar, solo limitar tamaño máximo
+    'quality': 'auto:good',
+}
+
+TRANSFORMACION_SUBIDA_USUARIO = {
+    'width': 400,
+    'height': 400,
+    'crop': 'fill',  # Recortar para mantener aspecto cuadrado
+    'gravity': 'face',  # Enfocar en la cara si detecta una
+    'quality': 'auto:good',
+}
+
+TRANSFORMACION_SUBIDA_FUNDACION = {
+    'width': 500,
+    'height': 500,
+    'crop': 'fit',  # Ajustar manteniendo aspecto
+    'quality': 'auto:best',  # Mejor calidad para logos
+    'background': 'transparent',  # Fondo transparente si es PNG
+}
+
 TRANSFORMACIONES_PRENDA = {
     'lista': {'width': 300, 'height': 300, 'crop': 'fill'},
     'detalle': {'width': 800, 'height': 800, 'crop': 'limit'},
@@ -363,4 +373,81 @@ TRANSFORMACIONES_PERFIL = {
 TRANSFORMACIONES_FUNDACION = {
     'logo_pequeno': {'width': 150, 'height': 150, 'crop': 'fit'},
     'logo_grande': {'width': 500, 'height': 500, 'crop': 'fit'},
-}
\ No newline at end of file
+}
+
+
+# ==============================================================================
+# VARIANTES RESPONSIVAS (precalculadas al subir)
+# ==============================================================================
+
+# Variantes que se guardan en Prenda.imagen_variantes
+VARIANTES_PRENDA = {
+    'miniatura': {'width': 150, 'height': 150, 'crop': 'thumb'},
+    'lista': TRANSFORMACIONES_PRENDA['lista'],
+    'detalle': TRANSFORMACIONES_PRENDA['detalle'],
+}
+
+# Anchos del srcset de cada variante (1x y 2x del tamaño en pantalla)
+ANCHOS_SRCSET_PRENDA = {
+    'lista': (300, 600),
+    'detalle': (400, 800),
+}
+
+
+def _url_variante(public_id, version, transformacion):
+    url, _ = cloudinary.utils.cloudinary_url(
+        public_id, version=version, secure=True, fetch_format='auto', quality='auto', **transformacion
+    )
+    return url
+
+
+def calcular_variantes(public_id, version=None, variantes=None, anchos_srcset=None):
+    """
+    URLs de cada variante de una imagen, para guardarlas junto al recurso y
+    no recalcularlas al renderizar.
+
+    Args:
+        public_id: ID público de la imagen
+        version: Versión devuelta por Cloudinary (evita servir una caché vieja del CDN)
+        variantes: {nombre: transformación} (default: VARIANTES_PRENDA)
+        anchos_srcset: {nombre: (anchos...)} (default: ANCHOS_SRCSET_PRENDA)
+
+    Returns:
+        dict: {'miniatura': url, 'lista': url, 'lista_srcset': 'url 300w, url 600w', ...}
+    """
+    variantes = VARIANTES_PRENDA if variantes is None else variantes
+    anchos_srcset = ANCHOS_SRCSET_PRENDA if anchos_srcset is None else anchos_srcset
+    urls = {}
+    for nombre, transformacion in variantes.items():
+        urls[nombre] = _url_variante(public_id, version, transformacion)
+        if nombre in anchos_srcset:
+            candidatos = []
+            for ancho in anchos_srcset[nombre]:
+                escalada = dict(transformacion, width=ancho)
+                if transformacion.get('height') and transformacion.get('width'):
+                    escalada['height'] = round(transformacion['height'] * ancho / transformacion['width'])
+                candidatos.append(f"{_url_variante(public_id, version, escalada)} {ancho}w")
+            urls[f'{nombre}_srcset'] = ', '.join(candidatos)
+    return urls
+
+
+def variantes_de_resultado(resultado, **kwargs):
+    """Variantes a partir de la respuesta de una subida (vacío si no trae public_id)."""
+    if not resultado or not resultado.get('public_id'):
+        return {}
+    try:
+        return calcular_variantes(resultado['public_id'], resultado.get('version'), **kwargs)
+    except Exception as e:
+        logger.error(f"Error al calcular variantes de {resultado.get('public_id')}: {str(e)}")
+        return {}
+
+
+def variantes_de_url(url, **kwargs):
+    """Variantes de una URL de Cloudinary ya guardada (vacío si no es de Cloudinary)."""
+    if not url or 'res.cloudinary.com' not in url:
+        return {}
+    public_id = extraer_public_id_de_url(url)
+    version = re.search(r'/upload/(?:[^/]+/)*?v(\d+)/', url)
+    return variantes_de_resultado(
+        {'public_id': public_id, 'version': version.group(1) if version else None}, **kwargs
+    )
@@ -0,0 +1,104 @@
+"""
+Contador de avance de las campañas (CampanaFundacion.prendas_donadas_count).
+
+Los listados de campañas muestran el avance sin contar transacciones: leen
+el contador de la propia fila. El contador sube cuando eventos.py despacha
+el evento de una donación completada (`sumar_prendas_donadas`) y se corrige
+con `reconciliar_prendas_donadas` (comando `reconciliar_contadores`), que lo
+recalcula con una sola consulta agrupada. La reconciliación cubre lo que no
+pasa por transiciones.py: transacciones borradas, editadas en el admin o
+cargadas con bulk_create. Cuenta también las transacciones archivadas
+(archivo.py).
+
+Como update() no dispara señales, aquí se invalidan versión y tarjetas.
+"""
+
+from collections import defaultdict
+
+from django.db.models import Count, F
+
+from .archivo import union_historica
+from .fragmentos import invalidar_fragmentos
+from .models import CampanaFundacion, TipoTransaccion, VersionTabla
+
+
+def _tras_actualizar(ids):
+    VersionTabla.incrementar(CampanaFundacion._meta.db_table)
+    invalidar_fragmentos(CampanaFundacion, ids)
+
+
+def _agrupar_por_valor(por_campana):
+    """{id_campana: n} -> {n: [ids]}, para escribir con un UPDATE por valor."""
+    por_valor = defaultdict(list)
+    for id_campana, n in por_campana.items():
+        por_valor[n].append(id_campana)
+    return por_valor
+
+
+def sumar_prendas_donadas(por_campana):
+    """
+    Suma donaciones completadas a los contadores.
+
+    Args:
+        por_campana: {id_campana: donaciones nuevas}
+    """
+    por_campana = {pk: n for pk, n in por_campana.items() if n}
+    if not por_campana:
+        return
+    for n, ids in _agrupar_por_valor(por_campana).items():
+        CampanaFundacion.objects.filter(pk__in=ids).update(prendas_donadas_count=F('prendas_donadas_count') + n)
+    _tras_actualizar(list(por_campana))
+
+
+def contar_prendas_donadas(campanas=None):
+    """
+    Cuenta las donaciones completadas desde las transacciones.
+
+    Args:
+        campanas: Ids de campañas a contar (opcional, todas por defecto)
+
+    Returns:
+        {id_campana: donaciones completadas, archivadas incluidas}; las campañas sin donaciones no aparecen
+    """
+    def donaciones_por_campana(transacciones):
+        transacciones = transacciones.filter(
+            campana__isnull=False,
+            estado='COMPLETADA',
+            tipo_id=TipoTransaccion.id_de(TipoTransaccion.DONACION),
+        )
+        if campanas is not None:
+            transacciones = transacciones.filter(campana_id__in=list(campanas))
+        return transacciones.values('campana_id').annotate(n=Count('pk')).order_by().values_list('campana_id', 'n')
+
+    # Incluye las archivadas: una campaña puede tener donaciones en ambas tablas
+    conteos = defaultdict(int)
+    for id_campana, n in union_historica(donaciones_por_campana):
+        conteos[id_campana] += n
+    return dict(conteos)
+
+
+def reconciliar_prendas_donadas(campanas=None):
+    """
+    Corrige los contadores que no coinciden con las transacciones.
+
+    Args:
+        campanas: Ids de campañas a revisar (opcional, todas por defecto)
+
+    Returns:
+        {id_campana: (valor guardado, valor real)} de las campañas corregidas
+    """
+    reales = contar_prendas_donadas(campanas)
+    guardados = CampanaFundacion.objects.all()
+    if campanas is not None:
+        guardados = guardados.filter(pk__in=list(campanas))
+    desfasadas = {
+        pk: (guardado, reales.get(pk, 0))
+        for pk, guardado in guardados.values_list('pk', 'prendas_donadas_count')
+        if guardado != reales.get(pk, 0)
+    }
+    if desfasadas:
+        por_campana = {pk: real for pk, (_, real) in desfasadas.items()}
+        for n, ids in _agrupar_por_valor(por_campana).items():
+            CampanaFundacion.objects.filter(pk__in=ids).update(prendas_donadas_count=n)
+        _tras_actualizar(list(desfasadas))
+    return desfasadas
@@ -0,0 +1,227 @@
+"""
+Despacho de la bandeja de salida de transacciones (EventoTransaccion).
+
+transiciones.py escribe un evento por cada cambio de estado dentro del mismo
+bloque atómico que el cambio, y pide un despacho en segundo plano para
+después del commit (tareas.encolar). El comando `despachar_eventos` barre lo
+que haya quedado pendiente (proceso caído, error en un manejador).
+
+Los eventos se procesan por lotes: cada manejador recibe todos los eventos
+del lote y escribe en bloque. Si el lote falla, se repite evento por evento
+para aislar el que falla; ese queda con `error` e `intentos` y se reintenta
+en los despachos siguientes hasta EVENTOS_MAX_INTENTOS.
+"""
+
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .carbon_utils import calcular_impacto_prenda
+from .contadores import sumar_prendas_donadas
+from .models import EventoTransaccion, ImpactoAmbiental, Mensaje, Usuario, VersionTabla
+from .resumenes import actualizar_resumenes_diarios, sumar_resumenes_mensuales
+from .tareas import encolar
+
+logger = logging.getLogger(__name__)
+
+LOTE_POR_DEFECTO = 200
+MAX_INTENTOS = getattr(settings, 'EVENTOS_MAX_INTENTOS', 5)
+
+# Un despacho a la vez por proceso (el pool de tareas tiene varios hilos)
+_candado = threading.Lock()
+
+
+def registrar_eventos(cambios, actor=None):
+    """
+    Escribe los eventos de `cambios` y programa su despacho. Debe llamarse
+    dentro del bloque atómico que hizo los cambios.
+
+    Args:
+        cambios: [(transaccion, estado_anterior)] con transaccion.estado ya nuevo
+        actor: Usuario que hizo el cambio (opcional)
+    """
+    EventoTransaccion.objects.bulk_create(
+        EventoTransaccion(
+            transaccion=transaccion,
+            estado_anterior=estado_anterior or '',
+            estado=transaccion.estado,
+            actor=actor,
+        )
+        for transaccion, estado_anterior in cambios
+    )
+    encolar(despachar_eventos)
+
+
+# ==============================================================================
+# MANEJADORES: reciben el lote completo y filtran los eventos que les tocan
+# ==============================================================================
+
+def _completadas(eventos):
+    return [evento for evento in eventos if evento.estado == 'COMPLETADA']
+
+
+def agradecer_donaciones(eventos):
+    """Mensaje de la fundación a cada donante cuya donación se completó."""
+    mensajes = []
+    for evento in _completadas(eventos):
+        transaccion = evento.transaccion
+        if not transaccion.es_donacion() or not transaccion.fundacion_id:
+            continue
+        emisor_id = evento.actor_id or transaccion.fundacion.representante_id
+        if not emisor_id:
+            continue
+        mensajes.append(Mensaje(
+            emisor_id=emisor_id,
+            receptor_id=transaccion.user_origen_id,
+            contenido=f"Gracias por tu donación de {transaccion.prenda.nombre}! Tu prenda ha sido recibida y será destinada a {transaccion.fundacion.nombre}.",
+            fecha_envio=evento.fecha_creacion,
+        ))
+    Mensaje.objects.bulk_create(mensajes)
+
+
+def verificar_logros_participantes(eventos):
+    """Logros de quienes participaron en transacciones completadas, una vez por usuario."""
+    from .views.logro import verificar_logros
+
+    ids = {
+        id_usuario
+        for evento in _completadas(eventos)
+        for id_usuario in (evento.transaccion.user_origen_id, evento.transaccion.user_destino_id)
+        if id_usuario
+    }
+    for usuario in Usuario.objects.filter(id_usuario__in=ids):
+        verificar_logros(usuario)
+
+
+def registrar_impacto(eventos):
+    """Guarda el impacto ambiental de las prendas reutilizadas que aún no lo tienen."""
+    prendas = {evento.transaccion.prenda_id: evento.transaccion.prenda for evento in _completadas(eventos)}
+    if not prendas:
+        return
+    con_impacto = set(
+        ImpactoAmbiental.objects.filter(prenda_id__in=prendas).values_list('prenda_id', flat=True)
+    )
+    nuevos = []
+    for id_prenda, prenda in prendas.items():
+        if id_prenda in con_impacto:
+            continue
+        impacto = calcular_impacto_prenda(prenda.categoria)
+        nuevos.append(ImpactoAmbiental(
+            prenda_id=id_prenda,
+            carbono_evitar_kg=impacto['carbono_evitado_kg'],
+            energia_ahorrada_kwh=impacto['energia_ahorrada_kwh'],
+        ))
+    if nuevos:
+        ImpactoAmbiental.objects.bulk_create(nuevos)
+        VersionTabla.incrementar(ImpactoAmbiental._meta.db_table)  # bulk_create no dispara señales
+
+
+def contar_donaciones_campanas(eventos):
+    """Suma las donaciones completadas al avance de sus campañas."""
+    sumar_prendas_donadas(Counter(
+        evento.transaccion.campana_id
+        for evento in _completadas(eventos)
+        if evento.transaccion.campana_id and evento.transaccion.es_donacion()
+    ))
+
+
+def actualizar_resumenes_fundaciones(eventos):
+    """Recalcula los días de las fundaciones con donaciones que cambiaron de estado."""
+    donaciones = [
+        evento.transaccion for evento in eventos
+        if evento.transaccion.fundacion_id and evento.transaccion.fecha_transaccion and evento.transaccion.es_donacion()
+    ]
+    actualizar_resumenes_diarios(
+        {t.fundacion_id for t in donaciones},
+        {timezone.localdate(t.fecha_transaccion) for t in donaciones},
+    )
+
+
+def sumar_impacto_mensual(eventos):
+    """Suma las transacciones completadas a los resúmenes mensuales de impacto."""
+    sumar_resumenes_mensuales([evento.transaccion for evento in _completadas(eventos)])
+
+
+# En orden: los resúmenes leen el impacto que registra `registrar_impacto`
+MANEJADORES = [
+    agradecer_donaciones,
+    verificar_logros_participantes,
+    registrar_impacto,
+    contar_donaciones_campanas,
+    actualizar_resumenes_fundaciones,
+    sumar_impacto_mensual,
+]
+
+
+# ==============================================================================
+# DESPACHO
+# ==============================================================================
+
+def _aplicar(eventos):
+    for manejador in MANEJADORES:
+        manejador(eventos)
+
+
+def _despachar_lote(lote, desde_pk):
+    """Procesa hasta `lote` eventos pendientes con id > desde_pk. Returns (ok, fallidos, último id)."""
+    with transaction.atomic():
+        # skip_locked: varios despachadores (procesos) se reparten la bandeja
+        eventos = list(
+            EventoTransaccion.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('transaccion__prenda', 'transaccion__fundacion')
+            .filter(fecha_procesado__isnull=True, intentos__lt=MAX_INTENTOS, pk__gt=desde_pk)
+            .order_by('pk')[:lote]
+        )
+        if not eventos:
+            return 0, 0, None
+
+        try:
+            with transaction.atomic():
+                _aplicar(eventos)
+            exitosos, fallidos = eventos, []
+        except Exception as e:
+            logger.warning(f"Lote de {len(eventos)} eventos falló ({e}); se procesan uno a uno")
+            exitosos, fallidos = [], []
+            for evento in eventos:
+                try:
+                    with transaction.atomic():
+                        _aplicar([evento])
+                    exitosos.append(evento)
+                except Exception as error:
+                    logger.exception(f"Evento {evento.pk} falló")
+                    evento.error = str(error)[:2000]
+                    fallidos.append(evento)
+
+        EventoTransaccion.objects.filter(pk__in=[evento.pk for evento in exitosos]).update(
+            fecha_procesado=timezone.now(), intentos=F('intentos') + 1, error=''
+        )
+        for evento in fallidos:
+            EventoTransaccion.objects.filter(pk=evento.pk).update(intentos=F('intentos') + 1, error=evento.error)
+    return len(exitosos), len(fallidos), eventos[-1].pk
+
+
+def despachar_eventos(lote=LOTE_POR_DEFECTO):
+    """
+    Procesa la bandeja de salida hasta vaciarla. Cada evento se intenta a lo
+    sumo una vez por llamada.
+
+    Returns:
+        (procesados, fallidos)
+    """
+    procesados = fallidos = 0
+    with _candado:
+        ultimo = 0
+        while True:
+            ok, con_error, ultimo = _despachar_lote(lote, ultimo)
+            procesados += ok
+            fallidos += con_error
+            if ultimo is None or ok + con_error < lote:
+                break
+    if procesados or fallidos:
+        logger.info(f"Eventos despachados: {procesados} procesados, {fallidos} con error")
+    return procesados, fallidos
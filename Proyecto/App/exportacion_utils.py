@@ -0,0 +1,75 @@
+"""
+Utilidades de exportación de datos en streaming (CSV y NDJSON).
+
+Las filas se leen con `values_list(...).iterator(chunk_size=...)` y se
+escriben a medida que el cliente las descarga: la memoria usada no depende
+del número de filas, y no se crean instancias de modelo ni serializers.
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+# Filas que se piden a la base de datos por cada viaje
+EXPORTACION_CHUNK_SIZE = 2000
+
+FORMATOS_EXPORTACION = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class _EcoBuffer:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _filas(queryset, columnas):
+    """Tuplas de valores de `columnas` (rutas de values_list), por bloques."""
+    rutas = [ruta for _, ruta in columnas]
+    return queryset.values_list(*rutas).iterator(chunk_size=EXPORTACION_CHUNK_SIZE)
+
+
+def generar_csv(queryset, columnas):
+    """Genera el CSV línea a línea, con BOM para que Excel lea bien los acentos."""
+    escritor = csv.writer(_EcoBuffer())
+    yield '\ufeff' + escritor.writerow([encabezado for encabezado, _ in columnas])
+    for fila in _filas(queryset, columnas):
+        yield escritor.writerow(fila)
+
+
+def generar_ndjson(queryset, columnas):
+    """Genera un objeto JSON por línea (Decimal como texto, fechas ISO 8601)."""
+    encabezados = [encabezado for encabezado, _ in columnas]
+    for fila in _filas(queryset, columnas):
+        yield json.dumps(dict(zip(encabezados, fila)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def respuesta_exportacion(queryset, columnas, formato, nombre_archivo):
+    """
+    StreamingHttpResponse con `queryset` exportado.
+
+    Args:
+        queryset: Filas a exportar (sin evaluar)
+        columnas: Lista de (encabezado, ruta para values_list)
+        formato: 'csv' o 'ndjson'
+        nombre_archivo: Nombre sin extensión para Content-Disposition
+
+    Raises:
+        ValueError: Si el formato no es soportado
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato no soportado: {formato}. Usa: {', '.join(FORMATOS_EXPORTACION)}")
+
+    generador = generar_csv if formato == 'csv' else generar_ndjson
+    respuesta = StreamingHttpResponse(
+        generador(queryset, columnas),
+        content_type=FORMATOS_EXPORTACION[formato],
+    )
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.{formato}"'
+    return respuesta
@@ -0,0 +1,73 @@
+"""
+Conteos por faceta (categoría, talla, estado) para los filtros del catálogo.
+
+Una sola consulta agrupada por las tres columnas devuelve cada combinación
+con su total; los conteos de cada faceta se suman en Python aplicando los
+filtros de las otras facetas (facetas disyuntivas: elegir una categoría no
+oculta las demás categorías, pero sí ajusta los conteos de talla y estado).
+"""
+
+import hashlib
+
+from django.db.models import Count
+
+from .cache_utils import cache_corto, clave_cache
+from .models import Prenda
+
+FACETAS_PRENDA = ('categoria', 'talla', 'estado')
+
+# Catálogo y búsqueda ya fijan estado='DISPONIBLE': esa faceta tendría un solo valor
+FACETAS_CATALOGO = ('categoria', 'talla')
+
+# Segundos que se reutilizan los conteos de un mismo filtro base
+FACETAS_CACHE_SEGUNDOS = 30
+
+
+def _combinaciones(queryset, facetas):
+    """[(valor de cada faceta..., total), ...] en una consulta."""
+    return list(
+        queryset.order_by()
+        .values_list(*facetas)
+        .annotate(total=Count('pk'))
+    )
+
+
+def calcular_facetas(queryset, seleccion, clave_base='', facetas=FACETAS_PRENDA):
+    """
+    Args:
+        queryset: Prendas con los filtros que NO son facetas (estado base, texto...)
+        seleccion: {faceta: valor elegido} con las facetas filtradas en la vista
+        clave_base: Texto que identifica los filtros de `queryset` para la caché
+        facetas: Columnas a contar (sin las que `queryset` ya fija)
+
+    Returns:
+        dict {faceta: [{'valor', 'etiqueta', 'total', 'seleccionado'}, ...]}
+    """
+    clave = clave_cache('facetas', ','.join(facetas), hashlib.md5(clave_base.encode()).hexdigest())
+    combinaciones = cache_corto(clave, lambda: _combinaciones(queryset, facetas), FACETAS_CACHE_SEGUNDOS)
+    etiquetas_estado = dict(Prenda.ESTADO_CHOICES)
+
+    resultado = {}
+    for posicion, faceta in enumerate(facetas):
+        otras = [
+            (i, seleccion[nombre]) for i, nombre in enumerate(facetas)
+            if nombre != faceta and seleccion.get(nombre)
+        ]
+        totales = {}
+        for fila in combinaciones:
+            if fila[posicion] and all(fila[i] == valor for i, valor in otras):
+                totales[fila[posicion]] = totales.get(fila[posicion], 0) + fila[-1]
+
+        elegido = seleccion.get(faceta)
+        if elegido and elegido not in totales:
+            totales[elegido] = 0
+        resultado[faceta] = [
+            {
+                'valor': valor,
+                'etiqueta': etiquetas_estado.get(valor, valor) if faceta == 'estado' else valor,
+                'total': total,
+                'seleccionado': valor == elegido,
+            }
+            for valor, total in sorted(totales.items())
+        ]
+    return resultado
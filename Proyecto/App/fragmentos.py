@@ -0,0 +1,69 @@
+"""
+Caché de fragmentos de plantilla por objeto (tarjetas de prendas, campañas
+y fundaciones).
+
+Cada objeto tiene un sello de versión en la caché (`ecoprenda:sello:<tabla>:<id>`).
+Las plantillas usan el sello como parte de la clave de `{% cache %}`:
+
+    {% cache fragmentos_segundos tarjeta_prenda prenda.pk prenda.sello_fragmento %}
+
+Al guardar o borrar el objeto (señales) se genera un sello nuevo, así que la
+tarjeta vieja deja de usarse sin tener que conocer sus claves. Las vistas
+leen los sellos de toda la página con un solo `get_many` (`anotar_sellos`).
+
+Las escrituras masivas (update, bulk_update) no disparan señales y deben
+llamar a `invalidar_fragmentos`.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache_utils import clave_cache
+
+# Vida máxima de una tarjeta aunque su objeto no cambie (datos relacionados
+# que no invalidan, como el nombre del dueño de una prenda)
+FRAGMENTOS_CACHE_SEGUNDOS = getattr(settings, 'FRAGMENTOS_CACHE_SEGUNDOS', 600)
+
+# Los sellos viven más que los fragmentos que dependen de ellos
+SELLOS_CACHE_SEGUNDOS = FRAGMENTOS_CACHE_SEGUNDOS * 2
+
+
+def _clave_sello(modelo, pk):
+    return clave_cache('sello', modelo._meta.db_table, pk)
+
+
+def _sello_nuevo():
+    return time.time_ns()
+
+
+def invalidar_fragmentos(modelo, pks):
+    """Da un sello nuevo a los objetos `pks` de `modelo`."""
+    sello = _sello_nuevo()
+    cache.set_many({_clave_sello(modelo, pk): sello for pk in pks}, SELLOS_CACHE_SEGUNDOS)
+
+
+def anotar_sellos(objetos, atributo='sello_fragmento'):
+    """
+    Asigna a cada objeto su sello (`objeto.sello_fragmento`) con una lectura
+    de caché. Los objetos sin sello (nunca vistos, o expulsados de la caché)
+    reciben uno nuevo: nunca se reutiliza una tarjeta de la que no se sabe si
+    está al día.
+
+    Returns:
+        La misma lista de objetos
+    """
+    objetos = list(objetos)
+    # Lista de pares (no dict): instancias distintas con el mismo pk, como la
+    # fundación de varias campañas, deben recibir todas el sello
+    claves = [(objeto, _clave_sello(type(objeto), objeto.pk)) for objeto in objetos]
+    sellos = cache.get_many({clave for _, clave in claves})
+    faltantes = {}
+    for objeto, clave in claves:
+        if clave not in sellos:
+            sellos[clave] = faltantes[clave] = _sello_nuevo()
+        setattr(objeto, atributo, sellos[clave])
+    if faltantes:
+        cache.set_many(faltantes, SELLOS_CACHE_SEGUNDOS)
+    return objetos
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from App.archivo import (
+    ARCHIVO_MESES, LOTE_POR_DEFECTO, archivables, archivar_transacciones, fecha_limite, particionar_archivo,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve a transaccion_archivada las transacciones completadas, rechazadas o canceladas '
+        'hace más de --meses meses, por lotes. Resúmenes, contadores y la exportación con '
+        '?archivo=1 las siguen contando. Con --particionar (PostgreSQL) convierte antes el '
+        'archivo en una tabla particionada por año.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=ARCHIVO_MESES, help='Antigüedad mínima en meses')
+        parser.add_argument('--lote', type=int, default=LOTE_POR_DEFECTO, help='Transacciones por lote')
+        parser.add_argument('--particionar', action='store_true', help='Particionar el archivo por año (solo PostgreSQL)')
+        parser.add_argument('--simular', action='store_true', help='Solo contar las transacciones que se archivarían')
+
+    def handle(self, *args, **options):
+        if options['meses'] < 1 or options['lote'] < 1:
+            raise CommandError('--meses y --lote deben ser mayores que cero.')
+
+        if options['particionar'] and not options['simular']:
+            try:
+                particionado = particionar_archivo()
+            except NotSupportedError as e:
+                raise CommandError(str(e))
+            self.stdout.write('Archivo particionado por año.' if particionado else 'El archivo ya estaba particionado.')
+
+        if options['simular']:
+            total = archivables(fecha_limite(options['meses'])).count()
+            self.stdout.write(f'Se archivarían {total} transacciones.')
+            return
+        total = archivar_transacciones(options['meses'], options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'Transacciones archivadas: {total}.'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from App.eventos import LOTE_POR_DEFECTO, MAX_INTENTOS, despachar_eventos
+from App.models import EventoTransaccion
+
+
+class Command(BaseCommand):
+    help = (
+        'Despacha la bandeja de salida de transacciones (mensajes, logros, impacto, avance de campañas, resúmenes diarios y mensuales). '
+        'Sin --continuo procesa lo pendiente y termina (útil en cron); con --continuo '
+        'queda revisando la bandeja cada --intervalo segundos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE_POR_DEFECTO, help='Eventos por lote')
+        parser.add_argument('--continuo', action='store_true', help='No terminar al vaciar la bandeja')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre revisiones con --continuo')
+
+    def handle(self, *args, **options):
+        while True:
+            procesados, fallidos = despachar_eventos(options['lote'])
+            if not options['continuo']:
+                break
+            if not procesados and not fallidos:
+                time.sleep(options['intervalo'])
+
+        agotados = EventoTransaccion.objects.filter(
+            fecha_procesado__isnull=True, intentos__gte=MAX_INTENTOS
+        ).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Eventos procesados: {procesados} (con error {fallidos}, sin más reintentos {agotados})."
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from App.cloudinary_utils import variantes_de_url
+from App.fragmentos import invalidar_fragmentos
+from App.models import Prenda, VersionTabla
+
+LOTE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula las variantes responsivas (miniatura/lista/detalle + srcset) de las '
+        'imágenes de prendas que ya están en Cloudinary. No sube ni descarga imágenes: '
+        'solo arma las URLs a partir del public_id.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help='Recalcula también las que ya tienen variantes')
+
+    def handle(self, *args, **options):
+        prendas = Prenda.objects.filter(imagen_prenda__contains='res.cloudinary.com')
+        if not options['todas']:
+            prendas = prendas.filter(imagen_variantes={})
+
+        pendientes, actualizadas = [], []
+        for prenda in prendas.only('id_prenda', 'imagen_prenda').iterator(chunk_size=LOTE):
+            prenda.imagen_variantes = variantes_de_url(prenda.imagen_prenda)
+            if prenda.imagen_variantes:
+                pendientes.append(prenda)
+            if len(pendientes) >= LOTE:
+                Prenda.objects.bulk_update(pendientes, ['imagen_variantes'])
+                actualizadas += [p.id_prenda for p in pendientes]
+                pendientes = []
+        if pendientes:
+            Prenda.objects.bulk_update(pendientes, ['imagen_variantes'])
+            actualizadas += [p.id_prenda for p in pendientes]
+
+        if actualizadas:
+            VersionTabla.incrementar(Prenda._meta.db_table)
+            invalidar_fragmentos(Prenda, actualizadas)
+        self.stdout.write(self.style.SUCCESS(f'Variantes calculadas para {len(actualizadas)} prendas.'))
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from App.models import SubidaImagen
+from App.subidas import procesar_subida
+
+
+class Command(BaseCommand):
+    help = (
+        'Reanuda las subidas de imágenes fallidas o interrumpidas (p. ej. por un '
+        'reinicio del servidor) usando el archivo temporal que conservan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutos', type=int, default=15,
+            help='Antigüedad a partir de la cual una subida PENDIENTE o SUBIENDO se considera interrumpida',
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(minutes=options['minutos'])
+        # Subidas que un worker dejó a medias: vuelven a la cola
+        SubidaImagen.objects.filter(
+            estado__in=['PENDIENTE', 'SUBIENDO'], fecha_actualizacion__lt=limite
+        ).update(estado='PENDIENTE')
+
+        ids = list(
+            SubidaImagen.objects.filter(estado__in=['PENDIENTE', 'FALLIDA'])
+            .exclude(estado='PENDIENTE', fecha_actualizacion__gte=limite)  # en manos de un worker activo
+            .order_by('fecha_creacion').values_list('pk', flat=True)
+        )
+        for id_subida in ids:
+            # Un intento por subida: las que fallen esperan a la próxima ejecución
+            procesar_subida(id_subida, reintentar=False)
+
+        fallidas = SubidaImagen.objects.filter(pk__in=ids, estado='FALLIDA').count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Subidas procesadas: {len(ids)} (completadas {len(ids) - fallidas}, fallidas {fallidas})."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from App.contadores import reconciliar_prendas_donadas
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula el avance de las campañas (prendas donadas) desde las transacciones '
+        'y corrige los contadores desfasados. Conviene programarlo (p. ej. cada noche).'
+    )
+
+    def handle(self, *args, **options):
+        desfasadas = reconciliar_prendas_donadas()
+        for id_campana, (guardado, real) in sorted(desfasadas.items()):
+            self.stdout.write(f'Campaña {id_campana}: {guardado} -> {real}')
+        self.stdout.write(self.style.SUCCESS(f'Contadores corregidos: {len(desfasadas)}.'))
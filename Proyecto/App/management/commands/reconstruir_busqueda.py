@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from App import busqueda
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea o regenera el índice de búsqueda de texto completo de prendas. '
+        'En SQLite, necesario si una migración reconstruyó la tabla prenda '
+        '(se pierden los triggers de prenda_fts).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Alias de la base de datos')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor == 'sqlite':
+            # Los triggers de una tabla reconstruida ya no existen: se recrean desde cero
+            busqueda.eliminar_indice_busqueda(connection)
+        if busqueda.crear_indice_busqueda(connection):
+            busqueda._disponible.pop(options['database'], None)
+            self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda listo ({connection.vendor}).'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'{connection.vendor} no soporta el índice; la búsqueda usará icontains.'
+            ))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from App import recomendaciones
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye el índice de prendas similares que usa el detalle de prenda. '
+        'Conviene programarlo (p. ej. cada noche): las prendas publicadas después '
+        'de la última reconstrucción solo reciben recomendaciones por categoría.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vecinos', type=int, default=recomendaciones.VECINOS_POR_PRENDA,
+            help='Vecinos guardados por prenda',
+        )
+        parser.add_argument(
+            '--clarifai', action='store_true',
+            help='Analiza con Clarifai las imágenes nuevas o cambiadas (lento, consume cuota)',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        indice = recomendaciones.construir_indice(
+            vecinos_por_prenda=options['vecinos'], usar_clarifai=options['clarifai'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice de recomendaciones listo: {indice.total_prendas} prendas, '
+            f'{indice.vecinos_por_prenda} vecinos cada una ({time.monotonic() - inicio:.1f} s).'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from App.resumenes import reconstruir_resumenes_diarios, reconstruir_resumenes_mensuales
+
+
+class Command(BaseCommand):
+    help = (
+        'Rehace desde las transacciones los resúmenes diarios de donaciones por fundación '
+        'y los mensuales de impacto (usuarios, fundaciones, plataforma). '
+        'Los despachos de eventos los mantienen al día; esto cubre la carga inicial y '
+        'los cambios hechos fuera de transiciones.py (admin, bulk_create).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día de los resúmenes diarios a reconstruir (AAAA-MM-DD); por defecto todo')
+        parser.add_argument('--sin-mensuales', action='store_true', help='No rehacer los resúmenes mensuales')
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            desde = parse_date(options['desde'])
+            if desde is None:
+                raise CommandError('Fecha --desde inválida (usa AAAA-MM-DD).')
+        filas = reconstruir_resumenes_diarios(desde=desde)
+        self.stdout.write(self.style.SUCCESS(f'Resúmenes diarios reconstruidos: {filas} filas.'))
+        if not options['sin_mensuales']:
+            filas = reconstruir_resumenes_mensuales()
+            self.stdout.write(self.style.SUCCESS(f'Resúmenes mensuales reconstruidos: {filas} filas.'))
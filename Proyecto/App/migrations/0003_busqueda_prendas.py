@@ -0,0 +1,24 @@
+# Índice de búsqueda de texto completo de prendas (ver App/busqueda.py)
+
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    from App.busqueda import crear_indice_busqueda
+    crear_indice_busqueda(schema_editor.connection)
+
+
+def eliminar_indice(apps, schema_editor):
+    from App.busqueda import eliminar_indice_busqueda
+    eliminar_indice_busqueda(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0002_version_tabla'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
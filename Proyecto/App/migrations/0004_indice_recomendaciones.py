@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0003_busqueda_prendas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndiceRecomendaciones',
+            fields=[
+                ('nombre', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('fecha_generacion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('total_prendas', models.PositiveIntegerField(default=0)),
+                ('vecinos_por_prenda', models.PositiveSmallIntegerField(default=0)),
+                ('ids', models.BinaryField(help_text='int32 little-endian: ids de prenda indexados, ordenados')),
+                ('vecinos', models.BinaryField(help_text='int32 little-endian: total_prendas x vecinos_por_prenda (0 = vacío)')),
+                ('puntajes', models.BinaryField(help_text='float32 little-endian: similitud de cada vecino')),
+                ('conceptos', models.JSONField(blank=True, default=dict, help_text='Conceptos Clarifai por prenda, reutilizados entre reconstrucciones')),
+            ],
+            options={
+                'db_table': 'indice_recomendaciones',
+            },
+        ),
+    ]
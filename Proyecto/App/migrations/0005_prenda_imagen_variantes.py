@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:15
+
+from django.db import migrations, models
+
+
+def recrear_triggers_busqueda(apps, schema_editor):
+    # En SQLite, AddField reconstruye la tabla prenda y se pierden los
+    # triggers de prenda_fts (ver App/busqueda.py)
+    from App import busqueda
+    if schema_editor.connection.vendor == 'sqlite':
+        busqueda.eliminar_indice_busqueda(schema_editor.connection)
+        busqueda.crear_indice_busqueda(schema_editor.connection)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0004_indice_recomendaciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prenda',
+            name='imagen_variantes',
+            field=models.JSONField(blank=True, default=dict, help_text='Variantes responsivas de imagen_prenda'),
+        ),
+        migrations.RunPython(recrear_triggers_busqueda, migrations.RunPython.noop),
+    ]
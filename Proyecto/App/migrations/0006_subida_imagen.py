@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0005_prenda_imagen_variantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubidaImagen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destino', models.CharField(choices=[('prenda', 'Imagen de prenda'), ('fundacion', 'Logo de fundación')], max_length=20)),
+                ('objeto_id', models.PositiveIntegerField(help_text='Id de la prenda o fundación que recibe la imagen')),
+                ('ruta_temporal', models.CharField(max_length=500)),
+                ('nombre_original', models.CharField(blank=True, max_length=255)),
+                ('tamano_bytes', models.PositiveBigIntegerField(default=0)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('SUBIENDO', 'Subiendo'), ('COMPLETADA', 'Completada'), ('FALLIDA', 'Fallida')], default='PENDIENTE', max_length=20)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('url_resultado', models.CharField(blank=True, max_length=500)),
+                ('fecha_creacion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'subida_imagen',
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='subida_imag_estado_d8cfbb_idx')],
+            },
+        ),
+    ]
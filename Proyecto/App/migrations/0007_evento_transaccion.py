@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0006_subida_imagen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoTransaccion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado_anterior', models.CharField(blank=True, max_length=20)),
+                ('estado', models.CharField(max_length=20)),
+                ('fecha_creacion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fecha_procesado', models.DateTimeField(blank=True, null=True)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('actor', models.ForeignKey(blank=True, help_text='Quién hizo el cambio', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='App.usuario')),
+                ('transaccion', models.ForeignKey(db_column='id_transaccion_id', on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='App.transaccion')),
+            ],
+            options={
+                'db_table': 'evento_transaccion',
+                'indexes': [models.Index(fields=['fecha_procesado', 'id'], name='evento_tran_fecha_p_ec34d2_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:29
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def contar_donaciones_existentes(apps, schema_editor):
+    # Mismo cálculo que App/contadores.py, con los modelos históricos
+    CampanaFundacion = apps.get_model('App', 'CampanaFundacion')
+    Transaccion = apps.get_model('App', 'Transaccion')
+    conteos = (
+        Transaccion.objects.filter(campana__isnull=False, estado='COMPLETADA', tipo__nombre_tipo='Donación')
+        .values('campana_id').annotate(n=Count('pk')).order_by()
+    )
+    for fila in conteos:
+        CampanaFundacion.objects.filter(pk=fila['campana_id']).update(prendas_donadas_count=fila['n'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0007_evento_transaccion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campanafundacion',
+            name='prendas_donadas_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(contar_donaciones_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+# Ids por consulta IN (SQLite admite 999 parámetros por sentencia)
+LOTE_IDS = 900
+
+
+def resumir_donaciones_existentes(apps, schema_editor):
+    # Mismo cálculo que App/resumenes.py, con los modelos históricos
+    ImpactoAmbiental = apps.get_model('App', 'ImpactoAmbiental')
+    ResumenDiarioFundacion = apps.get_model('App', 'ResumenDiarioFundacion')
+    Transaccion = apps.get_model('App', 'Transaccion')
+    donaciones = Transaccion.objects.filter(
+        fundacion__isnull=False, tipo__nombre_tipo='Donación', fecha_transaccion__isnull=False,
+    ).annotate(fecha=TruncDate('fecha_transaccion'))
+
+    filas = {}
+    for fila in (
+        donaciones.values('fundacion_id', 'fecha', 'estado', 'prenda__categoria').annotate(n=Count('pk')).order_by()
+    ):
+        categoria = fila['prenda__categoria'] or ''
+        filas[(fila['fundacion_id'], fila['fecha'], fila['estado'], categoria)] = ResumenDiarioFundacion(
+            fundacion_id=fila['fundacion_id'], fecha=fila['fecha'], estado=fila['estado'],
+            categoria=categoria, donaciones=fila['n'],
+        )
+
+    entregadas = list(
+        donaciones.filter(estado='COMPLETADA')
+        .values_list('fundacion_id', 'fecha', 'prenda__categoria', 'prenda_id').order_by()
+    )
+    prendas = list({fila[3] for fila in entregadas})
+    impacto_por_prenda = {}
+    for inicio in range(0, len(prendas), LOTE_IDS):
+        impacto_por_prenda.update(
+            (fila['prenda_id'], (fila['carbono'] or 0, fila['energia'] or 0))
+            for fila in ImpactoAmbiental.objects.filter(prenda_id__in=prendas[inicio:inicio + LOTE_IDS])
+            .values('prenda_id').annotate(carbono=Sum('carbono_evitar_kg'), energia=Sum('energia_ahorrada_kwh'))
+            .order_by()
+        )
+    for fundacion_id, fecha, categoria, prenda_id in entregadas:
+        carbono, energia = impacto_por_prenda.get(prenda_id, (0, 0))
+        fila = filas[(fundacion_id, fecha, 'COMPLETADA', categoria or '')]
+        fila.carbono_kg += carbono
+        fila.energia_kwh += energia
+
+    ResumenDiarioFundacion.objects.bulk_create(filas.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0008_campana_prendas_donadas_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioFundacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(max_length=20)),
+                ('categoria', models.CharField(blank=True, max_length=100)),
+                ('donaciones', models.PositiveIntegerField(default=0)),
+                ('carbono_kg', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('energia_kwh', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('fundacion', models.ForeignKey(db_column='id_fundacion_id', on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='App.fundacion')),
+            ],
+            options={
+                'db_table': 'resumen_diario_fundacion',
+                'constraints': [models.UniqueConstraint(fields=('fundacion', 'fecha', 'estado', 'categoria'), name='resumen_diario_unico')],
+            },
+        ),
+        migrations.RunPython(resumir_donaciones_existentes, migrations.RunPython.noop),
+    ]
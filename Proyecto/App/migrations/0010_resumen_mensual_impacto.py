@@ -0,0 +1,93 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:33
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+
+# Ids por consulta IN (SQLite admite 999 parámetros por sentencia)
+LOTE_IDS = 900
+
+
+def _decimal(valor):
+    return Decimal(str(round(float(valor or 0), 2)))
+
+
+def resumir_impacto_existente(apps, schema_editor):
+    # Mismo cálculo que App/resumenes.py, con los modelos históricos
+    from App.carbon_utils import calcular_impacto_prenda
+
+    ImpactoAmbiental = apps.get_model('App', 'ImpactoAmbiental')
+    ResumenMensualImpacto = apps.get_model('App', 'ResumenMensualImpacto')
+    Transaccion = apps.get_model('App', 'Transaccion')
+    completadas = [
+        fila for fila in Transaccion.objects.filter(estado='COMPLETADA').values_list(
+            'user_origen_id', 'fundacion_id', 'tipo__nombre_tipo', 'fecha_entrega', 'fecha_transaccion',
+            'prenda_id', 'prenda__categoria',
+        ).order_by()
+        if fila[3] or fila[4]
+    ]
+
+    prendas = list({fila[5] for fila in completadas})
+    registrados = {}
+    for inicio in range(0, len(prendas), LOTE_IDS):
+        registrados.update(
+            (fila['prenda_id'], (fila['carbono'] or 0, fila['energia'] or 0))
+            for fila in ImpactoAmbiental.objects.filter(prenda_id__in=prendas[inicio:inicio + LOTE_IDS])
+            .values('prenda_id').annotate(carbono=Sum('carbono_evitar_kg'), energia=Sum('energia_ahorrada_kwh'))
+            .order_by()
+        )
+
+    totales = defaultdict(lambda: [0, Decimal(0), Decimal(0), Decimal(0)])
+    for id_usuario, id_fundacion, tipo, fecha_entrega, fecha_transaccion, id_prenda, categoria in completadas:
+        base = calcular_impacto_prenda(categoria)
+        carbono, energia = registrados.get(id_prenda, (base['carbono_evitado_kg'], base['energia_ahorrada_kwh']))
+        impacto = (_decimal(carbono), _decimal(energia), _decimal(base['agua_ahorrada_litros']))
+        mes = timezone.localtime(fecha_entrega or fecha_transaccion).date().replace(day=1)
+        ambitos = [('PLATAFORMA', 0), ('USUARIO', id_usuario)]
+        if id_fundacion and tipo == 'Donación':
+            ambitos.append(('FUNDACION', id_fundacion))
+        for ambito, ambito_id in ambitos:
+            acumulado = totales[(ambito, ambito_id, mes, tipo or '')]
+            acumulado[0] += 1
+            for i, valor in enumerate(impacto, 1):
+                acumulado[i] += valor
+
+    ResumenMensualImpacto.objects.bulk_create([
+        ResumenMensualImpacto(
+            ambito=ambito, ambito_id=ambito_id, mes=mes, tipo=tipo,
+            transacciones=transacciones, carbono_kg=carbono, energia_kwh=energia, agua_litros=agua,
+        )
+        for (ambito, ambito_id, mes, tipo), (transacciones, carbono, energia, agua) in totales.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0009_resumen_diario_fundacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMensualImpacto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ambito', models.CharField(choices=[('USUARIO', 'Usuario'), ('FUNDACION', 'Fundación'), ('PLATAFORMA', 'Plataforma')], max_length=10)),
+                ('ambito_id', models.PositiveIntegerField(default=0, help_text='Id del usuario o la fundación; 0 para la plataforma')),
+                ('mes', models.DateField(help_text='Primer día del mes')),
+                ('tipo', models.CharField(help_text='Nombre del tipo de transacción', max_length=50)),
+                ('transacciones', models.PositiveIntegerField(default=0)),
+                ('carbono_kg', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('energia_kwh', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('agua_litros', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'resumen_mensual_impacto',
+                'constraints': [models.UniqueConstraint(fields=('ambito', 'ambito_id', 'mes', 'tipo'), name='resumen_mensual_unico')],
+            },
+        ),
+        migrations.RunPython(resumir_impacto_existente, migrations.RunPython.noop),
+    ]
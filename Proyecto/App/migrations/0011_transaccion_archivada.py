@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0010_resumen_mensual_impacto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransaccionArchivada',
+            fields=[
+                ('id_transaccion', models.IntegerField(db_column='id_transaccion', primary_key=True, serialize=False)),
+                ('fecha_transaccion', models.DateTimeField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ACEPTADA', 'Aceptada'), ('RESERVADA', 'Reservada'), ('EN_PROCESO', 'En Proceso de Entrega'), ('COMPLETADA', 'Completada'), ('RECHAZADA', 'Rechazada'), ('EN_DISPUTA', 'En Disputa'), ('CANCELADA', 'Cancelada')], max_length=20)),
+                ('destino_final', models.CharField(blank=True, max_length=300, null=True)),
+                ('fecha_entrega', models.DateTimeField(blank=True, null=True)),
+                ('en_disputa', models.BooleanField(default=False)),
+                ('razon_disputa', models.TextField(blank=True, null=True)),
+                ('fecha_disputa', models.DateTimeField(blank=True, null=True)),
+                ('direccion_retiro', models.CharField(blank=True, max_length=300, null=True)),
+                ('direccion_entrega', models.CharField(blank=True, max_length=300, null=True)),
+                ('peso_kg', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('dimensiones', models.CharField(blank=True, max_length=100, null=True)),
+                ('codigo_seguimiento_envio', models.CharField(blank=True, max_length=100, null=True)),
+                ('costo_envio', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('courier', models.CharField(blank=True, max_length=50, null=True)),
+                ('fecha_archivado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('campana', models.ForeignKey(blank=True, db_column='id_campana_id', db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='App.campanafundacion')),
+                ('fundacion', models.ForeignKey(blank=True, db_column='id_fundacion_id', db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='App.fundacion')),
+                ('prenda', models.ForeignKey(blank=True, db_column='id_prenda_id', db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='App.prenda')),
+                ('reportado_por', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='App.usuario')),
+                ('tipo', models.ForeignKey(blank=True, db_column='id_tipo_id', db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='App.tipotransaccion')),
+                ('user_destino', models.ForeignKey(blank=True, db_column='id_usuario_destino_id', db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='App.usuario')),
+                ('user_origen', models.ForeignKey(blank=True, db_column='id_usuario_origen_id', db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='App.usuario')),
+            ],
+            options={
+                'db_table': 'transaccion_archivada',
+                'indexes': [models.Index(fields=['fecha_transaccion'], name='transaccion_fecha_t_3ef505_idx')],
+            },
+        ),
+    ]
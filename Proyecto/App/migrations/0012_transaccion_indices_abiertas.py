@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0011_transaccion_archivada'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaccion',
+            name='transaccion_estado_f065ba_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaccion',
+            index=models.Index(fields=['estado', '-id_transaccion'], name='transaccion_estado_id'),
+        ),
+        migrations.AddIndex(
+            model_name='transaccion',
+            index=models.Index(fields=['fundacion', 'tipo', '-fecha_transaccion'], name='transaccion_fund_tipo_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='transaccion',
+            index=models.Index(condition=models.Q(('estado__in', ('PENDIENTE', 'RESERVADA', 'EN_PROCESO'))), fields=['fundacion', 'tipo', 'fecha_transaccion'], name='transaccion_fund_abiertas'),
+        ),
+        migrations.AddIndex(
+            model_name='transaccion',
+            index=models.Index(condition=models.Q(('estado__in', ('PENDIENTE', 'RESERVADA', 'EN_PROCESO'))), fields=['user_origen', '-id_transaccion'], name='transaccion_origen_abiertas'),
+        ),
+        migrations.AddIndex(
+            model_name='transaccion',
+            index=models.Index(condition=models.Q(('estado__in', ('PENDIENTE', 'RESERVADA', 'EN_PROCESO'))), fields=['user_destino', '-id_transaccion'], name='transaccion_destino_abiertas'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0012_transaccion_indices_abiertas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaccion',
+            name='prenda_ofrecida',
+            field=models.ForeignKey(blank=True, db_column='id_prenda_ofrecida_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transacciones_ofrecida', to='App.prenda'),
+        ),
+        migrations.AddField(
+            model_name='transaccionarchivada',
+            name='prenda_ofrecida',
+            field=models.ForeignKey(blank=True, db_column='id_prenda_ofrecida_id', db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='App.prenda'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0013_transaccion_prenda_ofrecida'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subidaimagen',
+            name='destino',
+            field=models.CharField(choices=[('prenda', 'Imagen de prenda'), ('fundacion', 'Logo de fundación'), ('usuario', 'Foto de perfil')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='subidaimagen',
+            name='objeto_id',
+            field=models.PositiveIntegerField(help_text='Id de la prenda, fundación o usuario que recibe la imagen'),
+        ),
+    ]
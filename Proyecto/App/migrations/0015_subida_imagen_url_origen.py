@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0014_subida_imagen_usuario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subidaimagen',
+            name='url_origen',
+            field=models.URLField(blank=True, max_length=500),
+        ),
+        migrations.AlterField(
+            model_name='subidaimagen',
+            name='ruta_temporal',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+    ]
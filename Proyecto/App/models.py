@@ -88,6 +88,17 @@ class Usuario(models.Model):
         return self.es_representante_fundacion() and self.fundacion_asignada is not None
     def obtener_fundacion(self):
         return self.fundacion_asignada if self.es_representante_fundacion() else None
+
+    @property
+    def url_imagen(self):
+        """
+        URL de la foto de perfil. Las subidas (subidas.py) guardan la URL
+        absoluta de Cloudinary en el campo; las locales, una ruta bajo MEDIA_ROOT.
+        """
+        if not self.imagen_usuario:
+            return ''
+        nombre = self.imagen_usuario.name
+        return nombre if nombre.startswith(('http://', 'https://')) else self.imagen_usuario.url
     
     def set_password(self, raw_password):
         """Hashea y asigna la contraseña de forma segura."""
@@ -168,7 +179,7 @@ class Fundacion(models.Model):
 
     def obtener_representantes(self): return self.representantes.all()
     def total_donaciones_recibidas(self):
-        return Transaccion.objects.filter(fundacion=self, tipo__nombre_tipo='Donación').count()
+        return Transaccion.objects.filter(fundacion=self, tipo_id=TipoTransaccion.id_de(TipoTransaccion.DONACION)).count()
     
     def save(self, *args, **kwargs):
         # Validación: Si activa=True, lat y lng son obligatorios.
@@ -178,7 +189,23 @@ class Fundacion(models.Model):
 
 # ------------------- Tipo Transaccion ----------------------
 
+# Registro en memoria de los tipos ({nombre_tipo: TipoTransaccion}); lo llena
+# TipoTransaccion.registro() y lo vacían las señales al editar un tipo. Las
+# señales solo llegan al proceso que hizo el cambio: si otro worker creó un
+# tipo, la primera búsqueda que no lo encuentra relee la tabla.
+_REGISTRO_TIPOS = None
+
+
 class TipoTransaccion(models.Model):
+    DONACION = 'Donación'
+    VENTA = 'Venta'
+    INTERCAMBIO = 'Intercambio'
+    DESCRIPCIONES = {
+        DONACION: 'Donación de prenda a fundación',
+        VENTA: 'Venta de prenda entre usuarios',
+        INTERCAMBIO: 'Intercambio de prendas entre usuarios',
+    }
+
     nombre_tipo = models.CharField(max_length=50)
     descripcion = models.CharField(max_length=200, blank=True, null=True)
 
@@ -187,8 +214,61 @@ class TipoTransaccion(models.Model):
 
     def __str__(self): return self.nombre_tipo
 
+    @classmethod
+    def registro(cls, recargar=False):
+        """{nombre_tipo: tipo}, leído una vez por proceso (o de nuevo con `recargar`)."""
+        global _REGISTRO_TIPOS
+        registro = _REGISTRO_TIPOS
+        if registro is None or recargar:
+            registro = {tipo.nombre_tipo: tipo for tipo in cls.objects.all()}
+            _REGISTRO_TIPOS = registro
+        return registro
+
+    @classmethod
+    def invalidar_registro(cls, **kwargs):
+        global _REGISTRO_TIPOS
+        _REGISTRO_TIPOS = None
+
+    @classmethod
+    def _buscar(cls, nombre):
+        """Tipo `nombre` del registro; si falta, relee la tabla una vez. None si no existe."""
+        tipo = cls.registro().get(nombre)
+        if tipo is None:
+            tipo = cls.registro(recargar=True).get(nombre)
+        return tipo
+
+    @classmethod
+    def obtener(cls, nombre):
+        """Tipo `nombre`; lo crea la primera vez (reemplaza los get_or_create de las vistas)."""
+        tipo = cls._buscar(nombre)
+        if tipo is None:
+            tipo, _ = cls.objects.get_or_create(nombre_tipo=nombre, defaults={'descripcion': cls.DESCRIPCIONES.get(nombre)})
+            cls.registro()[nombre] = tipo
+        return tipo
+
+    @classmethod
+    def id_de(cls, nombre):
+        """Id del tipo para filtrar por `tipo_id` sin unir tablas; None si aún no existe."""
+        tipo = cls._buscar(nombre)
+        return tipo.pk if tipo else None
+
+    @classmethod
+    def nombre_de(cls, id_tipo):
+        if id_tipo is None:
+            return None
+        for recargar in (False, True):
+            for nombre, tipo in cls.registro(recargar).items():
+                if tipo.pk == id_tipo:
+                    return nombre
+        return None
+
 # ------------------- Prenda ----------------------
 
+# SQLite: la búsqueda (busqueda.py) depende de los triggers prenda_fts_ai/ad/au
+# sobre esta tabla. Toda migración con AlterField/AddField sobre Prenda que
+# reconstruya la tabla los borra sin avisar: debe terminar con
+# migrations.RunPython(busqueda.recrear_indice_sqlite, migrations.RunPython.noop).
+# El check App.E001 avisa si faltan.
 class Prenda(models.Model):
     id_prenda = models.AutoField(primary_key=True)
     user = models.ForeignKey(Usuario, on_delete=models.CASCADE)  # Cambié a CASCADE y renombré a 'user'.
@@ -215,6 +295,8 @@ class Prenda(models.Model):
     cantidad = models.PositiveIntegerField(default=1, help_text="Cantidad disponible en stock")
     
     imagen_prenda = models.CharField(max_length=500, blank=True, null=True, help_text='URL de la imagen en Cloudinary')
+    # URLs por tamaño (miniatura/lista/detalle + srcset), calculadas al subir la imagen
+    imagen_variantes = models.JSONField(default=dict, blank=True, help_text='Variantes responsivas de imagen_prenda')
 
     class Meta:
         db_table = 'prenda'
@@ -223,24 +305,23 @@ class Prenda(models.Model):
             models.Index(fields=['categoria']),  # Para filtros por categoría.
         ]
 
-    def marcar_como_reservada(self):
-        self.estado = 'RESERVADA'
-        self.save()
-    def marcar_como_en_proceso(self):
-        self.estado = 'EN_PROCESO'
-        self.save()
-    def marcar_como_completada(self):
-        self.estado = 'COMPLETADA'
-        self.save()
-    def marcar_como_cancelada(self):
-        self.estado = 'CANCELADA'
-        self.save()
+    def _cambiar_estado(self, estado):
+        self.estado = estado
+        self.save(update_fields=['estado'])
+    def marcar_como_reservada(self): self._cambiar_estado('RESERVADA')
+    def marcar_como_en_proceso(self): self._cambiar_estado('EN_PROCESO')
+    def marcar_como_completada(self): self._cambiar_estado('COMPLETADA')
+    def marcar_como_cancelada(self): self._cambiar_estado('CANCELADA')
 
     def __str__(self): return self.nombre
     def esta_disponible(self): return self.estado == 'DISPONIBLE'  # Simplificado.
 
 # ------------------- Transaccion ----------------------
 
+# Estados en que una transacción sigue abierta (la prenda está apartada)
+ESTADOS_TRANSACCION_ABIERTOS = ('PENDIENTE', 'RESERVADA', 'EN_PROCESO')
+
+
 class Transaccion(models.Model):
     id_transaccion = models.AutoField(primary_key=True, db_column='id_transaccion')
     prenda = models.ForeignKey(Prenda, on_delete=models.CASCADE, db_column='id_prenda_id')  # Cambié a CASCADE y renombré.
@@ -249,6 +330,8 @@ class Transaccion(models.Model):
     user_destino = models.ForeignKey(Usuario, on_delete=models.CASCADE, blank=True, null=True, related_name='transacciones_destino', db_column='id_usuario_destino_id')  # Cambié a CASCADE.
     fundacion = models.ForeignKey(Fundacion, on_delete=models.SET_NULL, blank=True, null=True, db_column='id_fundacion_id')  # Cambié a SET_NULL.
     campana = models.ForeignKey('CampanaFundacion', on_delete=models.SET_NULL, blank=True, null=True, db_column='id_campana_id')  # Cambié a SET_NULL.
+    # Intercambios: prenda que ofrece user_origen; sigue el mismo estado que `prenda`
+    prenda_ofrecida = models.ForeignKey(Prenda, on_delete=models.SET_NULL, blank=True, null=True, related_name='transacciones_ofrecida', db_column='id_prenda_ofrecida_id')
     fecha_transaccion = models.DateTimeField(default=timezone.now, blank=True, null=True)
     
     ESTADO_CHOICES = [
@@ -317,30 +400,97 @@ class Transaccion(models.Model):
         help_text='Nombre del courier (ej: Chilexpress, Correos, etc.)'
     )
 
+    ESTADOS_ABIERTOS = ESTADOS_TRANSACCION_ABIERTOS
+
     class Meta:
         db_table = 'transaccion'
+        # Índices según las consultas de las vistas (ver TransaccionIndicesTests).
+        # Los parciales solo guardan transacciones abiertas: son pequeños
+        # aunque el historial crezca. Las llaves foráneas ya tienen el suyo.
         indexes = [
-            models.Index(fields=['estado']),  # Para consultas por estado.
+            models.Index(fields=['estado', '-id_transaccion'], name='transaccion_estado_id'),  # API por estado (cursor -pk).
             models.Index(fields=['fecha_transaccion']),  # Para ordenar por fecha.
+            # Donaciones de una fundación, más recientes primero (detalle, panel, estadísticas)
+            models.Index(fields=['fundacion', 'tipo', '-fecha_transaccion'], name='transaccion_fund_tipo_fecha'),
+            # Donaciones por atender (gestionar_donaciones), en orden de llegada
+            models.Index(
+                fields=['fundacion', 'tipo', 'fecha_transaccion'], name='transaccion_fund_abiertas',
+                condition=models.Q(estado__in=ESTADOS_TRANSACCION_ABIERTOS),
+            ),
+            # Transacciones abiertas de un usuario (API ?usuario=&estado=)
+            models.Index(
+                fields=['user_origen', '-id_transaccion'], name='transaccion_origen_abiertas',
+                condition=models.Q(estado__in=ESTADOS_TRANSACCION_ABIERTOS),
+            ),
+            models.Index(
+                fields=['user_destino', '-id_transaccion'], name='transaccion_destino_abiertas',
+                condition=models.Q(estado__in=ESTADOS_TRANSACCION_ABIERTOS),
+            ),
         ]
 
     def __str__(self):
         return f"{self.tipo.nombre_tipo} - {self.prenda.nombre}"
-    def es_donacion(self): return self.tipo.nombre_tipo == 'Donación'
+    def es_donacion(self): return self.tipo_id == TipoTransaccion.id_de(TipoTransaccion.DONACION)
+    def nombre_tipo(self): return TipoTransaccion.nombre_de(self.tipo_id)
+
+    @staticmethod
+    def contar_por_tipo(transacciones):
+        """{nombre_tipo: total, ..., 'total': n} con una consulta agrupada por tipo_id."""
+        totales = dict.fromkeys(TipoTransaccion.DESCRIPCIONES, 0)
+        filas = transacciones.order_by().values_list('tipo_id').annotate(n=models.Count('pk'))
+        for id_tipo, n in filas:
+            totales[TipoTransaccion.nombre_de(id_tipo)] = n
+        totales['total'] = sum(totales.values())
+        return totales
     
-    def actualizar_disponibilidad_prenda(self):
+    # Transiciones permitidas (transiciones.py las aplica con bloqueo de filas)
+    TRANSICIONES = {
+        'PENDIENTE': ('ACEPTADA', 'RESERVADA', 'EN_PROCESO', 'RECHAZADA', 'CANCELADA'),
+        'ACEPTADA': ('RESERVADA', 'EN_PROCESO', 'CANCELADA'),
+        'RESERVADA': ('EN_PROCESO', 'CANCELADA'),
+        'EN_PROCESO': ('COMPLETADA', 'EN_DISPUTA', 'CANCELADA'),
+        'EN_DISPUTA': ('COMPLETADA', 'CANCELADA'),
+        'COMPLETADA': (),
+        'RECHAZADA': (),
+        'CANCELADA': (),
+    }
+
+    # Estado de la prenda según el de la transacción (sin entrada: no cambia)
+    ESTADO_PRENDA = {
+        'PENDIENTE': 'EN_PROCESO',
+        'ACEPTADA': 'RESERVADA',
+        'RESERVADA': 'RESERVADA',
+        'EN_PROCESO': 'EN_PROCESO',
+        'RECHAZADA': 'DISPONIBLE',
+        'CANCELADA': 'DISPONIBLE',
+    }
+    ESTADO_PRENDA_COMPLETADA = {
+        TipoTransaccion.DONACION: 'DONADA',
+        TipoTransaccion.VENTA: 'VENDIDA',
+        TipoTransaccion.INTERCAMBIO: 'INTERCAMBIADA',
+    }
+
+    def estado_prenda(self):
+        """Estado que le corresponde a la prenda, o None si no cambia."""
         if self.estado == 'COMPLETADA':
-            if self.tipo.nombre_tipo == 'Donación':
-                self.prenda.estado = 'DONADA'  # Asumiendo que agregas 'DONADA' a choices si no está.
-            elif self.tipo.nombre_tipo == 'Venta':
-                self.prenda.estado = 'VENDIDA'
-            elif self.tipo.nombre_tipo == 'Intercambio':
-                self.prenda.estado = 'INTERCAMBIADA'
-        elif self.estado in ['PENDIENTE', 'EN_PROCESO']:
-            self.prenda.estado = 'EN_PROCESO'
-        elif self.estado in ['RECHAZADA', 'CANCELADA']:
-            self.prenda.estado = 'DISPONIBLE'
-        self.prenda.save()
+            return self.ESTADO_PRENDA_COMPLETADA.get(self.nombre_tipo())
+        if self.estado == 'PENDIENTE' and self.es_donacion():
+            return 'RESERVADA'  # La donación aparta la prenda desde que se crea
+        return self.ESTADO_PRENDA.get(self.estado)
+
+    def actualizar_disponibilidad_prenda(self):
+        """
+        Lleva la prenda (y la ofrecida, en intercambios) a su estado; solo
+        escribe la columna estado, y solo si cambia.
+        """
+        nuevo_estado = self.estado_prenda()
+        if not nuevo_estado:
+            return
+        prendas = [self.prenda, self.prenda_ofrecida] if self.prenda_ofrecida_id else [self.prenda]
+        for prenda in prendas:
+            if prenda.estado != nuevo_estado:
+                prenda.estado = nuevo_estado
+                prenda.save(update_fields=['estado'])
 
     def save(self, *args, **kwargs):
         # Validación: Si estado == 'EN_PROCESO', direccion_entrega es obligatoria.
@@ -499,6 +649,8 @@ class CampanaFundacion(models.Model):
     objetivo_prendas = models.IntegerField(help_text='Meta de prendas a recolectar')
     activa = models.BooleanField(default=True)
     categorias_solicitadas = models.CharField(max_length=300, help_text='Categorías separadas por comas')
+    # Donaciones completadas; lo mantiene contadores.py (ver eventos.py)
+    prendas_donadas_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         db_table = 'campana_fundacion'
@@ -510,14 +662,10 @@ class CampanaFundacion(models.Model):
     def __str__(self): return f"{self.nombre} - {self.fundacion.nombre}"
 
     def prendas_donadas(self):
-        return Transaccion.objects.filter(
-            campana=self,  # Ajusté nombre de campo.
-            estado='COMPLETADA',
-            tipo__nombre_tipo='Donación'  # Ajusté nombre de campo.
-        ).count()
+        return self.prendas_donadas_count
     
     def porcentaje_completado(self):
-        donadas = self.prendas_donadas()
+        donadas = self.prendas_donadas_count
         if self.objetivo_prendas > 0:
             return min(100, (donadas / self.objetivo_prendas) * 100)
         return 0
@@ -529,4 +677,235 @@ class CampanaFundacion(models.Model):
         super().save(*args, **kwargs)
 
         # xdxdxdxdxd
- 
\ No newline at end of file
+ 
+# ------------------- Versiones de tablas ----------------------
+
+class VersionTabla(models.Model):
+    """
+    Contador de cambios por tabla. Se incrementa al guardar o borrar filas
+    (ver signals.py) y sirve de sello barato para ETag y cachés: comparar la
+    versión cuesta una consulta por clave primaria en vez del listado completo.
+    Las escrituras masivas (update, bulk_create) deben llamar a `incrementar`.
+    """
+    tabla = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    fecha_modificacion = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'version_tabla'
+
+    def __str__(self): return f"{self.tabla} v{self.version}"
+
+    @classmethod
+    def incrementar(cls, tabla):
+        actualizadas = cls.objects.filter(tabla=tabla).update(
+            version=models.F('version') + 1, fecha_modificacion=timezone.now()
+        )
+        if not actualizadas:
+            cls.objects.get_or_create(tabla=tabla, defaults={'version': 1})
+
+    @classmethod
+    def obtener(cls, tablas):
+        """Devuelve {tabla: (version, fecha_modificacion)}; las tablas sin cambios no aparecen."""
+        return {
+            v.tabla: (v.version, v.fecha_modificacion)
+            for v in cls.objects.filter(tabla__in=list(tablas))
+        }
+
+
+class IndiceRecomendaciones(models.Model):
+    """
+    Índice de prendas similares generado fuera de línea (ver recomendaciones.py
+    y el comando `reconstruir_recomendaciones`). Cada prenda indexada guarda sus
+    vecinos más cercanos en arreglos binarios compactos; la consulta en línea
+    solo lee un tramo de esos arreglos y filtra las DISPONIBLE.
+    """
+    nombre = models.CharField(max_length=50, primary_key=True)
+    fecha_generacion = models.DateTimeField(default=timezone.now)
+    total_prendas = models.PositiveIntegerField(default=0)
+    vecinos_por_prenda = models.PositiveSmallIntegerField(default=0)
+    ids = models.BinaryField(help_text='int32 little-endian: ids de prenda indexados, ordenados')
+    vecinos = models.BinaryField(help_text='int32 little-endian: total_prendas x vecinos_por_prenda (0 = vacío)')
+    puntajes = models.BinaryField(help_text='float32 little-endian: similitud de cada vecino')
+    conceptos = models.JSONField(default=dict, blank=True, help_text='Conceptos Clarifai por prenda, reutilizados entre reconstrucciones')
+
+    class Meta:
+        db_table = 'indice_recomendaciones'
+
+    def __str__(self): return f"{self.nombre} ({self.total_prendas} prendas, {self.fecha_generacion:%Y-%m-%d %H:%M})"
+
+
+class SubidaImagen(models.Model):
+    """
+    Subida de imagen en segundo plano (ver subidas.py). El archivo queda en
+    almacenamiento temporal hasta que el worker lo sube; si la subida falla,
+    la fila conserva la ruta y se puede reintentar sin que el usuario vuelva
+    a enviar la imagen. Las imágenes que llegan como URL (alta masiva por la
+    API) no tienen archivo temporal: el backend las toma desde url_origen.
+    """
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('SUBIENDO', 'Subiendo'),
+        ('COMPLETADA', 'Completada'),
+        ('FALLIDA', 'Fallida'),
+    ]
+    DESTINO_CHOICES = [
+        ('prenda', 'Imagen de prenda'),
+        ('fundacion', 'Logo de fundación'),
+        ('usuario', 'Foto de perfil'),
+    ]
+    destino = models.CharField(max_length=20, choices=DESTINO_CHOICES)
+    objeto_id = models.PositiveIntegerField(help_text='Id de la prenda, fundación o usuario que recibe la imagen')
+    ruta_temporal = models.CharField(max_length=500, blank=True)
+    url_origen = models.URLField(max_length=500, blank=True)
+    nombre_original = models.CharField(max_length=255, blank=True)
+    tamano_bytes = models.PositiveBigIntegerField(default=0)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    url_resultado = models.CharField(max_length=500, blank=True)
+    fecha_creacion = models.DateTimeField(default=timezone.now)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'subida_imagen'
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+
+    def __str__(self): return f"Subida {self.pk} ({self.destino} {self.objeto_id}): {self.estado}"
+
+
+class EventoTransaccion(models.Model):
+    """
+    Bandeja de salida (outbox) de los cambios de estado de transacciones. Se
+    escribe en la misma transacción de base de datos que el cambio
+    (transiciones.py) y la despacha eventos.py: mensajes, logros, impacto y
+    contadores quedan fuera de la petición, pero no se pierden si el proceso
+    cae a mitad de camino.
+    """
+    transaccion = models.ForeignKey(Transaccion, on_delete=models.CASCADE, related_name='eventos', db_column='id_transaccion_id')
+    estado_anterior = models.CharField(max_length=20, blank=True)
+    estado = models.CharField(max_length=20)
+    actor = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', help_text='Quién hizo el cambio')
+    fecha_creacion = models.DateTimeField(default=timezone.now)
+    fecha_procesado = models.DateTimeField(null=True, blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'evento_transaccion'
+        indexes = [
+            models.Index(fields=['fecha_procesado', 'id']),  # Pendientes en orden de llegada.
+        ]
+
+    def __str__(self): return f"Evento {self.pk}: transacción {self.transaccion_id} {self.estado_anterior or '-'} -> {self.estado}"
+
+
+# ------------------- Resúmenes ----------------------
+
+class ResumenDiarioFundacion(models.Model):
+    """
+    Donaciones de una fundación agrupadas por día (de la transacción), estado
+    y categoría de la prenda, con el impacto de las completadas. Los paneles
+    de la fundación leen de aquí en vez de recorrer sus transacciones; lo
+    mantiene resumenes.py.
+    """
+    fundacion = models.ForeignKey(Fundacion, on_delete=models.CASCADE, related_name='resumenes_diarios', db_column='id_fundacion_id')
+    fecha = models.DateField()
+    estado = models.CharField(max_length=20)
+    categoria = models.CharField(max_length=100, blank=True)
+    donaciones = models.PositiveIntegerField(default=0)
+    carbono_kg = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    energia_kwh = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'resumen_diario_fundacion'
+        constraints = [
+            # También sirve para leer rangos de fechas de una fundación.
+            models.UniqueConstraint(fields=['fundacion', 'fecha', 'estado', 'categoria'], name='resumen_diario_unico'),
+        ]
+
+    def __str__(self): return f"{self.fundacion_id} {self.fecha} {self.estado} {self.categoria}: {self.donaciones}"
+
+
+class ResumenMensualImpacto(models.Model):
+    """
+    Impacto de las transacciones completadas por mes, tipo de transacción y
+    ámbito: un usuario (quien entrega la prenda), una fundación (donaciones
+    recibidas) o toda la plataforma. Informes y gráficos leen O(meses) filas;
+    lo mantiene resumenes.py.
+    """
+    AMBITO_USUARIO = 'USUARIO'
+    AMBITO_FUNDACION = 'FUNDACION'
+    AMBITO_PLATAFORMA = 'PLATAFORMA'
+    AMBITO_CHOICES = [
+        (AMBITO_USUARIO, 'Usuario'),
+        (AMBITO_FUNDACION, 'Fundación'),
+        (AMBITO_PLATAFORMA, 'Plataforma'),
+    ]
+
+    ambito = models.CharField(max_length=10, choices=AMBITO_CHOICES)
+    ambito_id = models.PositiveIntegerField(default=0, help_text='Id del usuario o la fundación; 0 para la plataforma')
+    mes = models.DateField(help_text='Primer día del mes')
+    tipo = models.CharField(max_length=50, help_text='Nombre del tipo de transacción')
+    transacciones = models.PositiveIntegerField(default=0)
+    carbono_kg = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    energia_kwh = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    agua_litros = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'resumen_mensual_impacto'
+        constraints = [
+            # También sirve para leer la serie de un ámbito en orden de mes.
+            models.UniqueConstraint(fields=['ambito', 'ambito_id', 'mes', 'tipo'], name='resumen_mensual_unico'),
+        ]
+
+    def __str__(self): return f"{self.ambito} {self.ambito_id} {self.mes:%Y-%m} {self.tipo}: {self.transacciones}"
+
+
+# ------------------- Archivo de transacciones ----------------------
+
+class TransaccionArchivada(models.Model):
+    """
+    Transacciones terminadas (completadas, rechazadas, canceladas) y antiguas,
+    movidas fuera de `transaccion` por archivo.py para que las consultas de
+    todos los días recorran solo las recientes o abiertas.
+
+    Conserva el id y los campos de Transaccion con los mismos nombres, así
+    que las mismas consultas sirven para ambas tablas (archivo.union_historica).
+    Las relaciones no tienen restricción en la base de datos ni borran en
+    cascada: el historial sobrevive al borrado de prendas o usuarios.
+    """
+    id_transaccion = models.IntegerField(primary_key=True, db_column='id_transaccion')
+    prenda = models.ForeignKey(Prenda, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+', db_column='id_prenda_id')
+    tipo = models.ForeignKey(TipoTransaccion, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+', db_column='id_tipo_id')
+    user_origen = models.ForeignKey(Usuario, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+', db_column='id_usuario_origen_id')
+    user_destino = models.ForeignKey(Usuario, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+', db_column='id_usuario_destino_id')
+    fundacion = models.ForeignKey(Fundacion, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+', db_column='id_fundacion_id')
+    campana = models.ForeignKey('CampanaFundacion', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+', db_column='id_campana_id')
+    prenda_ofrecida = models.ForeignKey(Prenda, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+', db_column='id_prenda_ofrecida_id')
+    fecha_transaccion = models.DateTimeField()  # Clave de partición en PostgreSQL (archivo.py)
+    estado = models.CharField(max_length=20, choices=Transaccion.ESTADO_CHOICES)
+    destino_final = models.CharField(max_length=300, blank=True, null=True)
+    fecha_entrega = models.DateTimeField(blank=True, null=True)
+    en_disputa = models.BooleanField(default=False)
+    razon_disputa = models.TextField(null=True, blank=True)
+    reportado_por = models.ForeignKey(Usuario, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    fecha_disputa = models.DateTimeField(null=True, blank=True)
+    direccion_retiro = models.CharField(max_length=300, blank=True, null=True)
+    direccion_entrega = models.CharField(max_length=300, blank=True, null=True)
+    peso_kg = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
+    dimensiones = models.CharField(max_length=100, blank=True, null=True)
+    codigo_seguimiento_envio = models.CharField(max_length=100, blank=True, null=True)
+    costo_envio = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    courier = models.CharField(max_length=50, blank=True, null=True)
+    fecha_archivado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'transaccion_archivada'
+        indexes = [
+            models.Index(fields=['fecha_transaccion']),  # Reportes por rango de fechas.
+        ]
+
+    def __str__(self): return f"Transacción archivada {self.pk} ({self.estado})"
@@ -0,0 +1,343 @@
+"""
+Recomendaciones de prendas similares ("más como esta").
+
+El índice se genera fuera de línea con `python manage.py reconstruir_recomendaciones`:
+
+- Cada prenda se describe con su categoría, su talla, los términos de
+  nombre/descripción (TF-IDF) y, si se pidió, los conceptos que Clarifai
+  detecta en su imagen.
+- La similitud es una suma ponderada: misma categoría + misma talla +
+  coseno de términos + coseno de conceptos.
+- Los candidatos se obtienen con un índice invertido de términos y conceptos
+  (no se comparan todos los pares) y se completan con prendas de la misma
+  categoría y talla.
+- Por cada prenda se guardan sus VECINOS_POR_PRENDA mejores candidatos en
+  arreglos int32/float32 (modelo IndiceRecomendaciones).
+
+La consulta en línea (`prendas_similares`) hace una búsqueda binaria en los
+ids y una consulta por clave primaria que deja solo las DISPONIBLE. Las
+prendas publicadas después de la última reconstrucción no están en el índice:
+para ellas se devuelven las más recientes de la misma categoría.
+"""
+
+import bisect
+import heapq
+import logging
+import math
+import re
+import sys
+import time
+import unicodedata
+from array import array
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .models import IndiceRecomendaciones, Prenda
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_INDICE = 'prendas'
+
+# Vecinos guardados por prenda: más de los que se muestran, porque al
+# consultar se descartan los que ya no están disponibles
+VECINOS_POR_PRENDA = 30
+SIMILARES_POR_DEFECTO = 6
+
+# Pesos de cada parte de la similitud (el máximo posible es su suma)
+PESO_CATEGORIA = 3.0
+PESO_TALLA = 1.0
+PESO_TEXTO = 2.0
+PESO_CONCEPTOS = 2.0
+
+# Estados que pueden aparecer como vecinos al construir el índice
+# (una prenda reservada puede volver a estar disponible)
+ESTADOS_CANDIDATOS = ('DISPONIBLE', 'RESERVADA')
+
+# Términos presentes en más de esta fracción de prendas no aportan (p. ej. 'talla')
+FRACCION_MAXIMA_TERMINO = 0.2
+CONFIANZA_MINIMA_CONCEPTO = 0.5
+
+# Cada cuánto se comprueba si hay un índice más nuevo en la base de datos
+RECARGA_SEGUNDOS = 60
+
+PALABRAS_VACIAS = frozenset(
+    'con para por una uno unos unas los las del que muy poco sin sus esta este '
+    'estos estas como mas pero tiene solo son'.split()
+)
+
+
+def _normalizar(texto):
+    """'Pantalón AZUL' -> 'pantalon azul'."""
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def terminos_prenda(nombre, descripcion):
+    """{término: peso}; los del nombre cuentan el doble que los de la descripción."""
+    pesos = defaultdict(float)
+    for texto, peso in ((nombre, 2.0), (descripcion, 1.0)):
+        for termino in re.findall(r'[a-z0-9]+', _normalizar(texto)):
+            if len(termino) >= 3 and termino not in PALABRAS_VACIAS:
+                pesos[termino] += peso
+    return pesos
+
+
+def _normalizar_vector(vector):
+    norma = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norma for k, v in vector.items()} if norma else {}
+
+
+def _tf_idf(documentos, candidatos):
+    """
+    documentos: {id: {término: peso}}. Devuelve vectores unitarios TF-IDF
+    (sin los términos demasiado frecuentes) y el índice invertido
+    {término: [(id, peso), ...]} restringido a `candidatos`.
+    """
+    frecuencia = defaultdict(int)
+    for terminos in documentos.values():
+        for termino in terminos:
+            frecuencia[termino] += 1
+    total = len(documentos) or 1
+    maximo = max(10, int(total * FRACCION_MAXIMA_TERMINO))  # catálogos pequeños: sin tope
+
+    vectores, invertido = {}, defaultdict(list)
+    for id_prenda, terminos in documentos.items():
+        vector = _normalizar_vector({
+            termino: peso * math.log(1 + total / frecuencia[termino])
+            for termino, peso in terminos.items()
+            if frecuencia[termino] <= maximo
+        })
+        vectores[id_prenda] = vector
+        if id_prenda in candidatos:
+            for termino, peso in vector.items():
+                invertido[termino].append((id_prenda, peso))
+    return vectores, invertido
+
+
+def _conceptos_clarifai(imagen_url):
+    """{concepto: confianza} detectados por Clarifai en la imagen (vacío si falla)."""
+    from .clarifai_utils import detectar_prendas_imagen, ClarifaiError
+    try:
+        detectados = detectar_prendas_imagen(imagen_url=imagen_url)
+    except ClarifaiError as e:
+        logger.warning(f"Clarifai no pudo analizar {imagen_url}: {e}")
+        return {}
+    conceptos = {}
+    for detectado in detectados:
+        if detectado['confianza'] >= CONFIANZA_MINIMA_CONCEPTO:
+            nombre = detectado['nombre'].lower()
+            conceptos[nombre] = max(conceptos.get(nombre, 0.0), detectado['confianza'])
+    return conceptos
+
+
+def _a_bytes(arreglo):
+    if sys.byteorder != 'little':
+        arreglo = array(arreglo.typecode, arreglo)
+        arreglo.byteswap()
+    return arreglo.tobytes()
+
+
+def _de_bytes(typecode, datos):
+    arreglo = array(typecode)
+    arreglo.frombytes(bytes(datos))
+    if sys.byteorder != 'little':
+        arreglo.byteswap()
+    return arreglo
+
+
+# ==============================================================================
+# CONSTRUCCIÓN (fuera de línea)
+# ==============================================================================
+
+def construir_indice(vecinos_por_prenda=VECINOS_POR_PRENDA, usar_clarifai=False):
+    """
+    Recalcula el índice completo y lo guarda.
+
+    Args:
+        vecinos_por_prenda: Vecinos guardados por prenda
+        usar_clarifai: Analiza con Clarifai las imágenes que aún no tienen
+            conceptos (o cuya URL cambió). Sin esta opción se reutilizan los
+            conceptos del índice anterior.
+
+    Returns:
+        IndiceRecomendaciones guardado
+    """
+    anterior = IndiceRecomendaciones.objects.filter(nombre=NOMBRE_INDICE).only('conceptos').first()
+    conceptos_guardados = anterior.conceptos if anterior else {}
+
+    filas = list(
+        Prenda.objects.order_by('id_prenda').values_list(
+            'id_prenda', 'categoria', 'talla', 'nombre', 'descripcion', 'imagen_prenda', 'estado'
+        )
+    )
+    categorias, tallas, documentos, conceptos, candidatos = {}, {}, {}, {}, set()
+    conceptos_nuevos = {}
+    for id_prenda, categoria, talla, nombre, descripcion, imagen, estado in filas:
+        categorias[id_prenda] = categoria
+        tallas[id_prenda] = talla
+        documentos[id_prenda] = terminos_prenda(nombre, descripcion)
+        if estado in ESTADOS_CANDIDATOS:
+            candidatos.add(id_prenda)
+
+        guardado = conceptos_guardados.get(str(id_prenda))
+        if guardado and guardado.get('url') == imagen:
+            conceptos_nuevos[str(id_prenda)] = guardado
+        elif usar_clarifai and imagen:
+            conceptos_nuevos[str(id_prenda)] = {'url': imagen, 'conceptos': _conceptos_clarifai(imagen)}
+        conceptos[id_prenda] = conceptos_nuevos.get(str(id_prenda), {}).get('conceptos', {})
+
+    vectores_texto, invertido_texto = _tf_idf(documentos, candidatos)
+    vectores_conceptos, invertido_conceptos = {}, defaultdict(list)
+    for id_prenda, valores in conceptos.items():
+        vectores_conceptos[id_prenda] = _normalizar_vector(valores)
+        if id_prenda in candidatos:
+            for concepto, peso in vectores_conceptos[id_prenda].items():
+                invertido_conceptos[concepto].append((id_prenda, peso))
+
+    # Relleno cuando el texto no da suficientes candidatos: misma categoría y
+    # talla primero, luego misma categoría; los más recientes antes
+    por_categoria_talla, por_categoria = defaultdict(list), defaultdict(list)
+    for id_prenda in sorted(candidatos, reverse=True):
+        por_categoria_talla[(categorias[id_prenda], tallas[id_prenda])].append(id_prenda)
+        por_categoria[categorias[id_prenda]].append(id_prenda)
+
+    ids = array('i')
+    vecinos = array('i')
+    puntajes = array('f')
+    for id_prenda, *_ in filas:
+        categoria, talla = categorias[id_prenda], tallas[id_prenda]
+        acumulado = defaultdict(float)
+        for vector, invertido, peso_bloque in (
+            (vectores_texto[id_prenda], invertido_texto, PESO_TEXTO),
+            (vectores_conceptos[id_prenda], invertido_conceptos, PESO_CONCEPTOS),
+        ):
+            for clave, peso in vector.items():
+                for otro, peso_otro in invertido[clave]:
+                    acumulado[otro] += peso_bloque * peso * peso_otro
+        acumulado.pop(id_prenda, None)
+
+        puntuados = {
+            otro: (
+                parcial
+                + (PESO_CATEGORIA if categoria and categorias[otro] == categoria else 0.0)
+                + (PESO_TALLA if talla and tallas[otro] == talla else 0.0)
+            )
+            for otro, parcial in acumulado.items()
+        }
+        if categoria:
+            for relleno, puntaje in (
+                (por_categoria_talla[(categoria, talla)], PESO_CATEGORIA + (PESO_TALLA if talla else 0.0)),
+                (por_categoria[categoria], PESO_CATEGORIA),
+            ):
+                for otro in relleno:
+                    if len(puntuados) >= vecinos_por_prenda:
+                        break
+                    if otro != id_prenda and otro not in puntuados:
+                        puntuados[otro] = puntaje
+
+        mejores = heapq.nlargest(vecinos_por_prenda, puntuados.items(), key=lambda par: (par[1], par[0]))
+        ids.append(id_prenda)
+        for posicion in range(vecinos_por_prenda):
+            otro, puntaje = mejores[posicion] if posicion < len(mejores) else (0, 0.0)
+            vecinos.append(otro)
+            puntajes.append(puntaje)
+
+    indice, _ = IndiceRecomendaciones.objects.update_or_create(
+        nombre=NOMBRE_INDICE,
+        defaults={
+            'fecha_generacion': timezone.now(),
+            'total_prendas': len(ids),
+            'vecinos_por_prenda': vecinos_por_prenda,
+            'ids': _a_bytes(ids),
+            'vecinos': _a_bytes(vecinos),
+            'puntajes': _a_bytes(puntajes),
+            'conceptos': conceptos_nuevos,
+        },
+    )
+    invalidar_indice()
+    logger.info(f"Índice de recomendaciones: {len(ids)} prendas, {vecinos_por_prenda} vecinos cada una")
+    return indice
+
+
+# ==============================================================================
+# CONSULTA (en línea)
+# ==============================================================================
+
+class _IndiceCargado:
+    """Arreglos del índice en memoria del proceso."""
+
+    def __init__(self, registro):
+        self.fecha_generacion = registro.fecha_generacion
+        self.vecinos_por_prenda = registro.vecinos_por_prenda
+        self.ids = _de_bytes('i', registro.ids)
+        self.vecinos = _de_bytes('i', registro.vecinos)
+        self.puntajes = _de_bytes('f', registro.puntajes)
+
+    def vecinos_de(self, id_prenda):
+        """[(id, puntaje), ...] de mayor a menor, o None si la prenda no está indexada."""
+        posicion = bisect.bisect_left(self.ids, id_prenda)
+        if posicion == len(self.ids) or self.ids[posicion] != id_prenda:
+            return None
+        inicio = posicion * self.vecinos_por_prenda
+        fin = inicio + self.vecinos_por_prenda
+        return [
+            (otro, puntaje)
+            for otro, puntaje in zip(self.vecinos[inicio:fin], self.puntajes[inicio:fin])
+            if otro
+        ]
+
+
+# (índice cargado o None, momento de la última comprobación)
+_cargado = [None, 0.0]
+
+
+def invalidar_indice():
+    """Obliga a releer el índice en la próxima consulta de este proceso."""
+    _cargado[0], _cargado[1] = None, 0.0
+
+
+def _obtener_indice():
+    indice, comprobado = _cargado
+    if indice is not None and time.monotonic() - comprobado < RECARGA_SEGUNDOS:
+        return indice
+
+    fecha = (
+        IndiceRecomendaciones.objects.filter(nombre=NOMBRE_INDICE)
+        .values_list('fecha_generacion', flat=True).first()
+    )
+    if fecha is None:
+        indice = None
+    elif indice is None or indice.fecha_generacion != fecha:
+        indice = _IndiceCargado(IndiceRecomendaciones.objects.get(nombre=NOMBRE_INDICE))
+    _cargado[0], _cargado[1] = indice, time.monotonic()
+    return indice
+
+
+def prendas_similares(prenda, limite=SIMILARES_POR_DEFECTO, excluir_usuario_id=None):
+    """
+    Prendas DISPONIBLE parecidas a `prenda`, de la más a la menos similar.
+
+    Args:
+        prenda: Prenda de referencia
+        limite: Máximo de prendas devueltas
+        excluir_usuario_id: Omite las prendas de este usuario (p. ej. quien consulta)
+
+    Returns:
+        list de Prenda
+    """
+    disponibles = Prenda.objects.filter(estado='DISPONIBLE').exclude(id_prenda=prenda.id_prenda)
+    if excluir_usuario_id:
+        disponibles = disponibles.exclude(user_id=excluir_usuario_id)
+
+    indice = _obtener_indice()
+    vecinos = indice.vecinos_de(prenda.id_prenda) if indice else None
+    if vecinos is None:
+        # Prenda más nueva que el índice (o índice sin construir)
+        if not prenda.categoria:
+            return []
+        return list(disponibles.filter(categoria=prenda.categoria).order_by('-fecha_publicacion')[:limite])
+
+    orden = {otro: posicion for posicion, (otro, _) in enumerate(vecinos)}
+    encontradas = disponibles.filter(id_prenda__in=list(orden))
+    return sorted(encontradas, key=lambda p: orden[p.id_prenda])[:limite]
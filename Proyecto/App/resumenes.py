@@ -0,0 +1,373 @@
+"""
+Tablas de resumen que leen los paneles e informes en vez de recorrer las
+transacciones. Las mantiene eventos.py con cada lote de eventos y el comando
+`reconstruir_resumenes` las rehace para lo que no pasa por transiciones.py
+(admin, bulk_create, transacciones borradas).
+
+ResumenDiarioFundacion: donaciones de una fundación por día (fecha de la
+transacción, en la zona horaria del sitio), estado y categoría de prenda,
+con el carbono y la energía de las completadas. Los paneles leen
+O(días × estados × categorías) filas. Como una donación cambia de estado,
+cada lote recalcula completos los días que tocó (borrar e insertar): repetir
+la operación no acumula errores. El impacto se suma por donación desde
+ImpactoAmbiental de su prenda, sin el doble JOIN prenda -> transacción que
+duplicaba prendas con varias transacciones.
+
+ResumenMensualImpacto: carbono, energía, agua y número de transacciones
+completadas por mes y tipo, para cada usuario, fundación y la plataforma.
+COMPLETADA es un estado final, así que cada transacción entra una sola vez:
+los lotes suman con UPDATE ... = col + n en vez de recalcular el mes.
+
+Los cálculos completos (días recalculados, reconstrucciones) leen también
+las transacciones archivadas (archivo.py) con `union_historica`: archivar no
+cambia ningún resumen.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .archivo import union_historica
+from .carbon_utils import calcular_impacto_prenda
+from .models import (
+    Fundacion, ImpactoAmbiental, ResumenDiarioFundacion, ResumenMensualImpacto, TipoTransaccion,
+)
+
+# (clave en la query string, etiqueta, días hacia atrás; None = todo)
+PERIODOS = [
+    ('7', 'Últimos 7 días', 7),
+    ('30', 'Últimos 30 días', 30),
+    ('90', 'Últimos 90 días', 90),
+    ('365', 'Último año', 365),
+    ('todo', 'Todo', None),
+]
+PERIODO_POR_DEFECTO = 'todo'
+
+# Ids por consulta IN (SQLite admite 999 parámetros por sentencia)
+LOTE_IDS = 900
+
+
+def periodo_desde(clave):
+    """
+    Traduce la clave de periodo de la query string.
+
+    Returns:
+        (clave válida, primer día incluido o None para todo el historial)
+    """
+    dias = {c: d for c, _, d in PERIODOS}
+    if clave not in dias:
+        clave = PERIODO_POR_DEFECTO
+    if dias[clave] is None:
+        return clave, None
+    return clave, timezone.localdate() - timedelta(days=dias[clave] - 1)
+
+
+def inicio_ultimos_meses(meses):
+    """Primer día del mes que abre los últimos `meses` meses (el actual incluido)."""
+    hoy = timezone.localdate()
+    indice = hoy.year * 12 + hoy.month - 1 - (meses - 1)
+    return hoy.replace(year=indice // 12, month=indice % 12 + 1, day=1)
+
+
+# ==============================================================================
+# ESCRITURA: RESÚMENES DIARIOS DE FUNDACIONES
+# ==============================================================================
+
+def _impacto_registrado(prendas):
+    """{id_prenda: (carbono, energía)} de ImpactoAmbiental, en consultas de LOTE_IDS ids."""
+    prendas = list(prendas)
+    registrados = {}
+    for inicio in range(0, len(prendas), LOTE_IDS):
+        registrados.update(
+            (fila['prenda_id'], (fila['carbono'] or 0, fila['energia'] or 0))
+            for fila in ImpactoAmbiental.objects.filter(prenda_id__in=prendas[inicio:inicio + LOTE_IDS])
+            .values('prenda_id').annotate(carbono=Sum('carbono_evitar_kg'), energia=Sum('energia_ahorrada_kwh'))
+            .order_by()
+        )
+    return registrados
+
+
+def _donaciones(transacciones, fundaciones, fechas=None, desde=None):
+    donaciones = transacciones.filter(
+        fundacion_id__in=list(fundaciones),
+        tipo_id=TipoTransaccion.id_de(TipoTransaccion.DONACION),
+        fecha_transaccion__isnull=False,
+    )
+    if fechas is not None:
+        donaciones = donaciones.filter(fecha_transaccion__date__in=list(fechas))
+    if desde is not None:
+        donaciones = donaciones.filter(fecha_transaccion__date__gte=desde)
+    return donaciones.annotate(fecha=TruncDate('fecha_transaccion'))
+
+
+def _calcular_filas(fundaciones, fechas=None, desde=None):
+    """Filas nuevas del resumen para las donaciones en el alcance, activas y archivadas."""
+    def por_dia(transacciones):
+        return (
+            _donaciones(transacciones, fundaciones, fechas, desde)
+            .values('fundacion_id', 'fecha', 'estado', 'prenda__categoria').annotate(n=Count('pk')).order_by()
+            .values_list('fundacion_id', 'fecha', 'estado', 'prenda__categoria', 'n')
+        )
+
+    def completadas(transacciones):
+        return (
+            _donaciones(transacciones, fundaciones, fechas, desde).filter(estado='COMPLETADA')
+            .values_list('fundacion_id', 'fecha', 'prenda__categoria', 'prenda_id').order_by()
+        )
+
+    filas = {}
+    for fundacion_id, fecha, estado, categoria, n in union_historica(por_dia):
+        clave = (fundacion_id, fecha, estado, categoria or '')
+        if clave not in filas:
+            filas[clave] = ResumenDiarioFundacion(
+                fundacion_id=fundacion_id, fecha=fecha, estado=estado, categoria=categoria or '', donaciones=0,
+            )
+        filas[clave].donaciones += n  # La misma clave puede venir de ambas tablas
+
+    entregadas = list(union_historica(completadas))
+    impacto_por_prenda = _impacto_registrado({fila[3] for fila in entregadas})
+    if impacto_por_prenda:
+        for fundacion_id, fecha, categoria, prenda_id in entregadas:
+            carbono, energia = impacto_por_prenda.get(prenda_id, (0, 0))
+            fila = filas[(fundacion_id, fecha, 'COMPLETADA', categoria or '')]
+            fila.carbono_kg += carbono
+            fila.energia_kwh += energia
+    return list(filas.values())
+
+
+def actualizar_resumenes_diarios(fundaciones, fechas):
+    """
+    Recalcula los días `fechas` de las `fundaciones` (todas las combinaciones).
+
+    Args:
+        fundaciones: Ids de fundación
+        fechas: Días (date) a recalcular
+    """
+    fundaciones, fechas = set(fundaciones), set(fechas)
+    if not fundaciones or not fechas:
+        return
+    with transaction.atomic():
+        ResumenDiarioFundacion.objects.filter(fundacion_id__in=fundaciones, fecha__in=fechas).delete()
+        ResumenDiarioFundacion.objects.bulk_create(_calcular_filas(fundaciones, fechas=fechas))
+
+
+def reconstruir_resumenes_diarios(desde=None, fundaciones=None):
+    """
+    Rehace los resúmenes desde cero (o desde la fecha `desde`).
+
+    Returns:
+        Filas escritas
+    """
+    if fundaciones is None:
+        fundaciones = Fundacion.objects.values_list('pk', flat=True)
+    fundaciones = set(fundaciones)
+    with transaction.atomic():
+        existentes = ResumenDiarioFundacion.objects.filter(fundacion_id__in=fundaciones)
+        if desde is not None:
+            existentes = existentes.filter(fecha__gte=desde)
+        existentes.delete()
+        filas = ResumenDiarioFundacion.objects.bulk_create(_calcular_filas(fundaciones, desde=desde), batch_size=1000)
+    return len(filas)
+
+
+# ==============================================================================
+# ESCRITURA: RESÚMENES MENSUALES DE IMPACTO
+# ==============================================================================
+
+# Campos de cada transacción completada que necesita el resumen mensual
+_CAMPOS_MENSUALES = (
+    'user_origen_id', 'fundacion_id', 'tipo_id', 'fecha_entrega', 'fecha_transaccion', 'prenda_id', 'prenda__categoria',
+)
+
+
+def _primer_dia_del_mes(fecha):
+    return timezone.localtime(fecha).date().replace(day=1)
+
+
+def _decimal(valor):
+    return Decimal(str(round(float(valor or 0), 2)))
+
+
+def _impactos_por_prenda(prendas):
+    """
+    {id_prenda: (carbono, energía, agua)} para los pares (id_prenda, categoría).
+
+    Carbono y energía salen de ImpactoAmbiental, o de la tabla por categoría
+    si la prenda aún no lo tiene; el agua siempre de la tabla, porque
+    ImpactoAmbiental no la guarda.
+    """
+    prendas = dict(prendas)
+    registrados = _impacto_registrado(prendas)
+    impactos = {}
+    for id_prenda, categoria in prendas.items():
+        base = calcular_impacto_prenda(categoria)
+        carbono, energia = registrados.get(id_prenda, (base['carbono_evitado_kg'], base['energia_ahorrada_kwh']))
+        impactos[id_prenda] = (_decimal(carbono), _decimal(energia), _decimal(base['agua_ahorrada_litros']))
+    return impactos
+
+
+def _acumular_mensual(filas):
+    """
+    Agrupa transacciones completadas (tuplas de _CAMPOS_MENSUALES) por ámbito.
+
+    Returns:
+        {(ambito, ambito_id, mes, tipo): [transacciones, carbono, energía, agua]}
+    """
+    filas = [fila for fila in filas if fila[3] or fila[4]]
+    impactos = _impactos_por_prenda((fila[5], fila[6]) for fila in filas)
+    id_donacion = TipoTransaccion.id_de(TipoTransaccion.DONACION)
+    totales = defaultdict(lambda: [0, Decimal(0), Decimal(0), Decimal(0)])
+    for id_usuario, id_fundacion, id_tipo, fecha_entrega, fecha_transaccion, id_prenda, _ in filas:
+        mes = _primer_dia_del_mes(fecha_entrega or fecha_transaccion)
+        tipo = TipoTransaccion.nombre_de(id_tipo) or ''
+        ambitos = [(ResumenMensualImpacto.AMBITO_PLATAFORMA, 0), (ResumenMensualImpacto.AMBITO_USUARIO, id_usuario)]
+        if id_fundacion and id_tipo == id_donacion:
+            ambitos.append((ResumenMensualImpacto.AMBITO_FUNDACION, id_fundacion))
+        for ambito, ambito_id in ambitos:
+            acumulado = totales[(ambito, ambito_id, mes, tipo)]
+            acumulado[0] += 1
+            for i, valor in enumerate(impactos[id_prenda], 1):
+                acumulado[i] += valor
+    return totales
+
+
+def _fila_mensual(clave, valores=(0, 0, 0, 0)):
+    ambito, ambito_id, mes, tipo = clave
+    transacciones, carbono, energia, agua = valores
+    return ResumenMensualImpacto(
+        ambito=ambito, ambito_id=ambito_id, mes=mes, tipo=tipo,
+        transacciones=transacciones, carbono_kg=carbono, energia_kwh=energia, agua_litros=agua,
+    )
+
+
+def sumar_resumenes_mensuales(transacciones):
+    """
+    Suma transacciones recién completadas a sus meses. Las filas que faltan se
+    insertan en cero y todas se incrementan con F(), así dos despachadores
+    que tocan el mismo mes no se pisan.
+
+    Args:
+        transacciones: Transaccion completadas, con su prenda cargada
+    """
+    totales = _acumular_mensual([
+        (t.user_origen_id, t.fundacion_id, t.tipo_id, t.fecha_entrega, t.fecha_transaccion, t.prenda_id, t.prenda.categoria)
+        for t in transacciones
+    ])
+    if not totales:
+        return
+    with transaction.atomic():
+        ResumenMensualImpacto.objects.bulk_create([_fila_mensual(clave) for clave in totales], ignore_conflicts=True)
+        for (ambito, ambito_id, mes, tipo), (n, carbono, energia, agua) in totales.items():
+            ResumenMensualImpacto.objects.filter(ambito=ambito, ambito_id=ambito_id, mes=mes, tipo=tipo).update(
+                transacciones=F('transacciones') + n,
+                carbono_kg=F('carbono_kg') + carbono,
+                energia_kwh=F('energia_kwh') + energia,
+                agua_litros=F('agua_litros') + agua,
+            )
+
+
+def reconstruir_resumenes_mensuales():
+    """
+    Rehace los resúmenes mensuales desde las transacciones completadas,
+    activas y archivadas.
+
+    Returns:
+        Filas escritas
+    """
+    completadas = union_historica(lambda transacciones: (
+        transacciones.filter(estado='COMPLETADA').values_list(*_CAMPOS_MENSUALES).order_by()
+    ))
+    with transaction.atomic():
+        totales = _acumular_mensual(completadas.iterator(chunk_size=2000))
+        ResumenMensualImpacto.objects.all().delete()
+        filas = ResumenMensualImpacto.objects.bulk_create(
+            [_fila_mensual(clave, valores) for clave, valores in totales.items()], batch_size=1000
+        )
+    return len(filas)
+
+
+# ==============================================================================
+# LECTURA
+# ==============================================================================
+
+def resumen_fundacion(fundacion, desde=None):
+    """
+    Totales de donaciones de `fundacion` desde el día `desde` (una consulta).
+
+    Returns:
+        dict con total, por_estado {estado: n}, por_categoria [(categoría, n)]
+        de las completadas (de más a menos), carbono_kg y energia_kwh
+    """
+    filas = ResumenDiarioFundacion.objects.filter(fundacion=fundacion)
+    if desde is not None:
+        filas = filas.filter(fecha__gte=desde)
+    por_estado = defaultdict(int)
+    por_categoria = defaultdict(int)
+    carbono = energia = Decimal(0)
+    for fila in filas.values('estado', 'categoria').annotate(
+        n=Sum('donaciones'), carbono=Sum('carbono_kg'), energia=Sum('energia_kwh')
+    ).order_by():
+        por_estado[fila['estado']] += fila['n']
+        if fila['estado'] == 'COMPLETADA':
+            por_categoria[fila['categoria'] or 'Sin categoría'] += fila['n']
+        carbono += fila['carbono'] or 0
+        energia += fila['energia'] or 0
+    return {
+        'total': sum(por_estado.values()),
+        'por_estado': dict(por_estado),
+        'por_categoria': sorted(por_categoria.items(), key=lambda par: (-par[1], par[0])),
+        'carbono_kg': carbono,
+        'energia_kwh': energia,
+    }
+
+
+def serie_mensual(ambito, ambito_id=0, desde=None):
+    """
+    Impacto mes a mes de un ámbito (una consulta, O(meses) filas).
+
+    Args:
+        ambito: ResumenMensualImpacto.AMBITO_*
+        ambito_id: Id del usuario o la fundación (0 para la plataforma)
+        desde: Primer mes incluido (date del día 1; opcional)
+
+    Returns:
+        [{mes, transacciones, carbono_kg, energia_kwh, agua_litros}] en orden de mes
+    """
+    filas = ResumenMensualImpacto.objects.filter(ambito=ambito, ambito_id=ambito_id)
+    if desde is not None:
+        filas = filas.filter(mes__gte=desde)
+    return [
+        {
+            'mes': fila['mes'], 'transacciones': fila['n'],
+            'carbono_kg': fila['carbono'], 'energia_kwh': fila['energia'], 'agua_litros': fila['agua'],
+        }
+        for fila in filas.values('mes').annotate(
+            n=Sum('transacciones'), carbono=Sum('carbono_kg'), energia=Sum('energia_kwh'), agua=Sum('agua_litros')
+        ).order_by('mes')
+    ]
+
+
+def totales_por_tipo(ambito, ambito_id=0):
+    """
+    Impacto acumulado de un ámbito por tipo de transacción (una consulta).
+
+    Returns:
+        {tipo: {cantidad, carbono, energia, agua}} con floats
+    """
+    filas = ResumenMensualImpacto.objects.filter(ambito=ambito, ambito_id=ambito_id)
+    return {
+        fila['tipo']: {
+            'cantidad': fila['n'],
+            'carbono': float(fila['carbono'] or 0),
+            'energia': float(fila['energia'] or 0),
+            'agua': float(fila['agua'] or 0),
+        }
+        for fila in filas.values('tipo').annotate(
+            n=Sum('transacciones'), carbono=Sum('carbono_kg'), energia=Sum('energia_kwh'), agua=Sum('agua_litros')
+        ).order_by('tipo')
+    }
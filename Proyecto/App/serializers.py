@@ -1,57 +1,265 @@
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
 from .models import (
     Usuario, Prenda, Transaccion, TipoTransaccion,
     Fundacion, Mensaje, ImpactoAmbiental, Logro, UsuarioLogro, CampanaFundacion
 )
 
+# --- Optimización de consultas ---
+
+def _relacion_por_atributo(model, nombre):
+    """Devuelve el campo de relación de `model` accesible como `nombre`, o None."""
+    for campo in model._meta.get_fields():
+        if not campo.is_relation:
+            continue
+        accesor = campo.get_accessor_name() if campo.auto_created and not campo.concrete else campo.name
+        if accesor == nombre:
+            return campo
+    return None
+
+
+def relaciones_serializer(serializer, model, prefijo='', en_prefetch=False):
+    """
+    Recorre los campos de `serializer` y calcula las relaciones que su
+    representación necesita, para cargarlas en la misma consulta.
+
+    Returns:
+        tuple: (set de rutas para select_related, set de rutas para prefetch_related)
+    """
+    select, prefetch = set(), set()
+    for campo in serializer.fields.values():
+        if campo.write_only or campo.source == '*':
+            continue
+        anidado = campo.child if isinstance(campo, serializers.ListSerializer) else campo
+        partes = campo.source.split('.')
+        # Un PrimaryKeyRelatedField final solo necesita la columna *_id
+        if isinstance(campo, serializers.PrimaryKeyRelatedField):
+            partes = partes[:-1]
+
+        modelo_actual, ruta, multiple = model, prefijo, en_prefetch
+        for parte in partes:
+            relacion = _relacion_por_atributo(modelo_actual, parte)
+            if relacion is None:
+                break
+            ruta = f'{ruta}__{parte}' if ruta else parte
+            if relacion.one_to_many or relacion.many_to_many:
+                multiple = True
+            (prefetch if multiple else select).add(ruta)
+            modelo_actual = relacion.related_model
+        else:
+            if isinstance(anidado, serializers.Serializer) and ruta != prefijo:
+                sub_select, sub_prefetch = relaciones_serializer(anidado, modelo_actual, ruta, multiple)
+                select |= sub_select
+                prefetch |= sub_prefetch
+    return select, prefetch
+
+
+def optimizar_queryset(queryset, serializer):
+    """Aplica select_related/prefetch_related según lo que `serializer` va a leer."""
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    select, prefetch = relaciones_serializer(serializer, queryset.model)
+    # Las rutas intermedias ya quedan incluidas en la más larga
+    select = {r for r in select if not any(o.startswith(r + '__') for o in select)}
+    if select:
+        queryset = queryset.select_related(*sorted(select))
+    if prefetch:
+        queryset = queryset.prefetch_related(*sorted(prefetch))
+    # Con ?fields= el SELECT también se recorta a las columnas pedidas
+    if getattr(serializer, 'campos_recortados', False):
+        columnas = columnas_serializer(serializer, queryset.model)
+        if columnas:
+            queryset = queryset.only(*sorted(columnas))
+    return queryset
+
+
+def columnas_serializer(serializer, model, prefijo=''):
+    """
+    Calcula las rutas para `only()` que cubren los campos de `serializer`.
+    Las relaciones múltiples quedan fuera: se cargan con prefetch_related.
+
+    Returns:
+        set de rutas, o None si algún campo no corresponde a una columna
+        (propiedades, source='*'), en cuyo caso no se debe recortar.
+    """
+    columnas = {f'{prefijo}__{model._meta.pk.name}' if prefijo else model._meta.pk.name}
+    for campo in serializer.fields.values():
+        if campo.write_only:
+            continue
+        if campo.source == '*':
+            return None
+        anidado = campo.child if isinstance(campo, serializers.ListSerializer) else campo
+
+        modelo_actual, ruta = model, prefijo
+        for parte in campo.source.split('.'):
+            try:
+                campo_modelo = modelo_actual._meta.get_field(parte)
+            except FieldDoesNotExist:
+                campo_modelo = _relacion_por_atributo(modelo_actual, parte)
+                if campo_modelo is None:
+                    return None
+            if campo_modelo.one_to_many or campo_modelo.many_to_many:
+                break
+            if campo_modelo.is_relation and not campo_modelo.concrete:
+                return None
+            ruta = f'{ruta}__{parte}' if ruta else parte
+            columnas.add(ruta)
+            if not campo_modelo.is_relation:
+                break
+            modelo_actual = campo_modelo.related_model
+        else:
+            if isinstance(anidado, serializers.Serializer):
+                sub_columnas = columnas_serializer(anidado, modelo_actual, ruta)
+                if sub_columnas is None:
+                    return None
+                columnas |= sub_columnas
+    return columnas
+
+
+# --- Campos dinámicos (?fields= / ?expand=) ---
+
+def _lista_parametro(valor):
+    """'a, b,,c' -> ['a', 'b', 'c']"""
+    if not valor:
+        return []
+    if isinstance(valor, str):
+        valor = valor.split(',')
+    return [v.strip() for v in valor if v and v.strip()]
+
+
+class CamposDinamicosMixin:
+    """
+    Permite al cliente elegir los campos de la respuesta.
+
+    - fields: lista de campos a devolver (`?fields=id_prenda,nombre`).
+      Los nombres desconocidos se ignoran.
+    - expand: relaciones de `campos_expandibles` que se devuelven anidadas
+      en vez de como id (`?expand=user`).
+
+    Se pueden pasar como argumentos del serializer; si no, se leen de la
+    petición del contexto (solo en GET) o de `campos_por_defecto` del contexto.
+    """
+    # nombre del campo -> serializer anidado usado con ?expand=
+    campos_expandibles = {}
+
+    def __init__(self, *args, **kwargs):
+        campos = kwargs.pop('fields', None)
+        expandir = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        parametros = getattr(request, 'query_params', {}) if getattr(request, 'method', None) == 'GET' else {}
+        if campos is None:
+            campos = parametros.get('fields') or self.context.get('campos_por_defecto')
+        if expandir is None:
+            expandir = parametros.get('expand')
+
+        self.campos_recortados = False
+        campos = _lista_parametro(campos)
+        if campos:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+            self.campos_recortados = True
+
+        for nombre in _lista_parametro(expandir):
+            if nombre in self.campos_expandibles and nombre in self.fields:
+                self.fields[nombre] = self.campos_expandibles[nombre](read_only=True)
+
+
+# --- Relaciones precargadas (altas masivas) ---
+
+class RelacionPrecargadaField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField que, si el contexto trae `precargados`
+    ({Modelo: {pk: instancia}}), resuelve el id en memoria en vez de hacer
+    una consulta por elemento al validar listas.
+    """
+
+    def to_internal_value(self, data):
+        precargados = self.context.get('precargados', {}).get(self.get_queryset().model)
+        if precargados is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return precargados[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class ImagenUsuarioField(serializers.ImageField):
+    """ImageField que devuelve tal cual la URL absoluta de Cloudinary (ver Usuario.url_imagen)."""
+
+    def to_representation(self, value):
+        if value and value.name.startswith(('http://', 'https://')):
+            return value.name
+        return super().to_representation(value)
+
+
 # --- Serializers básicos ---
 
-class UsuarioSerializer(serializers.ModelSerializer):
+class UsuarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para el modelo Usuario"""
+    imagen_usuario = ImagenUsuarioField(required=False, allow_null=True)
     class Meta:
         model = Usuario
         exclude = ['contrasena']  # Seguridad: NUNCA enviar la contraseña por defecto
         read_only_fields = ['id_usuario', 'fecha_registro']
 
-class TipoTransaccionSerializer(serializers.ModelSerializer):
+class UsuarioSimpleSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Datos públicos de un usuario, para relaciones expandidas"""
+    imagen_usuario = ImagenUsuarioField(read_only=True)
+    class Meta:
+        model = Usuario
+        fields = ['id_usuario', 'nombre', 'apellido', 'comuna', 'imagen_usuario']
+
+class TipoTransaccionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = TipoTransaccion
         fields = '__all__'
 
-class FundacionSerializer(serializers.ModelSerializer):
+class FundacionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Fundacion
         fields = '__all__'
 
-class ImpactoAmbientalSerializer(serializers.ModelSerializer):
+class ImpactoAmbientalSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = ImpactoAmbiental
         fields = '__all__'
 
-class LogroSerializer(serializers.ModelSerializer):
+class LogroSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Logro
         fields = '__all__'
 
-class UsuarioLogroSerializer(serializers.ModelSerializer):
+class UsuarioLogroSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    campos_expandibles = {'user': UsuarioSimpleSerializer}
     logro = LogroSerializer(read_only=True)
     class Meta:
         model = UsuarioLogro
         fields = ['id', 'user', 'logro', 'fecha_desbloqueo']
 
-class CampanaFundacionSerializer(serializers.ModelSerializer):
+class CampanaFundacionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    campos_expandibles = {'fundacion': FundacionSerializer}
     fundacion_nombre = serializers.CharField(source='fundacion.nombre', read_only=True)
     class Meta:
         model = CampanaFundacion
         fields = [
             'id', 'fundacion', 'fundacion_nombre', 'nombre',
-            'descripcion', 'imagen', 'fecha_inicio', 'fecha_fin', 'objetivo_prendas', 'activa', 'categorias_solicitadas'
+            'descripcion', 'imagen_campana', 'fecha_inicio', 'fecha_fin', 'objetivo_prendas', 'activa', 'categorias_solicitadas'
         ]
 
 
 # --- Serializers anidados / personalizados ---
 
-class PrendaSerializer(serializers.ModelSerializer):
+class PrendaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    serializer_related_field = RelacionPrecargadaField
+    campos_expandibles = {'user': UsuarioSimpleSerializer}
     usuario_nombre = serializers.CharField(source='user.nombre', read_only=True)
     usuario_apellido = serializers.CharField(source='user.apellido', read_only=True)
     fundacion_nombre = serializers.CharField(source='user.fundacion_asignada.nombre', read_only=True)
@@ -59,19 +267,26 @@ class PrendaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Prenda
         fields = [
-            'id', 'user', 'usuario_nombre', 'usuario_apellido', 'fundacion_nombre',
+            'id_prenda', 'user', 'usuario_nombre', 'usuario_apellido', 'fundacion_nombre',
             'nombre', 'descripcion', 'categoria', 'talla', 'estado',
             'fecha_publicacion', 'imagen_prenda', 'impactoambiental'
         ]
-        read_only_fields = ['id', 'fecha_publicacion']
+        read_only_fields = ['id_prenda', 'fecha_publicacion']
 
-class PrendaSimpleSerializer(serializers.ModelSerializer):
+class PrendaSimpleSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Prenda
-        fields = ['id', 'nombre', 'categoria', 'talla', 'estado']
+        fields = ['id_prenda', 'nombre', 'categoria', 'talla', 'estado']
 
-class TransaccionSerializer(serializers.ModelSerializer):
-    prenda = PrendaSimpleSerializer(source='prenda', read_only=True)
+class TransaccionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    campos_expandibles = {
+        'tipo': TipoTransaccionSerializer,
+        'user_origen': UsuarioSimpleSerializer,
+        'user_destino': UsuarioSimpleSerializer,
+        'fundacion': FundacionSerializer,
+        'campana': CampanaFundacionSerializer,
+    }
+    prenda = PrendaSimpleSerializer(read_only=True)
     tipo_nombre = serializers.CharField(source='tipo.nombre_tipo', read_only=True)
     usuario_origen_nombre = serializers.CharField(source='user_origen.nombre', read_only=True)
     usuario_destino_nombre = serializers.CharField(source='user_destino.nombre', read_only=True)
@@ -80,23 +295,24 @@ class TransaccionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaccion
         fields = [
-            'id', 'prenda', 'tipo', 'tipo_nombre',
+            'id_transaccion', 'prenda', 'tipo', 'tipo_nombre',
             'user_origen', 'usuario_origen_nombre', 'user_destino', 'usuario_destino_nombre',
             'fundacion', 'fundacion_nombre', 'campana', 'campana_nombre',
             'fecha_transaccion', 'estado'
         ]
-        read_only_fields = ['id', 'fecha_transaccion']
+        read_only_fields = ['id_transaccion', 'fecha_transaccion']
 
-class MensajeSerializer(serializers.ModelSerializer):
-    emisor_nombre = serializers.CharField(source='id_emisor.nombre', read_only=True)
-    receptor_nombre = serializers.CharField(source='id_receptor.nombre', read_only=True)
+class MensajeSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    campos_expandibles = {'emisor': UsuarioSimpleSerializer, 'receptor': UsuarioSimpleSerializer}
+    emisor_nombre = serializers.CharField(source='emisor.nombre', read_only=True)
+    receptor_nombre = serializers.CharField(source='receptor.nombre', read_only=True)
     class Meta:
         model = Mensaje
         fields = [
-            'id_mensaje', 'id_emisor', 'emisor_nombre', 'id_receptor', 'receptor_nombre',
+            'id', 'emisor', 'emisor_nombre', 'receptor', 'receptor_nombre',
             'contenido', 'fecha_envio'
         ]
-        read_only_fields = ['id_mensaje', 'fecha_envio']
+        read_only_fields = ['id', 'fecha_envio']
 
 # --- Serializers para reportes y dashboard ---
 
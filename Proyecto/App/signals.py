@@ -0,0 +1,51 @@
+"""
+Señales de la app: mantienen VersionTabla al día cuando cambian las tablas
+que se publican con ETag, e invalidan las tarjetas cacheadas
+de cada objeto (fragmentos.py).
+
+Ambas cosas se hacen al confirmar la transacción (`transaction.on_commit`):
+antes del commit otra petición podría volver a cachear el estado viejo con
+la versión nueva, y el UPDATE de VersionTabla dejaría bloqueada hasta el
+final la única fila de la tabla, serializando todas las escrituras.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from .fragmentos import invalidar_fragmentos
+from .models import (
+    Usuario, Fundacion, Prenda, ImpactoAmbiental, CampanaFundacion, TipoTransaccion, VersionTabla,
+)
+
+
+# Tablas cuya versión se usa en respuestas condicionales o cachés
+MODELOS_VERSIONADOS = (Usuario, Fundacion, Prenda, ImpactoAmbiental, CampanaFundacion)
+
+
+def incrementar_version(sender, **kwargs):
+    tabla = sender._meta.db_table
+    transaction.on_commit(lambda: VersionTabla.incrementar(tabla))
+
+
+for modelo in MODELOS_VERSIONADOS:
+    post_save.connect(incrementar_version, sender=modelo, dispatch_uid=f'version_{modelo._meta.db_table}_save')
+    post_delete.connect(incrementar_version, sender=modelo, dispatch_uid=f'version_{modelo._meta.db_table}_delete')
+
+
+# Modelos con tarjeta cacheada por objeto en los listados
+MODELOS_CON_FRAGMENTOS = (Prenda, CampanaFundacion, Fundacion)
+
+
+def invalidar_fragmento_objeto(sender, instance, **kwargs):
+    pk = instance.pk  # Tras un delete, Django deja la pk en None
+    transaction.on_commit(lambda: invalidar_fragmentos(sender, [pk]))
+
+
+for modelo in MODELOS_CON_FRAGMENTOS:
+    post_save.connect(invalidar_fragmento_objeto, sender=modelo, dispatch_uid=f'fragmento_{modelo._meta.db_table}_save')
+    post_delete.connect(invalidar_fragmento_objeto, sender=modelo, dispatch_uid=f'fragmento_{modelo._meta.db_table}_delete')
+
+
+# Registro en memoria de TipoTransaccion: se vuelve a leer tras editar un tipo (admin)
+post_save.connect(TipoTransaccion.invalidar_registro, sender=TipoTransaccion, dispatch_uid='registro_tipos_save')
+post_delete.connect(TipoTransaccion.invalidar_registro, sender=TipoTransaccion, dispatch_uid='registro_tipos_delete')
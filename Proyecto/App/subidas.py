@@ -0,0 +1,307 @@
+"""
+Subida de imágenes en segundo plano.
+
+La vista llama a `programar_subida`, que hace tres cosas y vuelve enseguida:
+copia el archivo por bloques a un directorio temporal, registra una fila
+SubidaImagen y encola `procesar_subida` para después del commit.
+
+Las imágenes que llegan como URL (alta masiva por la API) entran por
+`programar_subidas_desde_url`: no hay archivo temporal y el backend toma la
+imagen desde la URL de origen.
+
+El worker (tareas.py) sube el archivo con el backend configurado:
+
+- 'cloudinary': los archivos grandes se suben por partes (`upload_large`)
+  con timeout por petición.
+- 'local': copia el archivo a MEDIA_ROOT. Sirve para desarrollo y pruebas
+  sin red.
+
+Cada ejecución del worker hace un solo intento. Si falla, la fila vuelve a
+PENDIENTE y la tarea se encola de nuevo con espera exponencial
+(`encolar_con_espera`), así el hilo queda libre mientras tanto. Si se agotan
+los intentos, la fila queda FALLIDA y conserva el archivo temporal; después
+se puede reanudar con `python manage.py procesar_subidas`. El archivo
+temporal se borra solo cuando la imagen ya quedó guardada en su destino.
+
+Settings (todos opcionales):
+    SUBIDAS_BACKEND         'cloudinary' | 'local' (default: cloudinary si está configurado)
+    SUBIDAS_DIR             Directorio temporal
+    SUBIDAS_MAX_INTENTOS    Intentos antes de dejar la subida FALLIDA (default 4)
+    SUBIDAS_ESPERA_BASE     Segundos de la primera espera entre intentos (default 1)
+    SUBIDAS_TIMEOUT         Timeout por petición (Cloudinary o descarga), en segundos (default 60)
+"""
+
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+import urllib.request
+import uuid
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import transaction
+
+from .cloudinary_utils import (
+    CloudinaryError,
+    TRANSFORMACION_SUBIDA_FUNDACION,
+    TRANSFORMACION_SUBIDA_PRENDA,
+    TRANSFORMACION_SUBIDA_USUARIO,
+    variantes_de_resultado,
+)
+from .fragmentos import invalidar_fragmentos
+from .models import Fundacion, Prenda, SubidaImagen, Usuario, VersionTabla
+from .tareas import encolar, encolar_con_espera
+
+logger = logging.getLogger(__name__)
+
+# Archivos desde este tamaño se suben por partes
+UMBRAL_SUBIDA_POR_PARTES = 8 * 1024 * 1024
+TAMANO_PARTE = 6 * 1024 * 1024  # Cloudinary exige al menos 5 MB por parte
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def directorio_temporal():
+    ruta = _config('SUBIDAS_DIR', os.path.join(tempfile.gettempdir(), 'ecoprenda_subidas'))
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+# ==============================================================================
+# BACKENDS
+# ==============================================================================
+
+def _es_url(origen):
+    return origen.startswith(('http://', 'https://'))
+
+
+class BackendCloudinary:
+    """Sube a Cloudinary; por partes si el archivo es grande. Las URL las descarga Cloudinary."""
+
+    def subir(self, origen, carpeta, public_id, transformaciones):
+        import cloudinary.exceptions
+        import cloudinary.uploader
+
+        if not settings.CLOUDINARY_STORAGE.get('API_KEY'):
+            raise CloudinaryError("Cloudinary no está configurado")
+        opciones = {
+            'folder': carpeta,
+            'public_id': public_id,
+            'overwrite': True,
+            'resource_type': 'image',
+            'transformation': transformaciones,
+            'timeout': _config('SUBIDAS_TIMEOUT', 60),
+        }
+        try:
+            if not _es_url(origen) and os.path.getsize(origen) >= UMBRAL_SUBIDA_POR_PARTES:
+                resultado = cloudinary.uploader.upload_large(origen, chunk_size=TAMANO_PARTE, **opciones)
+            else:
+                resultado = cloudinary.uploader.upload(origen, **opciones)
+        except cloudinary.exceptions.Error as e:
+            raise CloudinaryError(f"Error Cloudinary: {e}")
+        if resultado.get('error'):
+            raise CloudinaryError(f"Error Cloudinary: {resultado['error']}")
+        return resultado
+
+
+class BackendLocal:
+    """
+    Copia el archivo (o descarga la URL) a MEDIA_ROOT/<carpeta>/ y devuelve un
+    resultado con la misma forma que Cloudinary (secure_url, public_id,
+    version). Las variantes responsivas no aplican: la URL es la del archivo
+    original.
+    """
+
+    def subir(self, origen, carpeta, public_id, transformaciones):
+        ruta = urlparse(origen).path if _es_url(origen) else origen
+        extension = os.path.splitext(ruta)[1].lower()[:10] or '.jpg'
+        destino_relativo = f'{carpeta}/{public_id}{extension}'
+        destino = os.path.join(settings.MEDIA_ROOT, *destino_relativo.split('/'))
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        if _es_url(origen):
+            with urllib.request.urlopen(origen, timeout=_config('SUBIDAS_TIMEOUT', 60)) as respuesta, \
+                    open(destino, 'wb') as salida:
+                shutil.copyfileobj(respuesta, salida)
+        else:
+            shutil.copyfile(origen, destino)
+        return {
+            'secure_url': f'{settings.MEDIA_URL}{destino_relativo}',
+            'public_id': None,  # sin variantes de Cloudinary
+            'version': int(time.time()),
+        }
+
+
+BACKENDS = {'cloudinary': BackendCloudinary, 'local': BackendLocal}
+
+
+def obtener_backend():
+    nombre = _config('SUBIDAS_BACKEND', None)
+    if nombre is None:
+        nombre = 'cloudinary' if settings.CLOUDINARY_STORAGE.get('API_KEY') else 'local'
+    return BACKENDS[nombre]()
+
+
+# ==============================================================================
+# DESTINOS: dónde se guarda la URL una vez subida
+# ==============================================================================
+
+def _aplicar_prenda(id_prenda, resultado):
+    actualizadas = Prenda.objects.filter(id_prenda=id_prenda).update(
+        imagen_prenda=resultado['secure_url'], imagen_variantes=variantes_de_resultado(resultado)
+    )
+    if actualizadas:
+        VersionTabla.incrementar(Prenda._meta.db_table)
+        invalidar_fragmentos(Prenda, [id_prenda])
+    return actualizadas
+
+
+def _aplicar_fundacion(id_fundacion, resultado):
+    actualizadas = Fundacion.objects.filter(id_fundacion=id_fundacion).update(
+        imagen_fundacion=resultado['secure_url']
+    )
+    if actualizadas:
+        VersionTabla.incrementar(Fundacion._meta.db_table)
+        invalidar_fragmentos(Fundacion, [id_fundacion])
+    return actualizadas
+
+
+def _aplicar_usuario(id_usuario, resultado):
+    # imagen_usuario es un ImageField: la copia local se guarda relativa a
+    # MEDIA_ROOT y la de Cloudinary como URL absoluta (Usuario.url_imagen)
+    url = resultado['secure_url']
+    if url.startswith(settings.MEDIA_URL):
+        url = url[len(settings.MEDIA_URL):]
+    actualizadas = Usuario.objects.filter(id_usuario=id_usuario).update(imagen_usuario=url)
+    if actualizadas:
+        VersionTabla.incrementar(Usuario._meta.db_table)
+    return actualizadas
+
+
+# destino: (carpeta, plantilla de public_id, transformaciones, función que guarda la URL)
+DESTINOS = {
+    'prenda': ('ecoprenda/prendas', 'prenda_{id}', TRANSFORMACION_SUBIDA_PRENDA, _aplicar_prenda),
+    'fundacion': ('ecoprenda/fundaciones', 'fundacion_{id}', TRANSFORMACION_SUBIDA_FUNDACION, _aplicar_fundacion),
+    'usuario': ('ecoprenda/usuarios', 'usuario_{id}', TRANSFORMACION_SUBIDA_USUARIO, _aplicar_usuario),
+}
+
+
+# ==============================================================================
+# API
+# ==============================================================================
+
+def programar_subida(archivo, destino, objeto_id):
+    """
+    Guarda `archivo` (UploadedFile) en el directorio temporal y encola su subida.
+
+    Args:
+        archivo: Archivo recibido en request.FILES (ya validado)
+        destino: 'prenda', 'fundacion' o 'usuario'
+        objeto_id: Id del objeto que recibirá la URL
+
+    Returns:
+        SubidaImagen creada (estado PENDIENTE)
+    """
+    if destino not in DESTINOS:
+        raise ValueError(f"Destino de subida desconocido: {destino}")
+
+    extension = os.path.splitext(archivo.name or '')[1].lower()[:10]
+    ruta = os.path.join(directorio_temporal(), f'{uuid.uuid4().hex}{extension}')
+    with open(ruta, 'wb') as salida:
+        for bloque in archivo.chunks():
+            salida.write(bloque)
+
+    subida = SubidaImagen.objects.create(
+        destino=destino,
+        objeto_id=objeto_id,
+        ruta_temporal=ruta,
+        nombre_original=(archivo.name or '')[:255],
+        tamano_bytes=os.path.getsize(ruta),
+    )
+    encolar(procesar_subida, subida.pk)
+    return subida
+
+
+def programar_subidas_desde_url(destino, urls):
+    """
+    Registra y encola la subida de imágenes que llegaron como URL externa.
+
+    Args:
+        destino: 'prenda', 'fundacion' o 'usuario'
+        urls: dict {objeto_id: url}
+
+    Returns:
+        Lista de SubidaImagen creadas (estado PENDIENTE)
+    """
+    if destino not in DESTINOS:
+        raise ValueError(f"Destino de subida desconocido: {destino}")
+    subidas = SubidaImagen.objects.bulk_create([
+        SubidaImagen(destino=destino, objeto_id=objeto_id, url_origen=url, nombre_original=url[:255])
+        for objeto_id, url in urls.items()
+    ])
+    for subida in subidas:
+        encolar(procesar_subida, subida.pk)
+    return subidas
+
+
+def _espera_reintento(intento):
+    """Espera exponencial con variación aleatoria antes del intento `intento + 1`."""
+    return _config('SUBIDAS_ESPERA_BASE', 1) * 2 ** (intento - 1) * (1 + random.random() / 2)
+
+
+def procesar_subida(id_subida, intento=1, reintentar=True):
+    """
+    Tarea: hace un intento de subida y guarda la URL en su destino.
+
+    Si el intento falla y quedan intentos (SUBIDAS_MAX_INTENTOS), la subida
+    vuelve a PENDIENTE y se encola otra vez con espera; si no, queda FALLIDA.
+    Con reintentar=False (comando procesar_subidas) un fallo la deja FALLIDA
+    hasta la próxima ejecución.
+    """
+    with transaction.atomic():
+        subida = SubidaImagen.objects.select_for_update().filter(pk=id_subida).first()
+        if subida is None or subida.estado not in ('PENDIENTE', 'FALLIDA'):
+            return  # otro worker la tomó o ya terminó
+        subida.estado = 'SUBIENDO'
+        subida.intentos += 1
+        subida.save(update_fields=['estado', 'intentos', 'fecha_actualizacion'])
+
+    if subida.ruta_temporal and not os.path.exists(subida.ruta_temporal):
+        subida.estado, subida.error = 'FALLIDA', 'El archivo temporal ya no existe'
+        subida.save(update_fields=['estado', 'error', 'fecha_actualizacion'])
+        return
+
+    carpeta, plantilla, transformaciones, aplicar = DESTINOS[subida.destino]
+    maximo = _config('SUBIDAS_MAX_INTENTOS', 4)
+    try:
+        resultado = obtener_backend().subir(
+            subida.ruta_temporal or subida.url_origen, carpeta,
+            plantilla.format(id=subida.objeto_id), transformaciones,
+        )
+    except Exception as e:
+        subida.error = str(e)[:2000]
+        if reintentar and intento < maximo:
+            pausa = _espera_reintento(intento)
+            subida.estado = 'PENDIENTE'
+            subida.save(update_fields=['estado', 'error', 'fecha_actualizacion'])
+            logger.warning(f"Subida {subida.pk}: intento {intento}/{maximo} falló ({e}); reintento en {pausa:.1f} s")
+            encolar_con_espera(pausa, procesar_subida, subida.pk, intento + 1)
+        else:
+            subida.estado = 'FALLIDA'
+            subida.save(update_fields=['estado', 'error', 'fecha_actualizacion'])
+            logger.error(f"Subida {subida.pk} falló tras {subida.intentos} intentos: {e}")
+        return
+
+    aplicar(subida.objeto_id, resultado)
+    subida.estado, subida.error, subida.url_resultado = 'COMPLETADA', '', resultado['secure_url']
+    subida.save(update_fields=['estado', 'error', 'url_resultado', 'fecha_actualizacion'])
+    if subida.ruta_temporal:
+        try:
+            os.remove(subida.ruta_temporal)
+        except OSError as e:
+            logger.warning(f"No se pudo borrar el temporal de la subida {subida.pk}: {e}")
+    logger.info(f"Subida {subida.pk} completada: {subida.destino} {subida.objeto_id}")
@@ -0,0 +1,72 @@
+"""
+Tareas en segundo plano de EcoPrenda.
+
+Cola mínima en proceso: las tareas se lanzan en un pool de hilos cuando la
+transacción actual confirma (`transaction.on_commit`), así nunca procesan
+filas que terminaron en rollback. Con settings.TAREAS_SINCRONAS = True se
+ejecutan en línea (útil en pruebas y scripts).
+
+Las tareas con espera (`encolar_con_espera`, p. ej. los reintentos de
+subidas.py) no ocupan un hilo del pool mientras esperan: un temporizador
+las entrega al pool cuando vence el plazo.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'TAREAS_HILOS', 2),
+            thread_name_prefix='ecoprenda-tarea',
+        )
+    return _pool
+
+
+def _ejecutar(funcion, *args, **kwargs):
+    try:
+        funcion(*args, **kwargs)
+    except Exception:
+        logger.exception(f"Error en tarea {funcion.__name__}")
+    finally:
+        # Cada hilo abre su propia conexión: se cierra al terminar la tarea
+        close_old_connections()
+
+
+def encolar(funcion, *args, **kwargs):
+    """Programa `funcion(*args, **kwargs)` para después del commit actual."""
+    def lanzar():
+        if getattr(settings, 'TAREAS_SINCRONAS', False):
+            funcion(*args, **kwargs)
+        else:
+            _obtener_pool().submit(_ejecutar, funcion, *args, **kwargs)
+    transaction.on_commit(lanzar)
+
+
+def encolar_con_espera(segundos, funcion, *args, **kwargs):
+    """
+    Como `encolar`, pero la tarea entra al pool `segundos` después del commit.
+    Con TAREAS_SINCRONAS se ejecuta en línea, sin esperar.
+    """
+    def lanzar():
+        if getattr(settings, 'TAREAS_SINCRONAS', False):
+            funcion(*args, **kwargs)
+            return
+        # Hilo daemon: si el proceso se reinicia, la tarea se pierde y la
+        # retoma el comando correspondiente (p. ej. procesar_subidas)
+        temporizador = threading.Timer(
+            segundos, _obtener_pool().submit, args=(_ejecutar, funcion, *args), kwargs=kwargs
+        )
+        temporizador.daemon = True
+        temporizador.start()
+    transaction.on_commit(lanzar)
@@ -0,0 +1,40 @@
+"""
+Etiquetas de plantilla para imágenes responsivas de prendas.
+
+    {% load imagenes %}
+    {% imagen_prenda prenda 'lista' clase='card-img-top' estilo='height: 200px; object-fit: cover;' %}
+
+Usa las variantes guardadas en `prenda.imagen_variantes` (src del tamaño
+pedido + srcset/sizes para que el navegador elija). Si la prenda aún no
+tiene variantes, cae a la URL original.
+"""
+
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+register = template.Library()
+
+# Ancho que ocupa cada variante en pantalla, para el atributo sizes
+SIZES_VARIANTES = {
+    'lista': '(min-width: 992px) 300px, (min-width: 768px) 33vw, 100vw',
+    'detalle': '(min-width: 768px) 66vw, 100vw',
+}
+
+
+@register.simple_tag
+def imagen_prenda(prenda, variante='lista', clase='', estilo='', alt=None):
+    variantes = prenda.imagen_variantes or {}
+    atributos = {
+        'src': variantes.get(variante) or prenda.imagen_prenda,
+        'alt': alt if alt is not None else f'Imagen de {prenda.nombre}',
+        'loading': 'eager' if variante == 'detalle' else 'lazy',
+    }
+    if variantes.get(f'{variante}_srcset'):
+        atributos['srcset'] = variantes[f'{variante}_srcset']
+        atributos['sizes'] = SIZES_VARIANTES.get(variante, '100vw')
+    if clase:
+        atributos['class'] = clase
+    if estilo:
+        atributos['style'] = estilo
+    return format_html('<img{}>', flatatt(atributos))
@@ -1,3 +1,2022 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .models import (
+    Usuario, Prenda, Transaccion, TipoTransaccion,
+    Fundacion, Mensaje, ImpactoAmbiental, Logro, UsuarioLogro, CampanaFundacion, VersionTabla, SubidaImagen, EventoTransaccion
+)
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Utilidades de prueba
+
+# Hash ya formado: evita ejecutar make_password en cada usuario de prueba.
+CONTRASENA_HASH = 'pbkdf2_sha256$prueba'
+
+def crear_datos_prueba(n=30):
+    """
+    Crea un conjunto de datos con `n` filas por tabla principal y todas sus
+    relaciones. Ejecuta los callbacks on_commit (versiones, sellos) como si
+    los datos ya estuvieran confirmados.
+    """
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        return _crear_datos_prueba(n)
+
+
+def _crear_datos_prueba(n):
+    fundacion = Fundacion.objects.create(nombre='Fundación Test', activa=True, lat=-33.45, lng=-70.66)
+    representante = Usuario.objects.create(
+        nombre='Repr', correo='repr@test.cl', contrasena=CONTRASENA_HASH,
+        rol='REPRESENTANTE_FUNDACION', fundacion_asignada=fundacion,
+    )
+    campana = CampanaFundacion.objects.create(
+        fundacion=fundacion, nombre='Campaña Test', descripcion='desc',
+        objetivo_prendas=50, categorias_solicitadas='Camiseta',
+    )
+    tipos = [
+        TipoTransaccion.objects.create(nombre_tipo=nombre)
+        for nombre in ('Donación', 'Venta', 'Intercambio')
+    ]
+    logro = Logro.objects.create(
+        codigo='DONADOR', nombre='Donador', descripcion='d', tipo='DONACION', icono='bi', requisito_valor=1
+    )
+    usuarios = []
+    for i in range(n):
+        usuario = Usuario.objects.create(
+            nombre=f'Usuario {i}', correo=f'u{i}@test.cl', contrasena=CONTRASENA_HASH, fundacion_asignada=fundacion
+        )
+        usuarios.append(usuario)
+        prenda = Prenda.objects.create(user=usuario, nombre=f'Prenda {i}', categoria='Camiseta', talla='M')
+        ImpactoAmbiental.objects.create(prenda=prenda, carbono_evitar_kg=5.5, energia_ahorrada_kwh=2.7)
+        Transaccion.objects.create(
+            prenda=prenda, tipo=tipos[i % 3], user_origen=usuario, user_destino=representante,
+            fundacion=fundacion, campana=campana, fecha_transaccion=timezone.now(),
+        )
+        Mensaje.objects.create(emisor=usuario, receptor=representante, contenido=f'Hola {i}')
+        UsuarioLogro.objects.create(user=usuario, logro=logro)
+    return {
+        'fundacion': fundacion,
+        'representante': representante,
+        'campana': campana,
+        'tipos': tipos,
+        'usuarios': usuarios,
+    }
+
+
+def consultas_de_aplicacion(consultas):
+    """Descarta las consultas de sesión y los SAVEPOINT que agregan los middlewares."""
+    return [
+        q for q in consultas
+        if 'django_session' not in q['sql'] and not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+    ]
+
+
+class PresupuestoConsultasMixin:
+    """Aserciones sobre el número máximo de consultas SQL de un bloque."""
+
+    @contextmanager
+    def assertMaxQueries(self, maximo, descripcion=''):
+        with CaptureQueriesContext(connection) as contexto:
+            yield contexto
+        consultas = consultas_de_aplicacion(contexto.captured_queries)
+        ejecutadas = len(consultas)
+        if ejecutadas > maximo:
+            detalle = '\n'.join(q['sql'] for q in consultas)
+            self.fail(
+                f'{descripcion or "Bloque"} ejecutó {ejecutadas} consultas '
+                f'(presupuesto: {maximo}).\n{detalle}'
+            )
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# API REST: paginación y presupuesto de consultas
+
+class PaginacionAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(30)
+
+    def test_listado_paginado_por_cursor(self):
+        respuesta = self.client.get('/api/prendas/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.data['results']), 20)
+        self.assertIsNotNone(respuesta.data['next'])
+
+        siguiente = self.client.get(respuesta.data['next'])
+        self.assertEqual(len(siguiente.data['results']), 10)
+        self.assertIsNone(siguiente.data['next'])
+
+    def test_page_size_limitado(self):
+        respuesta = self.client.get('/api/prendas/', {'page_size': 1000})
+        self.assertEqual(len(respuesta.data['results']), 30)
+        respuesta = self.client.get('/api/usuarios/', {'page_size': 5})
+        self.assertEqual(len(respuesta.data['results']), 5)
+
+    def test_acciones_personalizadas_paginadas(self):
+        fundacion = self.datos['fundacion']
+        respuesta = self.client.get(f'/api/fundaciones/{fundacion.pk}/donaciones/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.data['results']), 20)
+
+    def test_conversacion_en_orden_cronologico(self):
+        usuario, representante = self.datos['usuarios'][0], self.datos['representante']
+        for contenido, dias in (('Primero', -1), ('Último', 1)):
+            Mensaje.objects.create(
+                emisor=representante, receptor=usuario, contenido=contenido,
+                fecha_envio=timezone.now() + timedelta(days=dias),
+            )
+        respuesta = self.client.get(
+            '/api/mensajes/conversacion/', {'usuario1': usuario.pk, 'usuario2': representante.pk}
+        )
+        self.assertEqual([m['contenido'] for m in respuesta.data['results']], ['Primero', 'Hola 0', 'Último'])
+
+
+class PresupuestoConsultasAPITests(PresupuestoConsultasMixin, TestCase):
+    """
+    Presupuesto máximo de consultas SQL por endpoint de listado.
+    Los datos tienen más filas que una página: un N+1 supera el presupuesto.
+    No se cuentan las consultas de sesión de los middlewares.
+    """
+    PRESUPUESTOS_SIMPLES = {
+        '/api/usuarios/': 1,
+        '/api/usuarios-list/': 1,
+        '/api/fundaciones/': 2,  # + consulta de VersionTabla (ETag)
+        '/api/tipos-transaccion/': 1,
+        '/api/logros/': 1,
+        '/api/impacto-ambiental/': 1,
+    }
+    PRESUPUESTOS_RELACIONES = {
+        '/api/prendas/': 3,  # + consulta de VersionTabla (ETag)
+        '/api/prendas-list/': 2,
+        '/api/transacciones/': 1,
+        '/api/transacciones/pendientes/': 1,
+        '/api/mensajes/': 1,
+        '/api/usuario-logros/': 1,
+        '/api/campanas-fundacion/': 1,
+        '/api/campanas-fundacion/activas/': 2,  # + consulta de VersionTabla (ETag)
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(30)
+
+    def verificar_presupuestos(self, presupuestos):
+        for url, maximo in presupuestos.items():
+            with self.subTest(url=url):
+                with self.assertMaxQueries(maximo, url):
+                    respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+
+    def test_presupuesto_endpoints_simples(self):
+        self.verificar_presupuestos(self.PRESUPUESTOS_SIMPLES)
+
+    def test_presupuesto_endpoints_con_relaciones(self):
+        self.verificar_presupuestos(self.PRESUPUESTOS_RELACIONES)
+
+    def test_presupuesto_acciones_y_detalle(self):
+        fundacion = self.datos['fundacion']
+        usuario = self.datos['usuarios'][0]
+        prenda = Prenda.objects.filter(user=usuario).first()
+        self.verificar_presupuestos({
+            f'/api/fundaciones/{fundacion.pk}/donaciones/': 2,
+            f'/api/usuarios/{usuario.pk}/transacciones/': 2,
+            f'/api/usuarios/{usuario.pk}/prendas/': 3,
+            f'/api/prendas/{prenda.pk}/': 2,
+            f'/api/prendas-detail/{prenda.pk}/': 2,
+        })
+
+    def test_presupuesto_no_depende_del_tamano_de_pagina(self):
+        for url in ('/api/prendas/', '/api/transacciones/', '/api/mensajes/'):
+            with self.subTest(url=url):
+                with self.assertMaxQueries(self.PRESUPUESTOS_RELACIONES[url], url):
+                    respuesta = self.client.get(url, {'page_size': 100})
+                self.assertEqual(len(respuesta.data['results']), 30)
+
+
+class EstadisticasAPITests(PresupuestoConsultasMixin, TestCase):
+    """Los endpoints de estadísticas usan consultas agrupadas, sin bucles por tipo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(30)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_estadisticas_por_tipo_una_consulta(self):
+        with self.assertMaxQueries(1, 'estadisticas por tipo'):
+            respuesta = self.client.get('/api/tipos-transaccion/estadisticas/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([t['total_transacciones'] for t in respuesta.data], [10, 10, 10])
+
+    def test_por_tipo_con_muestra_acotada(self):
+        with self.assertMaxQueries(2, 'transacciones por tipo'):
+            respuesta = self.client.get('/api/transacciones/por_tipo/', {'muestra': 3})
+        self.assertEqual(respuesta.status_code, 200)
+        for grupo in respuesta.data:
+            self.assertEqual(grupo['total'], 10)
+            self.assertEqual(len(grupo['muestra']), 3)
+            self.assertTrue(all(t['tipo'] == grupo['tipo_id'] for t in grupo['muestra']))
+
+        respuesta = self.client.get('/api/transacciones/por_tipo/', {'muestra': 500})
+        self.assertEqual(len(respuesta.data[0]['muestra']), 10)
+
+    def test_estadisticas_generales(self):
+        with self.assertMaxQueries(3, 'estadisticas generales'):
+            respuesta = self.client.get('/api/estadisticas/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['total_usuarios'], 31)
+        self.assertEqual(respuesta.data['total_prendas'], 30)
+        self.assertEqual(respuesta.data['total_transacciones'], 30)
+        self.assertEqual(respuesta.data['total_donaciones'], 10)
+        self.assertEqual(respuesta.data['carbono_evitado_total'], '165.00')
+
+        # La segunda petición sale de la caché
+        with self.assertMaxQueries(0, 'estadisticas cacheadas'):
+            self.client.get('/api/estadisticas/')
+
+    def test_impacto_total(self):
+        respuesta = self.client.get('/api/impacto-total/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['total_prendas_impactadas'], 30)
+
+
+class CamposDinamicosAPITests(PresupuestoConsultasMixin, TestCase):
+    """?fields= recorta la respuesta y el SELECT; ?expand= anida relaciones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(30)
+
+    def test_fields_recorta_respuesta_y_select(self):
+        with self.assertMaxQueries(2, 'prendas con fields') as contexto:
+            respuesta = self.client.get('/api/prendas/', {'fields': 'id_prenda,nombre,usuario_nombre'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(set(respuesta.data['results'][0]), {'id_prenda', 'nombre', 'usuario_nombre'})
+        sql = consultas_de_aplicacion(contexto.captured_queries)[-1]['sql']
+        self.assertNotIn('"descripcion"', sql)
+        self.assertNotIn('"correo"', sql)
+
+    def test_expand_anida_relacion(self):
+        with self.assertMaxQueries(1, 'transacciones expandidas'):
+            respuesta = self.client.get('/api/transacciones/', {'fields': 'id_transaccion,user_origen', 'expand': 'user_origen'})
+        origen = respuesta.data['results'][0]['user_origen']
+        self.assertEqual(set(origen), {'id_usuario', 'nombre', 'apellido', 'comuna', 'imagen_usuario'})
+
+    def test_fields_en_acciones_y_detalle(self):
+        usuario = self.datos['usuarios'][0]
+        respuesta = self.client.get(f'/api/usuarios/{usuario.pk}/prendas/', {'fields': 'nombre'})
+        self.assertEqual(set(respuesta.data['results'][0]), {'nombre'})
+        respuesta = self.client.get(f'/api/usuarios/{usuario.pk}/', {'fields': 'nombre,correo'})
+        self.assertEqual(set(respuesta.data), {'nombre', 'correo'})
+
+    def test_prenda_simple_list_es_caso_particular(self):
+        from .serializers import PrendaSimpleSerializer
+        with self.assertMaxQueries(1, 'prendas-simple-list'):
+            respuesta = self.client.get('/api/prendas-simple-list/')
+        self.assertEqual(list(respuesta.data['results'][0]), PrendaSimpleSerializer.Meta.fields)
+        respuesta = self.client.get('/api/prendas-simple-list/', {'fields': 'nombre'})
+        self.assertEqual(list(respuesta.data['results'][0]), ['nombre'])
+
+    def test_fields_no_afecta_escritura(self):
+        usuario = self.datos['usuarios'][0]
+        respuesta = self.client.post(
+            '/api/prendas/?fields=nombre',
+            {'user': usuario.pk, 'nombre': 'Nueva', 'categoria': 'Camiseta', 'talla': 'S'},
+            content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertIn('categoria', respuesta.data)
+
+
+class GetCondicionalAPITests(PresupuestoConsultasMixin, TestCase):
+    """ETag a partir de VersionTabla: 304 sin consultar el listado."""
+    URLS = ('/api/prendas/', '/api/fundaciones/', '/api/campanas-fundacion/activas/')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(5)
+
+    def test_304_con_etag_vigente(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertTrue(respuesta.has_header('ETag'))
+                self.assertFalse(respuesta.has_header('Last-Modified'))
+
+                with self.assertMaxQueries(1, url):
+                    condicional = self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+                self.assertEqual(condicional.status_code, 304)
+
+    def test_cambio_invalida_etag(self):
+        respuesta = self.client.get('/api/fundaciones/')
+        fundacion = self.datos['fundacion']
+        fundacion.descripcion = 'Actualizada'
+        with self.captureOnCommitCallbacks(execute=True):
+            fundacion.save()
+        condicional = self.client.get('/api/fundaciones/', HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(condicional.status_code, 200)
+
+    def test_if_modified_since_no_da_304(self):
+        # Una escritura en el mismo segundo que la respuesta anterior no
+        # cambiaría Last-Modified: solo el ETag decide
+        fundacion = self.datos['fundacion']
+        fundacion.descripcion = 'Actualizada'
+        with self.captureOnCommitCallbacks(execute=True):
+            fundacion.save()
+        futuro = http_date(time.time() + 3600)
+        condicional = self.client.get('/api/fundaciones/', HTTP_IF_MODIFIED_SINCE=futuro)
+        self.assertEqual(condicional.status_code, 200)
+
+    def test_cambio_en_tabla_relacionada_invalida_etag(self):
+        respuesta = self.client.get('/api/prendas/')
+        usuario = self.datos['usuarios'][0]
+        usuario.nombre = 'Renombrado'
+        with self.captureOnCommitCallbacks(execute=True):
+            usuario.save()
+        condicional = self.client.get('/api/prendas/', HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(condicional.status_code, 200)
+
+    def test_etag_distinto_por_parametros(self):
+        completa = self.client.get('/api/prendas/')
+        recortada = self.client.get('/api/prendas/', {'fields': 'nombre'})
+        self.assertNotEqual(completa['ETag'], recortada['ETag'])
+        condicional = self.client.get('/api/prendas/', {'fields': 'nombre'}, HTTP_IF_NONE_MATCH=completa['ETag'])
+        self.assertEqual(condicional.status_code, 200)
+
+    def test_version_por_borrado(self):
+        version = VersionTabla.objects.get(tabla='prenda').version
+        with self.captureOnCommitCallbacks(execute=True):
+            Prenda.objects.filter(user=self.datos['usuarios'][0]).first().delete()
+        self.assertGreater(VersionTabla.objects.get(tabla='prenda').version, version)
+
+
+class RendererJSONTests(TestCase):
+    """EcoPrendaJSONRenderer/Parser: misma salida que DRF, también sin orjson."""
+    DATOS = {
+        'carbono_evitar_kg': Decimal('5.50'),
+        'costo_envio': Decimal('2990.00'),
+        'nombre': 'Fundación Ñuñoa',
+        'lista': [1, None, True],
+    }
+
+    def test_decimal_field_como_texto(self):
+        import json
+        from .api.api_renderers import EcoPrendaJSONRenderer
+        from .serializers import ImpactoAmbientalSerializer
+        impacto = ImpactoAmbiental(id=1, carbono_evitar_kg=Decimal('5.50'), energia_ahorrada_kwh=Decimal('2.70'))
+        cuerpo = EcoPrendaJSONRenderer().render(ImpactoAmbientalSerializer(impacto).data)
+        self.assertEqual(json.loads(cuerpo)['carbono_evitar_kg'], '5.50')
+        self.assertIn('Ñuñoa'.encode(), EcoPrendaJSONRenderer().render(self.DATOS))
+
+    def test_igual_a_drf(self):
+        import json
+        from rest_framework.renderers import JSONRenderer
+        from .api.api_renderers import EcoPrendaJSONRenderer
+        self.assertEqual(
+            json.loads(EcoPrendaJSONRenderer().render(self.DATOS)),
+            json.loads(JSONRenderer().render(self.DATOS)),
+        )
+
+    def test_respaldo_sin_orjson(self):
+        import io
+        from .api import api_renderers
+        with mock.patch.object(api_renderers, 'orjson', None):
+            cuerpo = api_renderers.EcoPrendaJSONRenderer().render(self.DATOS)
+            datos = api_renderers.EcoPrendaJSONParser().parse(io.BytesIO(cuerpo))
+        self.assertEqual(datos['costo_envio'], 2990.0)
+
+    def test_parser_json_invalido(self):
+        respuesta = self.client.post('/api/logros/', '{no es json', content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_respuesta_api(self):
+        Logro.objects.create(codigo='L1', nombre='Ñandú', descripcion='d', tipo='DONACION', icono='bi', requisito_valor=1)
+        respuesta = self.client.get('/api/logros/', HTTP_ACCEPT='application/json')
+        self.assertEqual(respuesta['Content-Type'], 'application/json')
+        self.assertEqual(respuesta.json()['results'][0]['nombre'], 'Ñandú')
+
+
+class ExportacionStreamingTests(PresupuestoConsultasMixin, TestCase):
+    """Exportaciones CSV/NDJSON en streaming, acotadas a la fundación del representante."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(12)
+        otra = Fundacion.objects.create(nombre='Otra', activa=True, lat=-33.0, lng=-70.0)
+        usuario = cls.datos['usuarios'][0]
+        prenda = Prenda.objects.create(user=usuario, nombre='Ajena', categoria='Camiseta', talla='S')
+        Transaccion.objects.create(
+            prenda=prenda, tipo=cls.datos['tipos'][0], user_origen=usuario,
+            fundacion=otra, fecha_transaccion=timezone.now(),
+        )
+        cls.admin = Usuario.objects.create(
+            nombre='Admin', correo='admin@test.cl', contrasena=CONTRASENA_HASH, rol='ADMINISTRADOR'
+        )
+
+    def iniciar_sesion(self, usuario):
+        sesion = self.client.session
+        sesion['id_usuario'] = usuario.id_usuario
+        sesion.save()
+
+    def descargar(self, url, **params):
+        respuesta = self.client.get(url, params)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        return b''.join(respuesta.streaming_content).decode('utf-8-sig')
+
+    def test_csv_transacciones_del_representante(self):
+        self.iniciar_sesion(self.datos['representante'])
+        contenido = self.descargar('/exportar/transacciones/')
+        lineas = contenido.strip().splitlines()
+        self.assertTrue(lineas[0].startswith('id_transaccion,fecha,tipo'))
+        self.assertEqual(len(lineas), 1 + 12)  # la transacción de otra fundación no aparece
+
+    def test_representante_no_elige_otra_fundacion(self):
+        self.iniciar_sesion(self.datos['representante'])
+        otra = Fundacion.objects.get(nombre='Otra')
+        contenido = self.descargar('/exportar/transacciones/', fundacion=otra.pk)
+        self.assertEqual(len(contenido.strip().splitlines()), 1 + 12)
+
+    def test_ndjson_impacto_con_decimales(self):
+        import json
+        self.iniciar_sesion(self.datos['representante'])
+        lineas = self.descargar('/exportar/impacto/', formato='ndjson').strip().splitlines()
+        self.assertEqual(len(lineas), 12)
+        self.assertEqual(json.loads(lineas[0])['carbono_evitado_kg'], '5.50')
+
+    def test_administrador_exporta_todo_y_filtra_fechas(self):
+        self.iniciar_sesion(self.admin)
+        contenido = self.descargar('/exportar/prendas/')
+        self.assertEqual(len(contenido.strip().splitlines()), 1 + 13)
+        contenido = self.descargar('/exportar/transacciones/', hasta='2000-01-01')
+        self.assertEqual(len(contenido.strip().splitlines()), 1)
+
+    def test_consultas_constantes(self):
+        self.iniciar_sesion(self.datos['representante'])
+        with self.assertMaxQueries(2, 'exportación'):
+            respuesta = self.client.get('/exportar/transacciones/')
+            b''.join(respuesta.streaming_content)
+
+    def test_parametros_invalidos(self):
+        self.iniciar_sesion(self.admin)
+        self.assertEqual(self.client.get('/exportar/prendas/', {'formato': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/exportar/prendas/', {'desde': '31-12-2024'}).status_code, 400)
+
+    def test_cliente_sin_permiso(self):
+        self.iniciar_sesion(self.datos['usuarios'][1])
+        respuesta = self.client.get('/exportar/transacciones/')
+        self.assertEqual(respuesta.status_code, 302)
+
+
+class AltaMasivaPrendasAPITests(PresupuestoConsultasMixin, TestCase):
+    """POST/PATCH /api/prendas/bulk/: validación por elemento e inserción en lote."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(3)
+
+    def setUp(self):
+        self.usuario = self.datos['usuarios'][0]
+        sesion = self.client.session
+        sesion['id_usuario'] = self.usuario.id_usuario
+        sesion.save()
+
+    def prendas(self, n, **extra):
+        return [
+            {'nombre': f'Lote {i}', 'categoria': 'Pantalón', 'talla': 'L', **extra}
+            for i in range(n)
+        ]
+
+    def test_alta_masiva_consultas_constantes(self):
+        with self.assertMaxQueries(8, 'alta masiva'):
+            respuesta = self.client.post('/api/prendas/bulk/', self.prendas(25), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.data['validos'], 25)
+        ids = [r['id_prenda'] for r in respuesta.data['resultados']]
+        self.assertEqual(ImpactoAmbiental.objects.filter(prenda_id__in=ids).count(), 25)
+        self.assertEqual(
+            ImpactoAmbiental.objects.get(prenda_id=ids[0]).carbono_evitar_kg, Decimal('11.00')
+        )
+
+    def test_resultados_por_elemento(self):
+        lote = self.prendas(2) + [{'nombre': 'X', 'talla': 'X' * 11}, {'nombre': ''}]
+        respuesta = self.client.post('/api/prendas/bulk/', lote, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 207)
+        estados = [r['estado'] for r in respuesta.data['resultados']]
+        self.assertEqual(estados, ['creada', 'creada', 'error', 'error'])
+        self.assertIn('talla', respuesta.data['resultados'][2]['errores'])
+        self.assertEqual(Prenda.objects.filter(nombre__startswith='Lote').count(), 2)
+
+    def test_alta_masiva_requiere_sesion_y_asigna_el_dueno(self):
+        otro = self.datos['usuarios'][1]
+        respuesta = self.client.post(
+            '/api/prendas/bulk/', self.prendas(1, user=otro.pk), content_type='application/json'
+        )
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(Prenda.objects.get(nombre='Lote 0').user_id, self.usuario.pk)
+
+        self.client.logout()
+        respuesta = self.client.post('/api/prendas/bulk/', self.prendas(1), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertEqual(self.client.patch('/api/prendas/bulk/', [], content_type='application/json').status_code, 401)
+
+    def test_actualizacion_masiva_rechaza_prendas_ajenas(self):
+        otro = self.datos['usuarios'][1]
+        ajena = Prenda.objects.get(user=otro)
+        lote = [{'id_prenda': ajena.pk, 'talla': 'XL'}, {'id_prenda': ajena.pk, 'user': self.usuario.pk}]
+        respuesta = self.client.patch('/api/prendas/bulk/', lote, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([r['estado'] for r in respuesta.data['resultados']], ['error', 'error'])
+        ajena.refresh_from_db()
+        self.assertEqual((ajena.talla, ajena.user_id), ('M', otro.pk))
+
+    def test_lote_invalido(self):
+        self.assertEqual(self.client.post('/api/prendas/bulk/', {}, content_type='application/json').status_code, 400)
+        respuesta = self.client.post('/api/prendas/bulk/', self.prendas(101), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    @override_settings(TAREAS_SINCRONAS=True, SUBIDAS_BACKEND='local')
+    def test_imagenes_encoladas_tras_commit(self):
+        from .subidas import BackendLocal
+        lote = self.prendas(2, imagen_prenda='https://ejemplo.cl/foto.jpg')
+        with mock.patch.object(BackendLocal, 'subir') as subir:
+            subir.return_value = {'secure_url': 'https://res.cloudinary.com/demo/prenda.jpg', 'public_id': None}
+            with self.captureOnCommitCallbacks(execute=True):
+                respuesta = self.client.post('/api/prendas/bulk/', lote, content_type='application/json')
+        self.assertEqual(subir.call_count, 2)
+        self.assertEqual(subir.call_args.args[0], 'https://ejemplo.cl/foto.jpg')
+        id_prenda = respuesta.data['resultados'][0]['id_prenda']
+        self.assertEqual(Prenda.objects.get(pk=id_prenda).imagen_prenda, 'https://res.cloudinary.com/demo/prenda.jpg')
+        self.assertEqual(SubidaImagen.objects.filter(estado='COMPLETADA').count(), 2)
+
+    def test_actualizacion_masiva(self):
+        for i in range(4):
+            Prenda.objects.create(user=self.usuario, nombre=f'Propia {i}', categoria='Camiseta', talla='M')
+        prendas = list(Prenda.objects.filter(user=self.usuario).values_list('id_prenda', flat=True))
+        lote = [{'id_prenda': pk, 'talla': 'XL'} for pk in prendas] + [{'id_prenda': 99999, 'talla': 'S'}]
+        with self.assertMaxQueries(8, 'actualización masiva'):
+            respuesta = self.client.patch('/api/prendas/bulk/', lote, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual(set(Prenda.objects.filter(user=self.usuario).values_list('talla', flat=True)), {'XL'})
+
+
+class BusquedaTextoCompletoTests(TestCase):
+    """Índice FTS5 (SQLite) sincronizado por triggers, con ranking."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(nombre='U', correo='u@busqueda.cl', contrasena=CONTRASENA_HASH)
+        crear = lambda nombre, descripcion, categoria='Camiseta': Prenda.objects.create(
+            user=cls.usuario, nombre=nombre, descripcion=descripcion, categoria=categoria, talla='M'
+        )
+        cls.roja = crear('Camisa roja', 'Algodón, poco uso')
+        cls.descripcion = crear('Polera básica', 'Combina con camisa roja o azul')
+        cls.pantalon = crear('Pantalón de mezclilla', 'Azul oscuro', 'Pantalón')
+
+    def buscar(self, texto):
+        from .busqueda import buscar_prendas_texto
+        return list(buscar_prendas_texto(Prenda.objects.all(), texto).order_by('-rango'))
+
+    def test_ranking_prioriza_nombre(self):
+        self.assertEqual(self.buscar('camisa roja'), [self.roja, self.descripcion])
+
+    def test_sin_tildes_y_por_prefijo(self):
+        self.assertEqual(self.buscar('pantalon'), [self.pantalon])
+        self.assertEqual(self.buscar('mezcl'), [self.pantalon])
+
+    def test_sincronizado_al_guardar_y_borrar(self):
+        self.pantalon.nombre = 'Jeans'
+        self.pantalon.save()
+        self.assertEqual(self.buscar('jeans'), [self.pantalon])
+        self.pantalon.delete()
+        self.assertEqual(self.buscar('jeans'), [])
+
+    def test_texto_sin_terminos(self):
+        self.assertEqual(self.buscar('"*()'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Los triggers de prenda_fts solo existen en SQLite')
+    def test_triggers_sobreviven_a_las_migraciones(self):
+        # Falla si una migración reconstruyó la tabla prenda sin recrear los triggers
+        from .busqueda import triggers_faltantes
+        self.assertEqual(triggers_faltantes(connection), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Los triggers de prenda_fts solo existen en SQLite')
+    def test_check_detecta_triggers_borrados(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .checks import revisar_triggers_busqueda
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER prenda_fts_au')
+        errores = revisar_triggers_busqueda(None, databases=['default'])
+        self.assertEqual([error.id for error in errores], ['App.E001'])
+        self.assertIn('prenda_fts_au', errores[0].msg)
+
+        call_command('reconstruir_busqueda', stdout=StringIO())
+        self.assertEqual(revisar_triggers_busqueda(None, databases=['default']), [])
+        self.pantalon.nombre = 'Jeans'
+        self.pantalon.save()
+        self.assertEqual(self.buscar('jeans'), [self.pantalon])
+
+    def test_endpoint_api(self):
+        respuesta = self.client.get('/api/prendas/buscar/', {'q': 'azul'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual({p['id_prenda'] for p in respuesta.data['results']}, {self.descripcion.pk, self.pantalon.pk})
+        self.assertEqual(self.client.get('/api/prendas/buscar/').status_code, 400)
+
+    def test_vista_buscar_prendas(self):
+        sesion = self.client.session
+        sesion['id_usuario'] = self.usuario.id_usuario
+        sesion.save()
+        respuesta = self.client.get('/buscar/', {'q': 'camisa'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(list(respuesta.context['prendas']), [self.roja, self.descripcion])
+
+
+class FacetasCatalogoTests(PresupuestoConsultasMixin, TestCase):
+    """Conteos por categoría/talla/estado en una consulta agrupada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(nombre='U', correo='u@facetas.cl', contrasena=CONTRASENA_HASH)
+        for categoria, talla, n in (('Pantalón', 'M', 3), ('Pantalón', 'L', 2), ('Camiseta', 'M', 4)):
+            for i in range(n):
+                Prenda.objects.create(user=cls.usuario, nombre=f'{categoria} {i}', categoria=categoria, talla=talla)
+        Prenda.objects.create(user=cls.usuario, nombre='Vendida', categoria='Vestido', talla='S', estado='VENDIDA')
+
+    def setUp(self):
+        cache.clear()
+
+    def totales(self, faceta):
+        return {f['valor']: f['total'] for f in faceta}
+
+    def test_conteos_disyuntivos_en_una_consulta(self):
+        from .facetas import calcular_facetas
+        base = Prenda.objects.all()
+        with self.assertMaxQueries(1, 'facetas'):
+            facetas = calcular_facetas(base, {'categoria': 'Pantalón'}, 'prueba')
+        # La categoría elegida no oculta las otras; talla y estado sí se ajustan
+        self.assertEqual(self.totales(facetas['categoria']), {'Pantalón': 5, 'Camiseta': 4, 'Vestido': 1})
+        self.assertEqual(self.totales(facetas['talla']), {'M': 3, 'L': 2})
+        self.assertEqual(facetas['estado'], [
+            {'valor': 'DISPONIBLE', 'etiqueta': 'Disponible', 'total': 5, 'seleccionado': False}
+        ])
+        self.assertTrue(facetas['categoria'][1]['seleccionado'])
+
+        # Otra selección sobre el mismo filtro base reutiliza la caché
+        with self.assertMaxQueries(0, 'facetas cacheadas'):
+            facetas = calcular_facetas(base, {'talla': 'M'}, 'prueba')
+        self.assertEqual(self.totales(facetas['categoria']), {'Pantalón': 3, 'Camiseta': 4})
+        self.assertEqual(self.totales(facetas['estado']), {'DISPONIBLE': 7})
+
+    def test_vistas_muestran_conteos(self):
+        sesion = self.client.session
+        sesion['id_usuario'] = self.usuario.id_usuario
+        sesion.save()
+        respuesta = self.client.get('/prendas/', {'talla': 'L'})
+        self.assertContains(respuesta, 'Pantalón (2)')
+        self.assertContains(respuesta, '<option value="L" selected>L (2)</option>', html=True)
+        # El catálogo solo muestra disponibles: sin faceta de estado
+        self.assertNotIn('estado', respuesta.context['facetas'])
+        self.assertNotContains(respuesta, 'name="estado"')
+        respuesta = self.client.get('/buscar/', {'q': 'pantalon'})
+        self.assertEqual(self.totales(respuesta.context['facetas']['talla']), {'M': 3, 'L': 2})
+
+
+class RecomendacionesPrendasTests(PresupuestoConsultasMixin, TestCase):
+    """Índice de prendas similares construido fuera de línea."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(nombre='U', correo='u@similares.cl', contrasena=CONTRASENA_HASH)
+        cls.otro = Usuario.objects.create(nombre='O', correo='o@similares.cl', contrasena=CONTRASENA_HASH)
+        crear = lambda nombre, categoria, talla, **extra: Prenda.objects.create(
+            user=extra.pop('user', cls.otro), nombre=nombre, categoria=categoria, talla=talla,
+            imagen_prenda=f'https://img.test/{nombre}.jpg', **extra
+        )
+        cls.referencia = crear('Pantalón vaquero azul', 'Pantalón', 'M', user=cls.usuario)
+        cls.gemelo = crear('Pantalón vaquero negro', 'Pantalón', 'M')
+        cls.misma_categoria = crear('Pantalón chino', 'Pantalón', 'L')
+        cls.camiseta = crear('Camiseta vaquero', 'Camiseta', 'M')
+        cls.vendido = crear('Pantalón vaquero azul', 'Pantalón', 'M', estado='VENDIDA')
+        cls.propia = crear('Pantalón vaquero gris', 'Pantalón', 'M', user=cls.usuario)
+
+    def setUp(self):
+        from . import recomendaciones
+        recomendaciones.invalidar_indice()
+
+    def test_vecinos_ordenados_y_solo_disponibles(self):
+        from .recomendaciones import construir_indice, prendas_similares
+        construir_indice()
+        with self.assertMaxQueries(3, 'primera consulta (carga el índice)'):
+            similares = prendas_similares(self.referencia)
+        self.assertEqual(similares[:2], [self.propia, self.gemelo])
+        self.assertNotIn(self.vendido, similares)
+        self.assertIn(self.camiseta, similares)  # comparte 'vaquero'
+
+        with self.assertMaxQueries(1, 'índice ya cargado'):
+            similares = prendas_similares(self.referencia, limite=2, excluir_usuario_id=self.usuario.id_usuario)
+        self.assertEqual(similares, [self.gemelo, self.misma_categoria])
+
+        # Una prenda que deja de estar disponible desaparece sin reconstruir
+        Prenda.objects.filter(pk=self.gemelo.pk).update(estado='RESERVADA')
+        self.assertNotIn(self.gemelo, prendas_similares(self.referencia))
+
+    def test_prenda_nueva_usa_su_categoria(self):
+        from .recomendaciones import construir_indice, prendas_similares
+        construir_indice()
+        nueva = Prenda.objects.create(user=self.usuario, nombre='Pantalón nuevo', categoria='Pantalón', talla='S')
+        similares = prendas_similares(nueva)
+        self.assertTrue(similares)
+        self.assertTrue(all(p.categoria == 'Pantalón' and p.estado == 'DISPONIBLE' for p in similares))
+
+    def test_conceptos_clarifai_se_reutilizan(self):
+        from .models import IndiceRecomendaciones
+        from .recomendaciones import construir_indice
+        detectados = [{'nombre': 'Jeans', 'confianza': 0.9, 'bbox': {}}]
+        with mock.patch('App.clarifai_utils.detectar_prendas_imagen', return_value=detectados) as detectar:
+            construir_indice(usar_clarifai=True)
+            self.assertEqual(detectar.call_count, 6)
+            construir_indice(usar_clarifai=True)
+            self.assertEqual(detectar.call_count, 6)  # misma URL: no se vuelve a analizar
+        construir_indice()
+        conceptos = IndiceRecomendaciones.objects.get().conceptos
+        self.assertEqual(conceptos[str(self.gemelo.pk)]['conceptos'], {'jeans': 0.9})
+
+    def test_comando_y_detalle(self):
+        from django.core.management import call_command
+        from io import StringIO
+        salida = StringIO()
+        call_command('reconstruir_recomendaciones', stdout=salida)
+        self.assertIn('6 prendas', salida.getvalue())
+
+        sesion = self.client.session
+        sesion['id_usuario'] = self.usuario.id_usuario
+        sesion.save()
+        respuesta = self.client.get(f'/prenda/{self.referencia.pk}/')
+        self.assertEqual(respuesta.context['similares'][0], self.gemelo)
+        self.assertContains(respuesta, 'Prendas similares')
+
+
+class PermisosAnotadosPrendasTests(TestCase):
+    """Flags de permisos como anotaciones: las consultas no crecen con las prendas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(nombre='U', correo='u@permisos.cl', contrasena=CONTRASENA_HASH)
+        cls.otro = Usuario.objects.create(nombre='O', correo='o@permisos.cl', contrasena=CONTRASENA_HASH)
+        cls.propia = Prenda.objects.create(user=cls.usuario, nombre='Propia', categoria='Camiseta', talla='M')
+        cls.ajena = Prenda.objects.create(user=cls.otro, nombre='Ajena', categoria='Camiseta', talla='M')
+        cls.reservada = Prenda.objects.create(user=cls.usuario, nombre='Reservada', estado='RESERVADA')
+
+    def setUp(self):
+        cache.clear()
+        sesion = self.client.session
+        sesion['id_usuario'] = self.usuario.id_usuario
+        sesion.save()
+
+    def test_flags_coinciden_con_las_funciones(self):
+        from .views.auth import (
+            anotar_permisos_prenda, es_propietario_prenda, puede_proponer_transaccion,
+            puede_donar_prenda, puede_editar_prenda, puede_eliminar_prenda,
+        )
+        for usuario in (self.usuario, self.otro, None):
+            for prenda in anotar_permisos_prenda(Prenda.objects.all(), usuario):
+                self.assertEqual(
+                    (prenda.is_owner, prenda.can_propose, prenda.can_donate, prenda.can_edit, prenda.can_delete),
+                    (
+                        es_propietario_prenda(usuario, prenda), puede_proponer_transaccion(usuario, prenda),
+                        puede_donar_prenda(usuario, prenda), puede_editar_prenda(usuario, prenda),
+                        puede_eliminar_prenda(usuario, prenda),
+                    ),
+                    f'{usuario} / {prenda}',
+                )
+
+    def test_botones_segun_los_flags(self):
+        def enlaces(vista, prenda):
+            return f'href="{reverse(vista, args=[prenda.pk])}"'
+
+        respuesta = self.client.get('/prendas/')
+        self.assertContains(respuesta, enlaces('editar_prenda', self.propia))
+        self.assertContains(respuesta, enlaces('donar_prenda', self.propia))
+        self.assertNotContains(respuesta, enlaces('proponer_intercambio', self.propia))
+        self.assertContains(respuesta, enlaces('proponer_intercambio', self.ajena))
+        self.assertContains(respuesta, enlaces('comprar_prenda', self.ajena))
+        self.assertNotContains(respuesta, enlaces('editar_prenda', self.ajena))
+
+        # Las tarjetas ya están cacheadas: los botones del otro usuario no se cuelan
+        sesion = self.client.session
+        sesion['id_usuario'] = self.otro.id_usuario
+        sesion.save()
+        respuesta = self.client.get('/prendas/')
+        self.assertContains(respuesta, enlaces('proponer_intercambio', self.propia))
+        self.assertNotContains(respuesta, enlaces('editar_prenda', self.propia))
+        self.assertContains(respuesta, enlaces('editar_prenda', self.ajena))
+
+        respuesta = self.client.get('/mis-prendas/')
+        self.assertContains(respuesta, enlaces('donar_prenda', self.ajena))
+        self.assertContains(respuesta, enlaces('eliminar_prenda', self.ajena))
+
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(contexto.captured_queries)
+
+    def test_consultas_constantes(self):
+        antes = {url: self.consultas(url) for url in ('/prendas/', '/mis-prendas/')}
+        for i in range(5):
+            Prenda.objects.create(user=self.otro, nombre=f'Más {i}')
+            Prenda.objects.create(user=self.usuario, nombre=f'Mía {i}')
+        cache.clear()
+        for url, total in antes.items():
+            self.assertEqual(self.consultas(url), total, url)
+
+        respuesta = self.client.get('/mis-prendas/')
+        self.assertTrue(all(p.can_edit for p in respuesta.context['prendas']))
+
+
+@override_settings(TAREAS_SINCRONAS=True)
+class FragmentosTarjetasTests(TestCase):
+    """Tarjetas cacheadas por objeto + sello, invalidadas al guardar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(6)
+        cls.usuario = cls.datos['usuarios'][0]
+
+    def setUp(self):
+        cache.clear()
+        sesion = self.client.session
+        sesion['id_usuario'] = self.usuario.id_usuario
+        sesion.save()
+
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, len(contexto.captured_queries)
+
+    def test_campanas_sin_recalcular_avance(self):
+        _, frio = self.consultas('/campanas-solidarias')
+        respuesta, caliente = self.consultas('/campanas-solidarias')
+        self.assertEqual(caliente, frio)  # el avance es una columna: ni la tarjeta fría consulta por campaña
+        self.assertContains(respuesta, 'value="0"')
+
+        # Completar una donación de la campaña sube su contador y cambia el sello de su tarjeta
+        from .eventos import despachar_eventos
+        from .transiciones import cambiar_estado
+        donacion = Transaccion.objects.filter(campana=self.datos['campana'], tipo__nombre_tipo='Donación').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            cambiar_estado(donacion, 'EN_PROCESO', direccion_entrega='Calle 1')
+            cambiar_estado(donacion, 'COMPLETADA')
+            despachar_eventos()
+        respuesta, _ = self.consultas('/campanas-solidarias')
+        self.assertContains(respuesta, 'value="1"')
+
+        fundacion = self.datos['fundacion']
+        fundacion.nombre = 'Fundación Renombrada'
+        with self.captureOnCommitCallbacks(execute=True):
+            fundacion.save()
+        self.assertContains(self.client.get('/campanas-solidarias'), 'Fundación Renombrada')
+        self.assertContains(self.client.get('/fundaciones/'), 'Fundación Renombrada')
+
+    def test_prenda_guardada_se_vuelve_a_renderizar(self):
+        prenda = Prenda.objects.create(user=self.usuario, nombre='Original', categoria='Camiseta')
+        otra = Prenda.objects.create(user=self.usuario, nombre='Sin cambios', categoria='Camiseta')
+        self.client.get('/prendas/')
+        prenda.nombre = 'Prenda renombrada'
+        with self.captureOnCommitCallbacks(execute=True):
+            prenda.save()
+        respuesta = self.client.get('/prendas/')
+        self.assertContains(respuesta, 'Prenda renombrada')
+        self.assertContains(respuesta, otra.nombre)
+
+    def test_escritura_masiva_invalida_explicitamente(self):
+        from .fragmentos import invalidar_fragmentos
+        prenda = Prenda.objects.create(user=self.usuario, nombre='Antes del cambio', categoria='Camiseta')
+        self.assertContains(self.client.get('/prendas/'), 'Antes del cambio')
+        Prenda.objects.filter(pk=prenda.pk).update(nombre='Cambio masivo')
+        self.assertNotContains(self.client.get('/prendas/'), 'Cambio masivo')
+        invalidar_fragmentos(Prenda, [prenda.pk])
+        self.assertContains(self.client.get('/prendas/'), 'Cambio masivo')
+
+    def test_reserva_invalida_al_confirmar(self):
+        from .fragmentos import anotar_sellos
+        from .transiciones import reservar_prenda
+        prenda = Prenda.objects.create(user=self.usuario, nombre='Reservable', categoria='Camiseta')
+        sello = anotar_sellos([prenda])[0].sello_fragmento
+        version = VersionTabla.obtener([Prenda._meta.db_table])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(reservar_prenda(prenda.pk))
+            # Antes del commit nadie ve la versión ni el sello nuevos
+            self.assertEqual(VersionTabla.obtener([Prenda._meta.db_table]), version)
+            self.assertEqual(anotar_sellos([prenda])[0].sello_fragmento, sello)
+        self.assertNotEqual(VersionTabla.obtener([Prenda._meta.db_table]), version)
+        self.assertNotEqual(anotar_sellos([prenda])[0].sello_fragmento, sello)
+
+    def test_transicion_invalida_al_confirmar(self):
+        from .fragmentos import anotar_sellos
+        from .transiciones import cambiar_estado
+        transaccion = Transaccion.objects.select_related('prenda').filter(estado='PENDIENTE').first()
+        prenda = transaccion.prenda
+        sello = anotar_sellos([prenda])[0].sello_fragmento
+        version = VersionTabla.obtener([Prenda._meta.db_table])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as contexto:
+                cambiar_estado(transaccion, 'RECHAZADA')  # la prenda vuelve a DISPONIBLE (post_save)
+            self.assertFalse([q for q in contexto.captured_queries if 'version_tabla' in q['sql']])
+            self.assertEqual(anotar_sellos([prenda])[0].sello_fragmento, sello)
+        self.assertNotEqual(VersionTabla.obtener([Prenda._meta.db_table]), version)
+        self.assertNotEqual(anotar_sellos([prenda])[0].sello_fragmento, sello)
+
+
+class VariantesImagenPrendaTests(TestCase):
+    """URLs por tamaño calculadas al subir y usadas por la etiqueta imagen_prenda."""
+
+    URL = 'https://res.cloudinary.com/prueba/image/upload/v1700/ecoprenda/prendas/prenda_1.jpg'
+
+    def setUp(self):
+        import cloudinary
+        configuracion = cloudinary.config()
+        anterior = configuracion.cloud_name
+        cloudinary.config(cloud_name='prueba')
+        self.addCleanup(setattr, configuracion, 'cloud_name', anterior)
+        cache.clear()
+        self.usuario = Usuario.objects.create(nombre='U', correo='u@variantes.cl', contrasena=CONTRASENA_HASH)
+
+    def test_variantes_y_srcset(self):
+        from .cloudinary_utils import variantes_de_resultado
+        variantes = variantes_de_resultado({'public_id': 'ecoprenda/prendas/prenda_1', 'version': 1700})
+        self.assertEqual(
+            variantes['lista'],
+            'https://res.cloudinary.com/prueba/image/upload/c_fill,f_auto,h_300,q_auto,w_300/v1700/ecoprenda/prendas/prenda_1',
+        )
+        self.assertIn('w_150', variantes['miniatura'])
+        self.assertRegex(variantes['detalle_srcset'], r'w_400/v1700/\S+ 400w, \S+w_800/v1700/\S+ 800w$')
+        self.assertEqual(variantes_de_resultado({'secure_url': self.URL}), {})
+
+    @override_settings(TAREAS_SINCRONAS=True, SUBIDAS_BACKEND='local')
+    def test_subida_guarda_variantes(self):
+        from .subidas import BackendLocal, programar_subidas_desde_url
+        prenda = Prenda.objects.create(user=self.usuario, nombre='Chaqueta', imagen_prenda='https://otro.cl/a.jpg')
+        with mock.patch.object(BackendLocal, 'subir') as subir:
+            subir.return_value = {'secure_url': self.URL, 'public_id': 'ecoprenda/prendas/prenda_1', 'version': 1700}
+            with self.captureOnCommitCallbacks(execute=True):
+                programar_subidas_desde_url('prenda', {prenda.pk: prenda.imagen_prenda})
+        prenda.refresh_from_db()
+        self.assertIn('c_fill', prenda.imagen_variantes['lista'])
+
+    def test_etiqueta_y_comando(self):
+        from django.core.management import call_command
+        from django.template import Context, Template
+        from io import StringIO
+        prenda = Prenda.objects.create(user=self.usuario, nombre='Chaqueta', imagen_prenda=self.URL)
+        plantilla = Template("{% load imagenes %}{% imagen_prenda prenda 'lista' clase='card-img-top' %}")
+
+        # Sin variantes: URL original, sin srcset
+        html = plantilla.render(Context({'prenda': prenda}))
+        self.assertIn(f'src="{self.URL}"', html)
+        self.assertNotIn('srcset', html)
+
+        call_command('generar_variantes_imagenes', stdout=StringIO())
+        prenda.refresh_from_db()
+        html = plantilla.render(Context({'prenda': prenda}))
+        self.assertIn('src="https://res.cloudinary.com/prueba/image/upload/c_fill,f_auto,h_300,q_auto,w_300/v1700/', html)
+        self.assertIn(' 600w"', html)
+        self.assertIn('sizes="', html)
+        self.assertIn('loading="lazy"', html)
+
+
+class SubidasImagenTests(TestCase):
+    """Subidas en segundo plano con el backend local (sin red)."""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        self.media = tempfile.mkdtemp()
+        self.temporales = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.temporales, ignore_errors=True)
+        ajustes = self.settings(
+            SUBIDAS_BACKEND='local', MEDIA_ROOT=self.media, SUBIDAS_DIR=self.temporales,
+            SUBIDAS_ESPERA_BASE=0, SUBIDAS_MAX_INTENTOS=3, TAREAS_SINCRONAS=True,
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        cache.clear()
+        self.usuario = Usuario.objects.create(nombre='U', correo='u@subidas.cl', contrasena=CONTRASENA_HASH)
+        self.prenda = Prenda.objects.create(user=self.usuario, nombre='Chaqueta', categoria='Chaqueta')
+
+    def archivo(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return SimpleUploadedFile('foto.JPG', b'\xff\xd8\xff' + b'0' * 2048, content_type='image/jpeg')
+
+    def test_crear_prenda_responde_sin_esperar_la_subida(self):
+        import os
+        sesion = self.client.session
+        sesion['id_usuario'] = self.usuario.id_usuario
+        sesion.save()
+        datos = {
+            'nombre': 'Polerón', 'descripcion': 'Azul', 'categoria': 'Camiseta', 'talla': 'M',
+            'estado': 'Bueno', 'imagen_prenda': self.archivo(),
+        }
+        with self.captureOnCommitCallbacks() as callbacks:
+            respuesta = self.client.post('/prenda/nueva/', datos)
+        self.assertEqual(respuesta.status_code, 302)
+        prenda = Prenda.objects.get(nombre='Polerón')
+        subida = SubidaImagen.objects.get()
+        self.assertEqual((subida.estado, prenda.imagen_prenda), ('PENDIENTE', None))
+        self.assertTrue(os.path.exists(subida.ruta_temporal))
+
+        for callback in callbacks:  # el worker, después del commit
+            callback()
+        subida.refresh_from_db()
+        prenda.refresh_from_db()
+        self.assertEqual(subida.estado, 'COMPLETADA')
+        self.assertEqual(prenda.imagen_prenda, f'/media/ecoprenda/prendas/prenda_{prenda.pk}.jpg')
+        self.assertTrue(os.path.exists(os.path.join(self.media, 'ecoprenda', 'prendas', f'prenda_{prenda.pk}.jpg')))
+        self.assertFalse(os.path.exists(subida.ruta_temporal))
+
+    def test_reintentos_con_espera(self):
+        from .subidas import BackendLocal, programar_subida
+        correcto = {'secure_url': 'https://cdn.test/prenda.jpg', 'public_id': None}
+        with mock.patch.object(BackendLocal, 'subir', side_effect=[ConnectionError('red'), correcto]), \
+                self.captureOnCommitCallbacks(execute=True):
+            subida = programar_subida(self.archivo(), 'prenda', self.prenda.pk)
+        subida.refresh_from_db()
+        self.assertEqual((subida.estado, subida.intentos), ('COMPLETADA', 2))
+        self.prenda.refresh_from_db()
+        self.assertEqual(self.prenda.imagen_prenda, 'https://cdn.test/prenda.jpg')
+
+    def test_reintento_se_vuelve_a_encolar(self):
+        from .subidas import BackendLocal, procesar_subida, programar_subida
+        with self.captureOnCommitCallbacks():
+            subida = programar_subida(self.archivo(), 'prenda', self.prenda.pk)
+        with mock.patch.object(BackendLocal, 'subir', side_effect=ConnectionError('red')), \
+                mock.patch('App.subidas.encolar_con_espera') as encolar_con_espera:
+            procesar_subida(subida.pk)
+        # El worker no espera: deja la subida PENDIENTE y la reprograma
+        subida.refresh_from_db()
+        self.assertEqual((subida.estado, subida.intentos, subida.error), ('PENDIENTE', 1, 'red'))
+        _, funcion, *argumentos = encolar_con_espera.call_args.args
+        self.assertEqual((funcion, argumentos), (procesar_subida, [subida.pk, 2]))
+
+    def test_fallida_se_reanuda_con_el_comando(self):
+        import os
+        from io import StringIO
+        from django.core.management import call_command
+        from .subidas import BackendLocal, programar_subida
+        with mock.patch.object(BackendLocal, 'subir', side_effect=TimeoutError('lento')), \
+                self.captureOnCommitCallbacks(execute=True):
+            subida = programar_subida(self.archivo(), 'prenda', self.prenda.pk)
+        subida.refresh_from_db()
+        self.assertEqual((subida.estado, subida.intentos, subida.error), ('FALLIDA', 3, 'lento'))
+        self.assertTrue(os.path.exists(subida.ruta_temporal))  # se conserva para reanudar
+
+        salida = StringIO()
+        call_command('procesar_subidas', stdout=salida)
+        self.assertIn('completadas 1', salida.getvalue())
+        subida.refresh_from_db()
+        self.assertEqual((subida.estado, subida.intentos), ('COMPLETADA', 4))
+
+    def test_foto_de_perfil_pasa_por_la_cola(self):
+        sesion = self.client.session
+        sesion['id_usuario'] = self.usuario.id_usuario
+        sesion.save()
+        with self.captureOnCommitCallbacks() as callbacks:
+            respuesta = self.client.post('/perfil/actualizar-foto/', {'imagen_usuario': self.archivo()})
+        self.assertEqual(respuesta.status_code, 302)
+        subida = SubidaImagen.objects.get()
+        self.assertEqual((subida.destino, subida.objeto_id), ('usuario', self.usuario.pk))
+        self.usuario.refresh_from_db()
+        self.assertFalse(self.usuario.imagen_usuario)  # la petición no sube nada
+
+        for callback in callbacks:
+            callback()
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.imagen_usuario.name, f'ecoprenda/usuarios/usuario_{self.usuario.pk}.jpg')
+        self.assertEqual(self.usuario.url_imagen, f'/media/ecoprenda/usuarios/usuario_{self.usuario.pk}.jpg')
+
+
+class TransicionesTransaccionTests(TestCase):
+    """Máquina de estados: validación, bloqueo y una escritura por fila."""
+
+    def setUp(self):
+        cache.clear()
+        self.fundacion = Fundacion.objects.create(nombre='Fundación', activa=True, lat=-33.45, lng=-70.66)
+        self.donante = Usuario.objects.create(nombre='Donante', correo='donante@test.cl', contrasena=CONTRASENA_HASH)
+        self.comprador = Usuario.objects.create(nombre='Comprador', correo='comprador@test.cl', contrasena=CONTRASENA_HASH)
+        self.prenda = Prenda.objects.create(user=self.donante, nombre='Abrigo', categoria='Chaqueta')
+        self.donacion = TipoTransaccion.objects.create(nombre_tipo='Donación')
+        self.venta = TipoTransaccion.objects.create(nombre_tipo='Venta')
+
+    def iniciar_sesion(self, usuario):
+        sesion = self.client.session
+        sesion['id_usuario'] = usuario.id_usuario
+        sesion.save()
+
+    def updates(self, contexto):
+        """UPDATE sobre transaccion y prenda (sin el contador de VersionTabla)."""
+        return [
+            q['sql'] for q in contexto.captured_queries
+            if q['sql'].startswith(('UPDATE "transaccion"', 'UPDATE "prenda"'))
+        ]
+
+    def test_donar_aparta_la_prenda(self):
+        self.iniciar_sesion(self.donante)
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.post(f'/donar/{self.prenda.pk}/', {'fundacion': self.fundacion.pk})
+        self.assertEqual(respuesta.status_code, 302)
+        # Los logros los revisa la bandeja de salida, no la petición
+        self.assertFalse([q for q in contexto.captured_queries if 'logro' in q['sql'].lower()])
+        transaccion = Transaccion.objects.get()
+        self.prenda.refresh_from_db()
+        self.assertEqual((transaccion.estado, self.prenda.estado), ('PENDIENTE', 'RESERVADA'))
+
+    def test_prenda_apartada_no_admite_otra_transaccion(self):
+        from .transiciones import TransicionInvalida, crear_transaccion
+        vista_anterior = Prenda.objects.get(pk=self.prenda.pk)  # leída antes de la primera compra
+        crear_transaccion(self.prenda, self.venta, user_origen=self.donante, user_destino=self.comprador)
+        with self.assertRaises(TransicionInvalida):
+            crear_transaccion(vista_anterior, self.venta, user_origen=self.donante, user_destino=self.comprador)
+        self.assertEqual(Transaccion.objects.count(), 1)
+
+    def test_crear_aparta_la_prenda_con_un_update_condicionado(self):
+        from .transiciones import crear_transaccion
+        with CaptureQueriesContext(connection) as contexto:
+            crear_transaccion(self.prenda, self.venta, user_origen=self.donante, user_destino=self.comprador)
+        sentencias = self.updates(contexto)
+        self.assertEqual(len(sentencias), 1)  # Transaccion.save no vuelve a escribir la prenda
+        self.assertIn("'DISPONIBLE'", sentencias[0].split('WHERE')[1])
+        self.assertEqual(Prenda.objects.get(pk=self.prenda.pk).estado, 'EN_PROCESO')
+
+    def test_una_escritura_por_fila_y_solo_la_columna_estado(self):
+        from .transiciones import cambiar_estado, crear_transaccion
+        transaccion = crear_transaccion(self.prenda, self.donacion, user_origen=self.donante, fundacion=self.fundacion)
+        with CaptureQueriesContext(connection) as contexto:
+            cambiar_estado(transaccion, 'EN_PROCESO', direccion_entrega='Calle 1')
+        sentencias = self.updates(contexto)
+        self.assertEqual(len(sentencias), 2)
+        prenda_sql = next(q for q in sentencias if q.startswith('UPDATE "prenda"'))
+        self.assertIn('"estado"', prenda_sql)
+        self.assertNotIn('"nombre"', prenda_sql)
+
+        with CaptureQueriesContext(connection) as contexto:
+            cambiar_estado(transaccion, 'COMPLETADA', desde=('EN_PROCESO',), fecha_entrega=timezone.now())
+        self.assertEqual(len(self.updates(contexto)), 2)
+        self.prenda.refresh_from_db()
+        self.assertEqual(self.prenda.estado, 'DONADA')
+
+    def test_segunda_reserva_no_actualiza_ninguna_fila(self):
+        # Versión secuencial de ReservaPrendaConcurrenteTests: corre también en SQLite
+        from django.db.models import QuerySet
+        from .transiciones import reservar_prenda
+        filas = []
+        update = QuerySet.update
+
+        def contar_filas(queryset, **campos):
+            filas.append(update(queryset, **campos))
+            return filas[-1]
+
+        with mock.patch.object(QuerySet, 'update', contar_filas):
+            with self.captureOnCommitCallbacks() as primera:
+                self.assertTrue(reservar_prenda(self.prenda.pk))
+            with self.captureOnCommitCallbacks() as segunda:
+                self.assertFalse(reservar_prenda(self.prenda.pk, 'EN_PROCESO'))
+        self.assertEqual(filas, [1, 0])
+        self.assertEqual((len(primera), len(segunda)), (1, 0))  # sin invalidar caché si no apartó
+        self.prenda.refresh_from_db()
+        self.assertEqual(self.prenda.estado, 'RESERVADA')
+
+    def test_intercambio_aparta_la_prenda_ofrecida(self):
+        from .transiciones import cambiar_estado
+        TipoTransaccion.objects.create(nombre_tipo='Intercambio')
+        ofrecida = Prenda.objects.create(user=self.comprador, nombre='Bufanda', categoria='Accesorios')
+        otra = Prenda.objects.create(user=self.donante, nombre='Gorro', categoria='Accesorios')
+        self.iniciar_sesion(self.comprador)
+
+        self.client.post(f'/intercambio/{self.prenda.pk}/', {'prenda_origen': ofrecida.pk})
+        transaccion = Transaccion.objects.get()
+        self.assertEqual(transaccion.prenda_ofrecida_id, ofrecida.pk)
+        ofrecida.refresh_from_db()
+        self.assertEqual(ofrecida.estado, 'EN_PROCESO')
+
+        # La misma prenda no se puede ofrecer en otro intercambio, ni aunque la vista la leyera disponible
+        ofrecida.estado = 'DISPONIBLE'
+        with mock.patch('App.views.transaccion.get_object_or_404', side_effect=[otra, ofrecida]):
+            self.client.post(f'/intercambio/{otra.pk}/', {'prenda_origen': ofrecida.pk})
+        self.assertEqual(Transaccion.objects.count(), 1)
+        otra.refresh_from_db()
+        self.assertEqual(otra.estado, 'DISPONIBLE')  # el rollback la libera
+
+        cambiar_estado(transaccion, 'CANCELADA')
+        ofrecida.refresh_from_db()
+        self.assertEqual(ofrecida.estado, 'DISPONIBLE')
+
+    def test_transiciones_invalidas_no_escriben(self):
+        from .transiciones import TransicionInvalida, cambiar_estado, crear_transaccion
+        transaccion = crear_transaccion(self.prenda, self.venta, user_origen=self.donante, user_destino=self.comprador)
+        with self.assertRaises(TransicionInvalida):
+            cambiar_estado(transaccion, 'COMPLETADA')  # hay que pasar por EN_PROCESO
+        with self.assertRaises(TransicionInvalida):
+            cambiar_estado(transaccion, 'CANCELADA', desde=('EN_PROCESO',))
+        transaccion.refresh_from_db()
+        self.assertEqual(transaccion.estado, 'PENDIENTE')
+
+    def test_vista_aceptar_y_cancelar(self):
+        from .transiciones import crear_transaccion
+        transaccion = crear_transaccion(self.prenda, self.venta, user_origen=self.donante, user_destino=self.comprador)
+        self.iniciar_sesion(self.comprador)
+        url = f'/transaccion/{transaccion.pk}/estado/'
+
+        self.assertEqual(self.client.post(url, {'estado': 'COMPLETADA'}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'estado': 'ACEPTADA'}).status_code, 302)
+        self.prenda.refresh_from_db()
+        self.assertEqual(self.prenda.estado, 'RESERVADA')
+
+        self.assertEqual(self.client.post(url, {'estado': 'CANCELADA'}).status_code, 302)
+        self.prenda.refresh_from_db()
+        self.assertEqual(self.prenda.estado, 'DISPONIBLE')
+        self.assertEqual(self.client.post(url, {'estado': 'ACEPTADA'}).status_code, 400)
+
+
+    def test_disputar_transaccion_cerrada_responde_400(self):
+        from .transiciones import cambiar_estado, crear_transaccion
+        transaccion = crear_transaccion(self.prenda, self.venta, user_origen=self.donante, user_destino=self.comprador)
+        cambiar_estado(transaccion, 'EN_PROCESO', direccion_entrega='Calle 1')
+        self.iniciar_sesion(self.comprador)
+        url = f'/transaccion/{transaccion.pk}/reportar-disputa/'
+
+        # La vista la leyó en proceso, pero se completó antes de escribir
+        cambiar_estado(transaccion, 'COMPLETADA')
+        leida = Transaccion.objects.select_related('prenda', 'user_destino').get(pk=transaccion.pk)
+        leida.estado = 'EN_PROCESO'
+        with mock.patch('App.views.transaccion.get_object_or_404', return_value=leida):
+            respuesta = self.client.post(url, {'razon_disputa': 'La prenda llegó rota y manchada'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('No se puede pasar de Completada', respuesta.json()['error'])
+        self.assertEqual(Transaccion.objects.get(pk=transaccion.pk).estado, 'COMPLETADA')
+
+        # Sin carrera, la vista la rechaza antes de intentar el cambio
+        respuesta = self.client.post(url, {'razon_disputa': 'La prenda llegó rota y manchada'})
+        self.assertRedirects(respuesta, '/mis-transacciones/', fetch_redirect_response=False)
+
+@override_settings(TAREAS_SINCRONAS=True)
+@skipUnlessDBFeature('test_db_allows_multiple_connections')  # No en SQLite en memoria: bloquea la tabla entera
+class ReservaPrendaConcurrenteTests(TransactionTestCase):
+    """
+    Varios hilos piden la misma prenda a la vez, cada uno con su conexión: solo
+    uno la aparta. En SQLite corre solo la versión secuencial
+    (TransicionesTransaccionTests.test_segunda_reserva_no_actualiza_ninguna_fila).
+    """
+
+    HILOS = 8
+
+    def setUp(self):
+        TipoTransaccion.invalidar_registro()
+        self.vendedor = Usuario.objects.create(nombre='Vendedor', correo='vendedor@test.cl', contrasena=CONTRASENA_HASH)
+        self.compradores = [
+            Usuario.objects.create(nombre=f'Comprador {i}', correo=f'c{i}@test.cl', contrasena=CONTRASENA_HASH)
+            for i in range(self.HILOS)
+        ]
+        self.venta = TipoTransaccion.objects.create(nombre_tipo='Venta')
+
+    def en_paralelo(self, funcion):
+        """Ejecuta funcion(i) en HILOS hilos que arrancan juntos; devuelve los resultados o excepciones."""
+        barrera = threading.Barrier(self.HILOS)
+        resultados = [None] * self.HILOS
+
+        def trabajar(i):
+            try:
+                barrera.wait()
+                resultados[i] = funcion(i)
+            except Exception as e:
+                resultados[i] = e
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajar, args=(i,)) for i in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resultados
+
+    def test_reservar_prenda_una_sola_vez(self):
+        from .transiciones import reservar_prenda
+        for ronda in range(5):
+            prenda = Prenda.objects.create(user=self.vendedor, nombre=f'Polera {ronda}', categoria='Camiseta')
+            resultados = self.en_paralelo(lambda i: reservar_prenda(prenda.pk))
+            self.assertEqual(resultados.count(True), 1, resultados)
+            self.assertEqual(resultados.count(False), self.HILOS - 1, resultados)
+            prenda.refresh_from_db()
+            self.assertEqual(prenda.estado, 'RESERVADA')
+
+    def test_compras_simultaneas_crean_una_transaccion(self):
+        from .transiciones import TransicionInvalida, crear_transaccion
+        prenda = Prenda.objects.create(user=self.vendedor, nombre='Abrigo', categoria='Chaqueta')
+        resultados = self.en_paralelo(lambda i: crear_transaccion(
+            # Cada hilo lee la prenda y la pide, como la vista
+            Prenda.objects.get(pk=prenda.pk), self.venta,
+            user_origen=self.vendedor, user_destino=self.compradores[i],
+        ))
+        creadas = [r for r in resultados if isinstance(r, Transaccion)]
+        rechazadas = [r for r in resultados if isinstance(r, TransicionInvalida)]
+        self.assertEqual((len(creadas), len(rechazadas)), (1, self.HILOS - 1), resultados)
+        self.assertEqual(Transaccion.objects.filter(prenda=prenda).count(), 1)
+        prenda.refresh_from_db()
+        self.assertEqual(prenda.estado, 'EN_PROCESO')
+
+
+class RegistroTiposTransaccionTests(TestCase):
+    """Tipos de transacción en memoria y filtros por tipo_id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(6)
+
+    def setUp(self):
+        TipoTransaccion.invalidar_registro()  # el rollback entre tests no dispara señales
+
+    def test_se_lee_una_vez(self):
+        with self.assertNumQueries(1):
+            TipoTransaccion.obtener(TipoTransaccion.DONACION)
+            TipoTransaccion.id_de(TipoTransaccion.VENTA)
+        transaccion = Transaccion.objects.filter(tipo=self.datos['tipos'][0]).first()
+        with self.assertNumQueries(0):
+            self.assertTrue(transaccion.es_donacion())
+            self.assertEqual(transaccion.nombre_tipo(), TipoTransaccion.DONACION)
+            self.assertEqual(TipoTransaccion.obtener(TipoTransaccion.INTERCAMBIO), self.datos['tipos'][2])
+
+    def test_editar_un_tipo_invalida_el_registro(self):
+        TipoTransaccion.registro()
+        tipo = self.datos['tipos'][1]
+        tipo.nombre_tipo = 'Venta solidaria'
+        tipo.save()
+        self.assertIsNone(TipoTransaccion.id_de(TipoTransaccion.VENTA))
+        nuevo = TipoTransaccion.obtener(TipoTransaccion.VENTA)  # se vuelve a crear
+        self.assertNotEqual(nuevo.pk, tipo.pk)
+        self.assertEqual(TipoTransaccion.id_de(TipoTransaccion.VENTA), nuevo.pk)
+
+    def test_tipo_creado_en_otro_proceso_se_encuentra(self):
+        TipoTransaccion.objects.filter(nombre_tipo=TipoTransaccion.VENTA).delete()
+        TipoTransaccion.registro(recargar=True)  # Este proceso ya leyó la tabla sin Venta
+        # Otro worker crea el tipo: aquí no llega ninguna señal
+        TipoTransaccion.objects.bulk_create([TipoTransaccion(nombre_tipo=TipoTransaccion.VENTA)])
+        venta = TipoTransaccion.objects.get(nombre_tipo=TipoTransaccion.VENTA)
+        with self.assertNumQueries(1):  # Una relectura, luego el registro ya lo tiene
+            self.assertEqual(TipoTransaccion.id_de(TipoTransaccion.VENTA), venta.pk)
+            self.assertEqual(TipoTransaccion.nombre_de(venta.pk), TipoTransaccion.VENTA)
+
+    def test_obtener_agrega_el_tipo_creado_al_registro(self):
+        TipoTransaccion.objects.filter(nombre_tipo=TipoTransaccion.VENTA).delete()
+        TipoTransaccion.registro()
+        venta = TipoTransaccion.obtener(TipoTransaccion.VENTA)
+        with self.assertNumQueries(0):
+            self.assertEqual(TipoTransaccion.id_de(TipoTransaccion.VENTA), venta.pk)
+
+    def test_filtros_sin_unir_tipo_transaccion(self):
+        TipoTransaccion.registro()
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual(self.datos['fundacion'].total_donaciones_recibidas(), 2)
+            totales = Transaccion.contar_por_tipo(Transaccion.objects.all())
+        self.assertEqual(len(contexto.captured_queries), 2)
+        self.assertFalse(any('tipo_transaccion' in q['sql'] for q in contexto.captured_queries))
+        self.assertEqual(
+            totales,
+            {TipoTransaccion.DONACION: 2, TipoTransaccion.VENTA: 2, TipoTransaccion.INTERCAMBIO: 2, 'total': 6},
+        )
+
+
+@override_settings(TAREAS_SINCRONAS=True)
+class GestionDonacionesLoteTests(PresupuestoConsultasMixin, TestCase):
+    """Confirmación y rechazo masivo de donaciones por el representante."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fundacion = Fundacion.objects.create(nombre='Fundación', activa=True, lat=-33.45, lng=-70.66)
+        otra = Fundacion.objects.create(nombre='Otra', activa=True, lat=-33.0, lng=-70.0)
+        cls.representante = Usuario.objects.create(
+            nombre='Repr', correo='repr@lote.cl', contrasena=CONTRASENA_HASH,
+            rol='REPRESENTANTE_FUNDACION', fundacion_asignada=cls.fundacion,
+        )
+        Logro.objects.create(
+            codigo='DONADOR', nombre='Donador', descripcion='d', tipo='DONACION', icono='bi', requisito_valor=1
+        )
+        donacion = TipoTransaccion.objects.create(nombre_tipo='Donación')
+        cls.enviadas, cls.pendientes = [], []
+        for i in range(30):
+            donante = Usuario.objects.create(nombre=f'D{i}', correo=f'd{i}@lote.cl', contrasena=CONTRASENA_HASH)
+            prenda = Prenda.objects.create(user=donante, nombre=f'Prenda {i}', categoria='Chaqueta')
+            fundacion = otra if i == 29 else cls.fundacion
+            transaccion = Transaccion.objects.create(
+                prenda=prenda, tipo=donacion, user_origen=donante, fundacion=fundacion,
+                estado='EN_PROCESO' if i % 3 else 'PENDIENTE', direccion_entrega='Calle 1',
+            )
+            (cls.enviadas if i % 3 else cls.pendientes).append(transaccion)
+
+    def setUp(self):
+        cache.clear()
+        TipoTransaccion.invalidar_registro()
+        sesion = self.client.session
+        sesion['id_usuario'] = self.representante.id_usuario
+        sesion.save()
+
+    def enviar(self, accion, transacciones):
+        ids = [t.pk for t in transacciones]
+        return self.client.post('/gestionar-donaciones/', {'accion': accion, 'donaciones': ids})
+
+    def test_confirmar_en_lote(self):
+        todas = self.enviadas + self.pendientes
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertMaxQueries(16, 'Confirmación de 30 donaciones'):
+                respuesta = self.enviar('confirmar', todas)
+        self.assertEqual(respuesta.status_code, 302)
+
+        propias = [t for t in self.enviadas if t.fundacion_id == self.fundacion.pk]
+        completadas = Transaccion.objects.filter(estado='COMPLETADA')
+        self.assertEqual(set(completadas.values_list('pk', flat=True)), {t.pk for t in propias})
+        self.assertFalse(completadas.filter(fecha_entrega__isnull=True).exists())
+        self.assertEqual(Prenda.objects.filter(estado='DONADA').count(), len(propias))
+        self.assertEqual(Transaccion.objects.filter(estado='PENDIENTE').count(), len(self.pendientes))
+        self.assertEqual(Mensaje.objects.filter(emisor=self.representante).count(), len(propias))
+        # Logros evaluados después del commit, una vez por donante
+        self.assertEqual(UsuarioLogro.objects.filter(logro_id='DONADOR').count(), len(propias))
+
+    def test_rechazar_solo_pendientes(self):
+        self.enviar('rechazar', self.pendientes + self.enviadas[:2])
+        self.assertEqual(Transaccion.objects.filter(estado='RECHAZADA').count(), len(self.pendientes))
+        self.assertEqual(Transaccion.objects.filter(estado='EN_PROCESO').count(), len(self.enviadas))
+        prendas = Prenda.objects.filter(transaccion__in=self.pendientes)
+        self.assertEqual(set(prendas.values_list('estado', flat=True)), {'DISPONIBLE'})
+
+    def test_listado_y_confirmacion_individual(self):
+        with self.assertMaxQueries(8, 'Listado de donaciones'):
+            respuesta = self.client.get('/gestionar-donaciones/')
+        self.assertEqual(len(respuesta.context['donaciones']), 29)
+        transaccion = self.enviadas[0]
+        self.assertContains(respuesta, f'/donacion/{transaccion.pk}/confirmar/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/donacion/{transaccion.pk}/confirmar/')
+        transaccion.refresh_from_db()
+        self.assertEqual(transaccion.estado, 'COMPLETADA')
+        self.assertTrue(UsuarioLogro.objects.filter(user_id=transaccion.user_origen_id).exists())
+
+
+class BandejaSalidaEventosTests(TestCase):
+    """Outbox de cambios de estado y su despachador."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fundacion = Fundacion.objects.create(nombre='Fundación', activa=True, lat=-33.45, lng=-70.66)
+        cls.representante = Usuario.objects.create(
+            nombre='Repr', correo='repr@eventos.cl', contrasena=CONTRASENA_HASH,
+            rol='REPRESENTANTE_FUNDACION', fundacion_asignada=cls.fundacion,
+        )
+        Logro.objects.create(
+            codigo='DONADOR', nombre='Donador', descripcion='d', tipo='DONACION', icono='bi', requisito_valor=1
+        )
+        cls.donacion = TipoTransaccion.objects.create(nombre_tipo='Donación')
+        cls.transacciones = []
+        for i in range(3):
+            donante = Usuario.objects.create(nombre=f'D{i}', correo=f'd{i}@eventos.cl', contrasena=CONTRASENA_HASH)
+            prenda = Prenda.objects.create(user=donante, nombre=f'Prenda {i}', categoria='Pantalón')
+            cls.transacciones.append(Transaccion.objects.create(
+                prenda=prenda, tipo=cls.donacion, user_origen=donante, fundacion=cls.fundacion,
+                estado='EN_PROCESO', direccion_entrega='Calle 1',
+            ))
+
+    def setUp(self):
+        TipoTransaccion.invalidar_registro()
+
+    def completar(self, transaccion):
+        from .transiciones import cambiar_estado
+        return cambiar_estado(transaccion, 'COMPLETADA', actor=self.representante)
+
+    def test_evento_en_la_misma_transaccion_y_efectos_despues(self):
+        from io import StringIO
+        from django.core.management import call_command
+        transaccion = self.transacciones[0]
+        self.completar(transaccion)
+        evento = EventoTransaccion.objects.get()
+        self.assertEqual((evento.estado_anterior, evento.estado, evento.actor_id),
+                         ('EN_PROCESO', 'COMPLETADA', self.representante.pk))
+        # Nada se aplicó durante la petición
+        self.assertFalse(Mensaje.objects.exists())
+        self.assertFalse(ImpactoAmbiental.objects.exists())
+
+        salida = StringIO()
+        call_command('despachar_eventos', stdout=salida)
+        self.assertIn('Eventos procesados: 1', salida.getvalue())
+        evento.refresh_from_db()
+        self.assertIsNotNone(evento.fecha_procesado)
+        mensaje = Mensaje.objects.get()
+        self.assertEqual((mensaje.emisor_id, mensaje.receptor_id), (self.representante.pk, transaccion.user_origen_id))
+        self.assertTrue(ImpactoAmbiental.objects.filter(prenda_id=transaccion.prenda_id).exists())
+        self.assertTrue(UsuarioLogro.objects.filter(user_id=transaccion.user_origen_id).exists())
+
+        call_command('despachar_eventos', stdout=StringIO())  # ya procesado: no se repite
+        self.assertEqual(Mensaje.objects.count(), 1)
+
+    def test_cambio_fallido_no_deja_evento(self):
+        from .transiciones import cambiar_estado
+        pendiente = Transaccion.objects.create(
+            prenda=Prenda.objects.create(user=self.representante, nombre='Extra'), tipo=self.donacion,
+            user_origen=self.representante, fundacion=self.fundacion,
+        )
+        with self.assertRaises(ValueError):
+            cambiar_estado(pendiente, 'EN_PROCESO')  # falta la dirección de entrega
+        self.assertFalse(EventoTransaccion.objects.exists())
+
+    def test_evento_que_falla_no_bloquea_el_lote(self):
+        from . import eventos
+        for transaccion in self.transacciones:
+            self.completar(transaccion)
+        mala = self.transacciones[1].pk
+
+        def manejador_fragil(lote):
+            if any(evento.transaccion_id == mala for evento in lote):
+                raise RuntimeError('sin conexión')
+
+        with mock.patch.object(eventos, 'MANEJADORES', [manejador_fragil, *eventos.MANEJADORES]):
+            self.assertEqual(eventos.despachar_eventos(), (2, 1))
+            fallido = EventoTransaccion.objects.get(transaccion_id=mala)
+            self.assertEqual((fallido.intentos, fallido.error), (1, 'sin conexión'))
+            self.assertEqual(Mensaje.objects.count(), 2)
+
+            EventoTransaccion.objects.filter(pk=fallido.pk).update(intentos=eventos.MAX_INTENTOS)
+            self.assertEqual(eventos.despachar_eventos(), (0, 0))  # agotado: ya no se reintenta
+
+        EventoTransaccion.objects.filter(pk=fallido.pk).update(intentos=0)
+        self.assertEqual(eventos.despachar_eventos(), (1, 0))
+        self.assertEqual(Mensaje.objects.count(), 3)
+
+
+class ContadoresCampanaTests(TestCase):
+    """Avance de campañas en un contador mantenido por los eventos y reconciliado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(9)
+        cls.campana = cls.datos['campana']
+        cls.otra = CampanaFundacion.objects.create(
+            fundacion=cls.datos['fundacion'], nombre='Otra', descripcion='d', objetivo_prendas=4,
+            categorias_solicitadas='Camiseta',
+        )
+        cls.donaciones = list(
+            Transaccion.objects.filter(campana=cls.campana, tipo=cls.datos['tipos'][0]).order_by('pk')
+        )  # 3 donaciones PENDIENTE
+
+    def setUp(self):
+        TipoTransaccion.invalidar_registro()
+
+    def completar(self, transacciones):
+        from .transiciones import cambiar_estado_lote
+        ids = [t.pk for t in transacciones]
+        cambiar_estado_lote(Transaccion.objects.filter(pk__in=ids), 'EN_PROCESO', direccion_entrega='Calle 1')
+        cambiar_estado_lote(Transaccion.objects.filter(pk__in=ids), 'COMPLETADA')
+
+    def test_contador_sube_al_despachar_donaciones_completadas(self):
+        from .eventos import despachar_eventos
+        Transaccion.objects.filter(pk=self.donaciones[2].pk).update(campana=self.otra)
+        self.completar(self.donaciones)
+        self.campana.refresh_from_db()
+        self.assertEqual(self.campana.prendas_donadas_count, 0)  # aún no se despacha
+
+        despachar_eventos()
+        self.campana.refresh_from_db()
+        self.otra.refresh_from_db()
+        self.assertEqual((self.campana.prendas_donadas_count, self.otra.prendas_donadas_count), (2, 1))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.campana.prendas_donadas(), 2)
+            self.assertEqual(self.otra.porcentaje_completado(), 25)
+
+        despachar_eventos()  # eventos ya procesados: no se vuelve a sumar
+        self.campana.refresh_from_db()
+        self.assertEqual(self.campana.prendas_donadas_count, 2)
+
+    def test_reconciliacion_corrige_desfases(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .contadores import reconciliar_prendas_donadas
+        # Cambios que no pasan por transiciones.py
+        Transaccion.objects.filter(pk__in=[t.pk for t in self.donaciones]).update(estado='COMPLETADA')
+        CampanaFundacion.objects.filter(pk=self.otra.pk).update(prendas_donadas_count=7)
+
+        salida = StringIO()
+        call_command('reconciliar_contadores', stdout=salida)
+        self.assertIn('Contadores corregidos: 2', salida.getvalue())
+        self.assertEqual(
+            dict(CampanaFundacion.objects.values_list('pk', 'prendas_donadas_count')),
+            {self.campana.pk: 3, self.otra.pk: 0},
+        )
+        with self.assertNumQueries(2):  # conteo agrupado + contadores guardados
+            self.assertEqual(reconciliar_prendas_donadas(), {})
+
+    def test_listado_sin_conteo_por_campana(self):
+        sesion = self.client.session
+        sesion['id_usuario'] = self.datos['representante'].id_usuario
+        sesion.save()
+
+        def consultas():
+            with CaptureQueriesContext(connection) as contexto:
+                self.assertEqual(self.client.get('/mis-campanas/').status_code, 200)
+            return len(contexto.captured_queries)
+
+        antes = consultas()
+        for i in range(5):
+            CampanaFundacion.objects.create(
+                fundacion=self.datos['fundacion'], nombre=f'Más {i}', descripcion='d', objetivo_prendas=10,
+                categorias_solicitadas='Camiseta',
+            )
+        self.assertEqual(consultas(), antes)
+
+
+class ResumenesDiariosFundacionTests(PresupuestoConsultasMixin, TestCase):
+    """Paneles de la fundación leídos desde resúmenes diarios mantenidos por los eventos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(6)  # 2 donaciones PENDIENTE (Camiseta, impacto 5.5 kg)
+        cls.fundacion = cls.datos['fundacion']
+        cls.donaciones = list(Transaccion.objects.filter(tipo=cls.datos['tipos'][0]).order_by('pk'))
+
+    def setUp(self):
+        cache.clear()
+        TipoTransaccion.invalidar_registro()
+        sesion = self.client.session
+        sesion['id_usuario'] = self.datos['representante'].id_usuario
+        sesion.save()
+
+    def test_eventos_mantienen_el_dia_sin_contar_doble(self):
+        from .eventos import despachar_eventos
+        from .resumenes import reconstruir_resumenes_diarios, resumen_fundacion
+        from .transiciones import cambiar_estado
+        reconstruir_resumenes_diarios()
+        self.assertEqual(resumen_fundacion(self.fundacion)['por_estado'], {'PENDIENTE': 2})
+
+        donacion = self.donaciones[0]
+        cambiar_estado(donacion, 'EN_PROCESO', direccion_entrega='Calle 1')
+        cambiar_estado(donacion, 'COMPLETADA')
+        # Otra transacción de la misma prenda: el JOIN prenda -> transacción la contaba dos veces
+        Transaccion.objects.create(
+            prenda=donacion.prenda, tipo=self.datos['tipos'][0], user_origen=donacion.user_origen,
+            fundacion=self.fundacion, estado='RECHAZADA',
+        )
+        despachar_eventos()
+
+        # El día se recalcula entero: también recoge la transacción creada sin eventos
+        resumen = resumen_fundacion(self.fundacion)
+        self.assertEqual(resumen['por_estado'], {'PENDIENTE': 1, 'COMPLETADA': 1, 'RECHAZADA': 1})
+        self.assertEqual(resumen['por_categoria'], [('Camiseta', 1)])
+        self.assertEqual(resumen['carbono_kg'], Decimal('5.5'))
+        reconstruir_resumenes_diarios()
+        self.assertEqual(resumen_fundacion(self.fundacion), resumen)
+
+    def test_migracion_resume_las_donaciones_existentes(self):
+        from importlib import import_module
+        from django.apps import apps
+        from .models import ResumenDiarioFundacion
+        from .resumenes import reconstruir_resumenes_diarios
+        from .transiciones import cambiar_estado
+        migracion = import_module('App.migrations.0009_resumen_diario_fundacion')
+        donacion = self.donaciones[0]
+        cambiar_estado(donacion, 'EN_PROCESO', direccion_entrega='Calle 1')
+        cambiar_estado(donacion, 'COMPLETADA')
+
+        def filas():
+            return list(ResumenDiarioFundacion.objects.order_by('estado').values(
+                'fundacion_id', 'fecha', 'estado', 'categoria', 'donaciones', 'carbono_kg', 'energia_kwh',
+            ))
+
+        reconstruir_resumenes_diarios()
+        esperadas = filas()
+        ResumenDiarioFundacion.objects.all().delete()
+        migracion.resumir_donaciones_existentes(apps, None)
+        self.assertEqual(filas(), esperadas)
+        self.assertEqual([fila['carbono_kg'] for fila in esperadas], [Decimal('5.5'), 0])
+
+    def test_periodo_y_consultas_constantes(self):
+        from .resumenes import reconstruir_resumenes_diarios
+        Transaccion.objects.filter(pk=self.donaciones[1].pk).update(
+            fecha_transaccion=timezone.now() - timedelta(days=60)
+        )
+        reconstruir_resumenes_diarios()
+
+        respuesta = self.client.get('/panel-fundacion/', {'periodo': '30'})
+        self.assertEqual((respuesta.context['periodo'], respuesta.context['total_donaciones']), ('30', 1))
+        respuesta = self.client.get('/panel-fundacion/', {'periodo': 'otro'})  # cae en el periodo por defecto
+        self.assertEqual((respuesta.context['periodo'], respuesta.context['total_donaciones']), ('todo', 2))
+        respuesta = self.client.get('/estadisticas-donaciones', {'periodo': '90'})
+        self.assertEqual(respuesta.context['resumen'], [{'estado': 'Pendiente', 'total': 2}])
+
+        def consultas(url):
+            with CaptureQueriesContext(connection) as contexto:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(consultas_de_aplicacion(contexto.captured_queries))
+
+        antes = {url: consultas(url) for url in ('/panel-fundacion/', '/estadisticas-donaciones')}
+        extra = [
+            Transaccion(
+                prenda=Prenda.objects.create(user=self.datos['representante'], nombre=f'Extra {i}', categoria='Pantalón'),
+                tipo=self.datos['tipos'][0], user_origen=self.datos['representante'], fundacion=self.fundacion,
+                estado='COMPLETADA',
+            )
+            for i in range(20)
+        ]
+        Transaccion.objects.bulk_create(extra)
+        reconstruir_resumenes_diarios()
+        for url, total in antes.items():
+            self.assertEqual(consultas(url), total, url)
+
+
+class ResumenesMensualesImpactoTests(TestCase):
+    """Informes de impacto leídos desde resúmenes mensuales por usuario, fundación y plataforma."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(6)  # Donación, Venta, Intercambio x2; impacto 5.5 kg / 2.7 kWh
+        cls.transacciones = list(Transaccion.objects.order_by('pk'))
+
+    def setUp(self):
+        TipoTransaccion.invalidar_registro()
+
+    def completar(self, transacciones):
+        from .eventos import despachar_eventos
+        from .transiciones import cambiar_estado_lote
+        ids = [t.pk for t in transacciones]
+        cambiar_estado_lote(Transaccion.objects.filter(pk__in=ids), 'EN_PROCESO', direccion_entrega='Calle 1')
+        cambiar_estado_lote(Transaccion.objects.filter(pk__in=ids), 'COMPLETADA')
+        despachar_eventos()
+
+    def test_meses_por_ambito_y_reconstruccion(self):
+        from .carbon_utils import calcular_impacto_prenda, generar_informe_impacto
+        from .models import ResumenMensualImpacto
+        from .resumenes import reconstruir_resumenes_mensuales, serie_mensual
+        donacion, venta = self.transacciones[0], self.transacciones[1]
+        self.completar([donacion, venta])
+        self.completar([donacion])  # ya completada: no se vuelve a sumar
+
+        agua = Decimal(str(calcular_impacto_prenda('Camiseta')['agua_ahorrada_litros']))
+        mes = timezone.localdate().replace(day=1)
+        plataforma = serie_mensual(ResumenMensualImpacto.AMBITO_PLATAFORMA)
+        self.assertEqual(plataforma, [{
+            'mes': mes, 'transacciones': 2, 'carbono_kg': Decimal('11'), 'energia_kwh': Decimal('5.4'),
+            'agua_litros': 2 * agua,
+        }])
+        fundacion = serie_mensual(ResumenMensualImpacto.AMBITO_FUNDACION, self.datos['fundacion'].pk)
+        self.assertEqual([fila['transacciones'] for fila in fundacion], [1])  # solo la donación
+        usuario = serie_mensual(ResumenMensualImpacto.AMBITO_USUARIO, venta.user_origen_id)
+        self.assertEqual(usuario[0]['carbono_kg'], Decimal('5.5'))
+
+        with self.assertNumQueries(1):
+            informe = generar_informe_impacto()
+        self.assertEqual(set(informe['desglose']), {'Donación', 'Venta'})
+        self.assertEqual(informe['totales']['carbono_kg'], 11.0)
+
+        antes = list(ResumenMensualImpacto.objects.order_by('ambito', 'ambito_id', 'tipo').values())
+        reconstruir_resumenes_mensuales()
+        despues = list(ResumenMensualImpacto.objects.order_by('ambito', 'ambito_id', 'tipo').values())
+        self.assertEqual([{**f, 'id': None} for f in despues], [{**f, 'id': None} for f in antes])
+
+    def test_migracion_resume_las_transacciones_completadas(self):
+        from importlib import import_module
+        from django.apps import apps
+        from .models import ResumenMensualImpacto
+        from .resumenes import reconstruir_resumenes_mensuales
+        migracion = import_module('App.migrations.0010_resumen_mensual_impacto')
+        self.completar(self.transacciones[:2])
+        Transaccion.objects.filter(pk=self.transacciones[2].pk).update(estado='COMPLETADA')  # sin eventos
+
+        def filas():
+            return [
+                {**fila, 'id': None}
+                for fila in ResumenMensualImpacto.objects.order_by('ambito', 'ambito_id', 'tipo').values()
+            ]
+
+        reconstruir_resumenes_mensuales()
+        esperadas = filas()
+        ResumenMensualImpacto.objects.all().delete()
+        migracion.resumir_impacto_existente(apps, None)
+        self.assertEqual(filas(), esperadas)
+        self.assertEqual(
+            {fila['tipo'] for fila in esperadas if fila['ambito'] == ResumenMensualImpacto.AMBITO_PLATAFORMA},
+            {'Donación', 'Venta', 'Intercambio'},
+        )
+
+    def test_informe_con_consultas_constantes(self):
+        representante = self.datos['representante']
+        sesion = self.client.session
+        sesion['id_usuario'] = representante.id_usuario
+        sesion.save()
+
+        def consultas():
+            with CaptureQueriesContext(connection) as contexto:
+                respuesta = self.client.get('/informe-impacto/', {'tipo': 'fundacion'})
+            self.assertEqual(respuesta.status_code, 200)
+            return respuesta, len(contexto.captured_queries)
+
+        self.completar(self.transacciones[:1])
+        respuesta, antes = consultas()
+        self.assertEqual(respuesta.context['tipo'], 'fundacion')
+        self.assertEqual(respuesta.context['informe']['total_transacciones'], 1)
+        self.assertEqual(len(respuesta.context['impactos_por_mes']), 1)
+
+        self.completar(self.transacciones[3:])
+        respuesta, despues = consultas()
+        self.assertEqual(respuesta.context['informe']['total_transacciones'], 2)
+        self.assertEqual(despues, antes)
+
+        # Un cliente no puede pedir el informe global
+        sesion['id_usuario'] = self.datos['usuarios'][0].id_usuario
+        sesion.save()
+        self.assertEqual(self.client.get('/informe-impacto/', {'tipo': 'global'}).context['tipo'], 'personal')
+
+
+class ArchivoTransaccionesTests(TestCase):
+    """Archivado por lotes de transacciones antiguas sin perderlas en resúmenes, contadores ni exportación."""
+
+    @classmethod
+    def setUpTestData(cls):
+        from .eventos import despachar_eventos
+        from .transiciones import cambiar_estado
+        cls.datos = crear_datos_prueba(6)  # Donación, Venta, Intercambio x2
+        t = list(Transaccion.objects.order_by('pk'))
+        for transaccion in (t[0], t[1], t[3]):
+            cambiar_estado(transaccion, 'EN_PROCESO', direccion_entrega='Calle 1')
+            cambiar_estado(transaccion, 'COMPLETADA')
+        cambiar_estado(t[2], 'RECHAZADA')
+        despachar_eventos()
+        cambiar_estado(t[5], 'CANCELADA')  # Evento sin despachar: no se archiva todavía
+        # Antiguas: 0, 1, 2 (terminadas), 4 (pendiente) y 5; la 3 es reciente
+        Transaccion.objects.filter(pk__in=[t[i].pk for i in (0, 1, 2, 4, 5)]).update(
+            fecha_transaccion=timezone.now() - timedelta(days=400)
+        )
+        cls.transacciones = t
+
+    def setUp(self):
+        TipoTransaccion.invalidar_registro()
+
+    def resumenes(self):
+        from .models import ResumenDiarioFundacion, ResumenMensualImpacto
+        from .resumenes import reconstruir_resumenes_diarios, reconstruir_resumenes_mensuales
+        reconstruir_resumenes_diarios()
+        reconstruir_resumenes_mensuales()
+        return (
+            list(ResumenDiarioFundacion.objects.order_by('fecha', 'estado').values_list(
+                'fecha', 'estado', 'categoria', 'donaciones', 'carbono_kg', 'energia_kwh'
+            )),
+            list(ResumenMensualImpacto.objects.order_by('ambito', 'ambito_id', 'mes', 'tipo').values_list(
+                'ambito', 'ambito_id', 'mes', 'tipo', 'transacciones', 'carbono_kg', 'energia_kwh', 'agua_litros'
+            )),
+        )
+
+    def test_archiva_solo_terminadas_antiguas_sin_eventos_pendientes(self):
+        from .archivo import archivar_transacciones
+        from .models import TransaccionArchivada
+        t = self.transacciones
+        self.assertEqual(archivar_transacciones(meses=12, lote=2), 3)  # Dos lotes
+
+        archivadas = set(TransaccionArchivada.objects.values_list('pk', flat=True))
+        self.assertEqual(archivadas, {t[0].pk, t[1].pk, t[2].pk})
+        self.assertEqual(set(Transaccion.objects.values_list('pk', flat=True)), {t[3].pk, t[4].pk, t[5].pk})
+        self.assertFalse(EventoTransaccion.objects.filter(transaccion_id__in=archivadas).exists())
+        copia = TransaccionArchivada.objects.get(pk=t[0].pk)
+        self.assertEqual((copia.estado, copia.prenda_id, copia.campana_id), ('COMPLETADA', t[0].prenda_id, t[0].campana_id))
+        self.assertEqual(archivar_transacciones(meses=12), 0)
+
+    def test_resumenes_y_contadores_incluyen_el_archivo(self):
+        from .archivo import archivar_transacciones
+        from .contadores import contar_prendas_donadas, reconciliar_prendas_donadas
+        campana = self.datos['campana']
+        antes = self.resumenes()
+        self.assertEqual(contar_prendas_donadas(), {campana.pk: 2})
+
+        archivar_transacciones(meses=12)
+        self.assertEqual(contar_prendas_donadas(), {campana.pk: 2})
+        self.assertEqual(reconciliar_prendas_donadas(), {})
+        self.assertEqual(self.resumenes(), antes)
+
+    def test_exportacion_con_archivo(self):
+        from .archivo import archivar_transacciones
+        archivar_transacciones(meses=12)
+        sesion = self.client.session
+        sesion['id_usuario'] = self.datos['representante'].id_usuario
+        sesion.save()
+
+        def ids_exportados(**params):
+            respuesta = self.client.get('/exportar/transacciones/', {'formato': 'ndjson', **params})
+            self.assertEqual(respuesta.status_code, 200)
+            return [json.loads(linea)['id_transaccion'] for linea in b''.join(respuesta.streaming_content).splitlines()]
+
+        activas = sorted(Transaccion.objects.values_list('pk', flat=True))
+        self.assertEqual(ids_exportados(), activas)
+        self.assertEqual(ids_exportados(archivo=1), sorted(t.pk for t in self.transacciones))
+
+    @skipUnless(connection.vendor == 'postgresql', 'Particiones nativas de PostgreSQL')
+    def test_archivo_particionado_por_anio(self):
+        from .archivo import archivar_transacciones, archivo_particionado, particionar_archivo
+        from .models import TransaccionArchivada
+        self.assertTrue(particionar_archivo())
+        self.assertFalse(particionar_archivo())
+        self.assertTrue(archivo_particionado())
+        self.assertEqual(archivar_transacciones(meses=12), 3)
+        anio = TransaccionArchivada.objects.values_list('fecha_transaccion', flat=True).first().year
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relname FROM pg_class WHERE relname LIKE 'transaccion_archivada_%%'")
+            particiones = {fila[0] for fila in cursor.fetchall()}
+        self.assertEqual(particiones, {'transaccion_archivada_default', f'transaccion_archivada_{anio}'})
+        self.assertEqual(TransaccionArchivada.objects.count(), 3)
+
+
+class TransaccionIndicesTests(TestCase):
+    """
+    Los planes (EXPLAIN) de las consultas de las vistas usan los índices de
+    Transaccion. En PostgreSQL se desactiva el recorrido secuencial, que con
+    pocas filas siempre sale más barato. SQLite no deduce la condición de un
+    índice parcial desde la de la consulta: ahí se prueban los compuestos.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos_prueba(30)
+
+    def setUp(self):
+        TipoTransaccion.invalidar_registro()
+
+    def plan(self, queryset):
+        from django.db import transaction
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('ANALYZE transaccion')
+            return queryset.explain()
+
+    def donaciones(self):
+        return Transaccion.objects.filter(
+            fundacion=self.datos['fundacion'], tipo_id=TipoTransaccion.id_de(TipoTransaccion.DONACION)
+        )
+
+    def test_donaciones_de_fundacion_por_fecha(self):
+        # detalle_fundacion, panel_fundacion, estadisticas_donaciones
+        plan = self.plan(self.donaciones().order_by('-fecha_transaccion')[:50])
+        self.assertIn('transaccion_fund_tipo_fecha', plan)
+        self.assertNotIn('TEMP B-TREE', plan)  # SQLite: sin ordenar aparte
+        self.assertNotIn('Sort', plan)  # PostgreSQL
+
+    def test_api_por_estado_en_orden_de_cursor(self):
+        # TransaccionViewSet.pendientes y ?estado=, paginados por -pk
+        plan = self.plan(Transaccion.objects.filter(estado='PENDIENTE').order_by('-pk')[:21])
+        self.assertIn('transaccion_estado_id', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotIn('Sort', plan)
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL deduce la condición de los índices parciales')
+    def test_donaciones_por_atender_usan_indice_parcial(self):
+        # gestionar_donaciones: PENDIENTE o EN_PROCESO, en orden de llegada
+        plan = self.plan(self.donaciones().filter(estado__in=('PENDIENTE', 'EN_PROCESO')).order_by('fecha_transaccion'))
+        self.assertIn('transaccion_fund_abiertas', plan)
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL deduce la condición de los índices parciales')
+    def test_abiertas_de_usuario_usan_indices_parciales(self):
+        from django.db.models import Q
+        usuario = self.datos['usuarios'][0]
+        plan = self.plan(
+            Transaccion.objects.filter(Q(user_origen=usuario) | Q(user_destino=usuario), estado='PENDIENTE')
+            .order_by('-pk')
+        )
+        self.assertIn('transaccion_origen_abiertas', plan)
+        self.assertIn('transaccion_destino_abiertas', plan)
+
+
+class OptimizacionSerializersTests(TestCase):
+
+    def test_relaciones_prenda(self):
+        from .serializers import PrendaSerializer, relaciones_serializer
+        select, prefetch = relaciones_serializer(PrendaSerializer(), Prenda)
+        self.assertEqual(select, {'user', 'user__fundacion_asignada'})
+        self.assertEqual(prefetch, {'impactoambiental_set'})
+
+    def test_relaciones_transaccion(self):
+        from .serializers import TransaccionSerializer, relaciones_serializer
+        select, prefetch = relaciones_serializer(TransaccionSerializer(), Transaccion)
+        self.assertEqual(select, {'prenda', 'tipo', 'user_origen', 'user_destino', 'fundacion', 'campana'})
+        self.assertEqual(prefetch, set())
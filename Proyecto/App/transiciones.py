@@ -0,0 +1,201 @@
+"""
+Cambios de estado de las transacciones.
+
+Todas las vistas pasan por aquí en vez de asignar `transaccion.estado` y
+guardar:
+
+- `crear_transaccion` aparta la prenda con `reservar_prenda`, un UPDATE
+  condicionado a que siga DISPONIBLE: de dos personas que piden la misma
+  prenda a la vez, solo una cambia la fila y la otra recibe el error. No
+  depende de select_for_update, que SQLite ignora. En los intercambios
+  aparta igual la prenda ofrecida, en el mismo bloque atómico.
+- `cambiar_estado` bloquea la transacción y su prenda, valida el paso con
+  Transaccion.TRANSICIONES y escribe cada fila una sola vez con update_fields.
+
+Todo ocurre en un mismo bloque atómico. La prenda se actualiza dentro de
+Transaccion.save (actualizar_disponibilidad_prenda), solo si su estado cambia.
+En el mismo bloque se escribe un EventoTransaccion por cambio; los efectos
+secundarios (mensajes, logros, impacto, avance de campañas) los aplica eventos.py después.
+
+`cambiar_estado_lote` aplica el mismo paso a muchas transacciones (gestión
+masiva de donaciones) con un UPDATE por tabla en vez de uno por fila.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+
+from .eventos import registrar_eventos
+from .fragmentos import invalidar_fragmentos
+from .models import Prenda, Transaccion, VersionTabla
+
+
+class TransicionInvalida(ValueError):
+    """El cambio pedido no está permitido desde el estado actual."""
+
+
+def reservar_prenda(id_prenda, estado='RESERVADA'):
+    """
+    Pasa la prenda de DISPONIBLE a `estado` con un solo UPDATE condicionado
+    (... WHERE id_prenda = ? AND estado = 'DISPONIBLE'). Como update() no
+    dispara señales, aquí se invalidan versión y tarjeta (al confirmar).
+
+    Returns:
+        True si esta llamada apartó la prenda; False si ya no estaba disponible
+    """
+    if not Prenda.objects.filter(pk=id_prenda, estado='DISPONIBLE').update(estado=estado):
+        return False
+    _invalidar_prendas([id_prenda])
+    return True
+
+
+def _invalidar_prendas(ids):
+    """
+    Sube la versión de la tabla de prendas y renueva las tarjetas `ids` cuando
+    la transacción actual confirma. Antes del commit otra petición podría
+    volver a cachear la prenda con el estado viejo bajo la versión nueva; si
+    hay rollback, la caché no se toca.
+    """
+    def invalidar():
+        VersionTabla.incrementar(Prenda._meta.db_table)
+        invalidar_fragmentos(Prenda, ids)
+    transaction.on_commit(invalidar)
+
+
+def crear_transaccion(prenda, tipo, actor=None, **campos):
+    """
+    Crea una transacción PENDIENTE sobre `prenda` si sigue disponible.
+
+    Args:
+        prenda: Prenda (o su id) que se aparta
+        tipo: TipoTransaccion
+        actor: Usuario que crea la transacción (para los eventos)
+        **campos: Resto de campos de la transacción (user_origen, fundacion,
+            prenda_ofrecida en intercambios...)
+
+    Returns:
+        Transaccion creada
+
+    Raises:
+        TransicionInvalida: Si la prenda (o la ofrecida) ya no está disponible
+        Prenda.DoesNotExist: Si la prenda no existe
+    """
+    id_prenda = getattr(prenda, 'pk', prenda)
+    with transaction.atomic():
+        nueva = Transaccion(prenda_id=id_prenda, tipo=tipo, estado='PENDIENTE', **campos)
+        estado_prenda = nueva.estado_prenda()
+        if not reservar_prenda(id_prenda, estado_prenda):
+            actual = Prenda.objects.get(pk=id_prenda)
+            raise TransicionInvalida(f'La prenda ya no está disponible ({actual.get_estado_display()}).')
+        if nueva.prenda_ofrecida_id and not reservar_prenda(nueva.prenda_ofrecida_id, estado_prenda):
+            # El rollback del bloque devuelve la primera prenda a DISPONIBLE
+            actual = Prenda.objects.get(pk=nueva.prenda_ofrecida_id)
+            raise TransicionInvalida(f'La prenda ofrecida ya no está disponible ({actual.get_estado_display()}).')
+        if not isinstance(prenda, Prenda):
+            prenda = Prenda.objects.get(pk=id_prenda)
+        # Las filas ya quedaron apartadas: Transaccion.save no vuelve a escribirlas
+        prenda.estado = estado_prenda
+        nueva.prenda = prenda
+        if nueva.prenda_ofrecida_id:
+            nueva.prenda_ofrecida.estado = estado_prenda
+        nueva.save()
+        registrar_eventos([(nueva, None)], actor)
+    return nueva
+
+
+def cambiar_estado(transaccion_o_id, nuevo_estado, desde=None, actor=None, **campos):
+    """
+    Lleva una transacción a `nuevo_estado` y ajusta su prenda.
+
+    Args:
+        transaccion_o_id: Transaccion o su id
+        nuevo_estado: Estado destino
+        desde: Estados de origen que acepta quien llama (opcional, más
+            estricto que TRANSICIONES; p. ej. solo EN_PROCESO para confirmar)
+        actor: Usuario que hace el cambio (para los eventos)
+        **campos: Otros campos de la transacción que cambian en el mismo paso
+
+    Returns:
+        La transacción actualizada (instancia nueva, leída con bloqueo)
+
+    Raises:
+        TransicionInvalida: Si el paso no está permitido
+    """
+    id_transaccion = getattr(transaccion_o_id, 'pk', transaccion_o_id)
+    if nuevo_estado not in Transaccion.TRANSICIONES:
+        raise TransicionInvalida(f'Estado desconocido: {nuevo_estado}')
+
+    with transaction.atomic():
+        # of=: no bloquear la fila del tipo, que comparten todas las transacciones
+        actual = (
+            Transaccion.objects.select_for_update(of=('self', 'prenda'))
+            .select_related('prenda', 'tipo')
+            .get(pk=id_transaccion)
+        )
+        permitido = nuevo_estado in Transaccion.TRANSICIONES[actual.estado]
+        if not permitido or (desde is not None and actual.estado not in desde):
+            raise TransicionInvalida(
+                f'No se puede pasar de {actual.get_estado_display()} a {dict(Transaccion.ESTADO_CHOICES)[nuevo_estado]}.'
+            )
+        estado_anterior = actual.estado
+        actual.estado = nuevo_estado
+        for campo, valor in campos.items():
+            setattr(actual, campo, valor)
+        actual.save(update_fields=['estado', *campos])
+        registrar_eventos([(actual, estado_anterior)], actor)
+    return actual
+
+
+def cambiar_estado_lote(transacciones, nuevo_estado, desde=None, actor=None, **campos):
+    """
+    Lleva a `nuevo_estado` las transacciones del queryset que lo permitan.
+
+    Bloquea las filas en orden de id (sin interbloqueos entre lotes que se
+    cruzan) y omite las que no admiten el paso. Escribe las transacciones con
+    un solo UPDATE y las prendas con uno por estado resultante. Como update()
+    no dispara señales, aquí se invalidan versiones y tarjetas (al confirmar).
+
+    Args:
+        transacciones: QuerySet de Transaccion ya acotado (fundación, tipo, ids)
+        nuevo_estado, desde, actor, **campos: Como en `cambiar_estado`
+
+    Returns:
+        (actualizadas, omitidas): listas de Transaccion
+    """
+    if nuevo_estado not in Transaccion.TRANSICIONES:
+        raise TransicionInvalida(f'Estado desconocido: {nuevo_estado}')
+
+    with transaction.atomic():
+        filas = list(
+            transacciones.select_for_update(of=('self', 'prenda'))
+            .select_related('prenda')
+            .order_by('pk')
+        )
+        actualizadas, omitidas = [], []
+        for fila in filas:
+            permitido = nuevo_estado in Transaccion.TRANSICIONES[fila.estado]
+            (actualizadas if permitido and (desde is None or fila.estado in desde) else omitidas).append(fila)
+        if not actualizadas:
+            return actualizadas, omitidas
+
+        Transaccion.objects.filter(pk__in=[t.pk for t in actualizadas]).update(estado=nuevo_estado, **campos)
+        prendas_por_estado = defaultdict(list)
+        cambios = []
+        for fila in actualizadas:
+            cambios.append((fila, fila.estado))
+            fila.estado = nuevo_estado
+            for campo, valor in campos.items():
+                setattr(fila, campo, valor)
+            estado_prenda = fila.estado_prenda()
+            if estado_prenda and fila.prenda.estado != estado_prenda:
+                fila.prenda.estado = estado_prenda
+                prendas_por_estado[estado_prenda].append(fila.prenda_id)
+            if estado_prenda and fila.prenda_ofrecida_id:
+                prendas_por_estado[estado_prenda].append(fila.prenda_ofrecida_id)
+        for estado_prenda, ids in prendas_por_estado.items():
+            Prenda.objects.filter(pk__in=ids).update(estado=estado_prenda)
+        registrar_eventos(cambios, actor)
+
+        if prendas_por_estado:
+            _invalidar_prendas([pk for ids in prendas_por_estado.values() for pk in ids])
+    return actualizadas, omitidas
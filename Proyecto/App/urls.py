@@ -63,8 +63,15 @@ urlpatterns = [
     # Gestión de donaciones
     path('panel-fundacion/', views.panel_fundacion, name='panel_fundacion'),
     path('gestionar-donaciones/', views.gestionar_donaciones, name='gestionar_donaciones'),
+    path('donacion/<int:id_transaccion>/confirmar/', views.confirmar_recepcion_donacion, name='confirmar_recepcion_donacion'),
+    path('agradecer/<int:id_usuario_donante>/', views.enviar_mensaje_agradecimiento, name='enviar_mensaje_agradecimiento'),
     path('estadisticas-donaciones', views.estadisticas_donaciones, name='estadisticas_donaciones'),
     
+    # Exportación de datos (CSV / NDJSON en streaming)
+    path('exportar/transacciones/', views.exportar_transacciones, name='exportar_transacciones'),
+    path('exportar/impacto/', views.exportar_impacto, name='exportar_impacto'),
+    path('exportar/prendas/', views.exportar_prendas, name='exportar_prendas'),
+    
     # Campañas
     path('crear-campana/', views.crear_campana, name='crear_campana'),
     path('mis-campanas/', views.mis_campanas, name='mis_campanas'),
@@ -94,6 +94,12 @@ from .campana import (
     eliminar_campana,
 )
 
+from .exportacion import (
+    exportar_transacciones,
+    exportar_impacto,
+    exportar_prendas,
+)
+
 from .api_y_galeria import (
     galeria_imagenes,
     informe_impacto,
@@ -170,6 +176,9 @@ __all__ = [
     'mis_campanas',
     'editar_campana',
     'eliminar_campana',
+    'exportar_transacciones',
+    'exportar_impacto',
+    'exportar_prendas',
     'galeria_imagenes',
     'informe_impacto',
     'comparador_impacto',
@@ -35,10 +35,15 @@ from ..carbon_utils import (
     formatear_equivalencia
 )
 from ..forms import PrendaForm
+from ..resumenes import inicio_ultimos_meses, serie_mensual
+from .auth import get_usuario_actual
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Meses de la tendencia en informe_impacto
+MESES_INFORME = 12
+
 
 # ------------------------------------------------------------------------------------------------------------------
 # GALERÍA DE IMÁGENES - Integración con Cloudinary y Clarifai
@@ -88,52 +93,35 @@ def galeria_imagenes(request):
 @login_required_custom
 def informe_impacto(request):
     """
-    Vista que muestra un informe detallado del impacto ambiental del usuario
+    Vista que muestra un informe detallado del impacto ambiental del usuario,
+    de su fundación (representantes) o de la plataforma (administradores).
     Incluye:
     - Emisiones de CO2 evitadas
     - Agua ahorrada
-    - Residuos evitados
-    - Gráficos de tendencia
+    - Energía ahorrada
+    - Tendencia de los últimos meses
+    Todo sale de los resúmenes mensuales (resumenes.py).
     """
-    try:
-        usuario = Usuario.objects.get(usuario=request.session.get('usuario'))
-    except Usuario.DoesNotExist:
-        return redirect('login')
-
-    # Calcular impacto total del usuario
-    impacto_total = obtener_impacto_total_usuario(usuario)
+    usuario = get_usuario_actual(request)
 
-    # Obtener todas las transacciones del usuario
-    transacciones = Transaccion.objects.filter(
-        Q(comprador=usuario) | Q(vendedor=usuario)
-    ).select_related('prenda', 'tipo_transaccion')
+    tipo = request.GET.get('tipo', 'personal')
+    if tipo == 'fundacion' and usuario.es_representante_fundacion() and usuario.fundacion_asignada_id:
+        informe = generar_informe_impacto(fundacion=usuario.fundacion_asignada)
+    elif tipo == 'global' and usuario.es_administrador():
+        informe = generar_informe_impacto()
+    else:
+        tipo = 'personal'
+        informe = generar_informe_impacto(usuario)
 
-    # Generar informe
-    informe = generar_informe_impacto(usuario)
-
-    # Estadísticas por mes
-    impactos_por_mes = ImpactoAmbiental.objects.filter(
-        usuario=usuario
-    ).values('fecha_registro__month').annotate(
-        total_co2=Sum('emisiones_co2_evitadas'),
-        total_agua=Sum('agua_ahorrada'),
-        total_residuos=Sum('residuos_evitados')
-    ).order_by('fecha_registro__month')
+    # Estadísticas por mes: los últimos MESES_INFORME meses, incluido el actual
+    impactos_por_mes = serie_mensual(informe['ambito'], informe['ambito_id'], desde=inicio_ultimos_meses(MESES_INFORME))
 
     context = {
         'usuario': usuario,
-        'impacto_total': impacto_total,
-        'transacciones': transacciones,
+        'tipo': tipo,
         'informe': informe,
         'impactos_por_mes': impactos_por_mes,
-        'equivalencias': {
-            'arboles': impacto_total.get('arboles_plantados', 0),
-            'viajes_auto': impacto_total.get('viajes_auto_evitados', 0),
-            'duchas': impacto_total.get('duchas_ahorradas', 0),
-        }
     }
-
-    logger.info(f"📊 Informe de impacto generado para {usuario.usuario}")
     return render(request, 'impacto ambiental/informe_impacto.html', context)
 
 
@@ -1,6 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Sum, Count, Value, BooleanField, ExpressionWrapper
 from django.utils import timezone
 from django.http import JsonResponse
 from django import forms  # Agregado para forms
@@ -32,6 +32,7 @@ from ..cloudinary_utils import (
     subir_imagen_prenda,
     subir_logo_fundacion,
 )
+from ..subidas import programar_subida
 
 from ..carbon_utils import (
     calcular_impacto_prenda,
@@ -100,14 +101,14 @@ def puede_actualizar_transaccion(usuario, transaccion, permiso_requerido):
     Retorna tupla: (True/False, mensaje_error o None)
     """
     if permiso_requerido == 'origen':
-        if transaccion.user_origen.id != usuario.id_usuario:  # Cambiado: 'user_origen' en lugar de 'id_usuario_origen'
+        if transaccion.user_origen_id != usuario.id_usuario:
             return False, 'Solo el propietario/vendedor puede realizar esta acción.'
     elif permiso_requerido == 'destino':
-        if not transaccion.user_destino or transaccion.user_destino.id != usuario.id_usuario:  # Cambiado: 'user_destino'
+        if transaccion.user_destino_id != usuario.id_usuario:
             return False, 'Solo el receptor/comprador puede realizar esta acción.'
     elif permiso_requerido == 'origen_o_destino':
-        es_origen = transaccion.user_origen.id == usuario.id_usuario
-        es_destino = transaccion.user_destino and transaccion.user_destino.id == usuario.id_usuario
+        es_origen = transaccion.user_origen_id == usuario.id_usuario
+        es_destino = transaccion.user_destino_id == usuario.id_usuario
         if not (es_origen or es_destino):
             return False, 'No tienes permiso para actualizar esta transacción.'
     elif permiso_requerido == 'representante':
@@ -169,7 +170,7 @@ def es_propietario_prenda(usuario, prenda):
     """Verifica si el usuario es propietario de la prenda."""
     if not usuario or not prenda:
         return False
-    return usuario.id_usuario == getattr(prenda.user, 'id_usuario', None)
+    return usuario.id_usuario == prenda.user_id  # sin cargar prenda.user
 
 
 def puede_proponer_transaccion(usuario, prenda):
@@ -213,6 +214,32 @@ def puede_eliminar_prenda(usuario, prenda):
         return False
     return es_propietario_prenda(usuario, prenda)
 
+
+def anotar_permisos_prenda(prendas, usuario):
+    """
+    Anota en el queryset de prendas los mismos flags que las funciones de
+    arriba (is_owner, can_propose, can_donate, can_edit, can_delete), calculados
+    por la base de datos en la misma consulta en vez de prenda por prenda.
+    """
+    if not usuario:
+        falso = Value(False, output_field=BooleanField())
+        return prendas.annotate(
+            is_owner=falso, can_propose=falso, can_donate=falso, can_edit=falso, can_delete=falso
+        )
+
+    def flag(condicion):
+        return ExpressionWrapper(condicion, output_field=BooleanField())
+
+    propietario = Q(user_id=usuario.id_usuario)
+    disponible = Q(estado='DISPONIBLE')
+    return prendas.annotate(
+        is_owner=flag(propietario),
+        can_propose=flag(~propietario & disponible),
+        can_donate=flag(propietario & disponible),
+        can_edit=flag(propietario),
+        can_delete=flag(propietario),
+    )
+
 # ------------------------------------------------------------------------------------------------------------------
 # Vistas Principales
 
@@ -292,17 +319,20 @@ def perfil_usuario(request):
     if not usuario:
         return redirect('login')
     if request.method == 'POST':
-        form = PerfilForm(request.POST, request.FILES, instance=usuario)
+        # La foto no se guarda con el formulario: va a la cola de subidas
+        form = PerfilForm(request.POST, instance=usuario)
         if form.is_valid():
-            if 'imagen_usuario' in request.FILES:
+            imagen = request.FILES.get('imagen_usuario')
+            if imagen:
                 # Validar imagen antes de guardar
-                imagen = request.FILES['imagen_usuario']
                 es_valida, mensaje_error = validar_imagen(imagen)
                 if not es_valida:
                     messages.error(request, mensaje_error or 'Imagen inválida. Solo JPG/PNG, máximo 5MB.')
                     return render(request, 'auth/perfil.html', {'usuario': usuario, 'form': form})
             try:
                 form.save()
+                if imagen:
+                    programar_subida(imagen, 'usuario', usuario.id_usuario)
                 messages.success(request, 'Perfil actualizado correctamente.')
                 return redirect('perfil')
             except Exception as e:
@@ -345,11 +375,9 @@ def actualizar_foto_perfil(request):
             return redirect('perfil')
 
         try:
-            # Save image directly to ImageField (local storage)
-            usuario.imagen_usuario = imagen
-            usuario.save()
-            logger.info(f"Foto de perfil de usuario {usuario.id_usuario} actualizada exitosamente")
-            messages.success(request, 'Foto de perfil actualizada.')
+            subida = programar_subida(imagen, 'usuario', usuario.id_usuario)
+            logger.info(f"Foto de perfil de usuario {usuario.id_usuario} en cola (subida {subida.pk})")
+            messages.success(request, 'Foto recibida: tu perfil se actualizará en unos segundos.')
         except Exception as e:
             messages.error(request, f'Error al subir la foto: {str(e)}')
             logger.error(f"Error al subir foto de perfil de usuario {usuario.id_usuario}: {str(e)}")
@@ -370,11 +398,9 @@ def actualizar_imagen_prenda(request, id_prenda):
             return redirect('editar_prenda', id_prenda=getattr(prenda, 'id_prenda', getattr(prenda, 'id', prenda.pk)))
 
         try:
-            resultado = subir_imagen_prenda(request.FILES['imagen_prenda'], prenda.id_prenda)
-            prenda.imagen_prenda = resultado['secure_url']
-            prenda.save()
-            logger.info(f"Imagen de prenda {prenda.id_prenda} actualizada exitosamente")
-            messages.success(request, 'Imagen de prenda actualizada.')
+            subida = programar_subida(request.FILES['imagen_prenda'], 'prenda', prenda.id_prenda)
+            logger.info(f"Imagen de prenda {prenda.id_prenda} en cola (subida {subida.pk})")
+            messages.success(request, 'Imagen recibida: se actualizará en unos segundos.')
         except Exception as e:
             messages.error(request, f'Error al subir la imagen: {str(e)}')
             logger.error(f"Error al subir imagen de prenda {prenda.id_prenda}: {str(e)}")
@@ -395,11 +421,9 @@ def actualizar_logo_fundacion(request, id_fundacion):
             return redirect('panel_fundacion')
 
         try:
-            resultado = subir_logo_fundacion(request.FILES['imagen_fundacion'], fundacion.id_fundacion)
-            fundacion.imagen_fundacion = resultado['secure_url']
-            fundacion.save()
-            logger.info(f"Logo de fundación {fundacion.nombre} actualizado exitosamente")
-            messages.success(request, 'Logo de fundación actualizado.')
+            subida = programar_subida(request.FILES['imagen_fundacion'], 'fundacion', fundacion.id_fundacion)
+            logger.info(f"Logo de fundación {fundacion.nombre} en cola (subida {subida.pk})")
+            messages.success(request, 'Logo recibido: se actualizará en unos segundos.')
         except Exception as e:
             messages.error(request, f'Error al subir el logo: {str(e)}')
             logger.error(f"Error al subir logo de fundación {fundacion.id_fundacion}: {str(e)}")
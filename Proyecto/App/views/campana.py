@@ -27,6 +27,8 @@ from ..decorators import (
 )
 
 from .auth import get_usuario_actual
+from ..fragmentos import anotar_sellos, FRAGMENTOS_CACHE_SEGUNDOS
+from ..transiciones import TransicionInvalida, crear_transaccion
 
 from django.conf import settings
 
@@ -96,15 +98,17 @@ def crear_campana(request):
             # Manejar la imagen de la campaña
             if 'imagen_campana' in request.FILES:
                 imagen = request.FILES['imagen_campana']
-                if validar_imagen(imagen):
+                es_valida, mensaje_error = validar_imagen(imagen)
+                if es_valida:
+                    # ImageField en almacenamiento local (solo las prendas van a
+                    # Cloudinary): se guarda sin llamadas de red
                     try:
-                        url_imagen = subir_imagen_campana(imagen, campana.nombre)
-                        campana.imagen_campana = url_imagen
+                        campana.imagen_campana = imagen
                         campana.save()
                     except Exception as e:
                         messages.warning(request, f'Error al subir imagen: {str(e)}')
                 else:
-                    messages.error(request, 'Imagen no válida. Formatos permitidos: JPG, PNG, GIF. Tamaño máx. 10MB')
+                    messages.error(request, f'Imagen no válida: {mensaje_error}')
 
             messages.success(request, '¡Campaña creada exitosamente!')
             return redirect('panel_fundacion')
@@ -116,9 +120,13 @@ def campanas_solidarias(request):
     """Muestra todas las campañas solidarias activas de fundaciones."""
     usuario = get_usuario_actual(request)
     campanas = CampanaFundacion.objects.filter(activa=True).select_related('fundacion').order_by('fecha_inicio')
+    # Tarjetas cacheadas: cambian al guardar la campaña, su fundación o sus transacciones
+    campanas = anotar_sellos(campanas)
+    anotar_sellos([campana.fundacion for campana in campanas])
     context = {
         'usuario': usuario,
         'campanas': campanas,
+        'fragmentos_segundos': FRAGMENTOS_CACHE_SEGUNDOS,
     }
     return render(request, 'campañas/campanas_solidarias.html', context)
 
@@ -127,9 +135,10 @@ def detalle_campana(request, id):
     """Detalle de una campaña solidaria de una fundación."""
     usuario = get_usuario_actual(request)
     campana = get_object_or_404(CampanaFundacion, pk=id)
-    donaciones = Transaccion.objects.filter(campana=campana, tipo__nombre_tipo='Donación', estado='COMPLETADA')
-    prendas_donadas = [don.prenda for don in donaciones if don.prenda]
-    avance = len(prendas_donadas)
+    donaciones = Transaccion.objects.filter(
+        campana=campana, tipo_id=TipoTransaccion.id_de(TipoTransaccion.DONACION), estado='COMPLETADA'
+    ).select_related('prenda', 'user_origen')
+    avance = campana.prendas_donadas_count
     porcentaje_avance = int(100 * avance / campana.objetivo_prendas) if campana.objetivo_prendas and campana.objetivo_prendas > 0 else 0
     context = {
         'usuario': usuario,
@@ -151,18 +160,21 @@ def donar_a_campana(request, id):
         if not prenda.esta_disponible():
             messages.error(request, 'La prenda ya no está disponible.')
             return redirect('donar_a_campana', id=id)
-        tipo_donacion, _ = TipoTransaccion.objects.get_or_create(nombre_tipo='Donación')
-        Transaccion.objects.create(
-            prenda=prenda,
-            tipo=tipo_donacion,
-            user_origen=usuario,
-            fundacion=campana.fundacion,
-            campana=campana,
-            fecha_transaccion=timezone.now(),
-            estado='PENDIENTE'
-        )
-        prenda.estado = 'RESERVADA'
-        prenda.save()
+        tipo_donacion = TipoTransaccion.obtener(TipoTransaccion.DONACION)
+        try:
+            # Deja la prenda RESERVADA en la misma operación
+            crear_transaccion(
+                prenda,
+                tipo_donacion,
+                actor=usuario,
+                user_origen=usuario,
+                fundacion=campana.fundacion,
+                campana=campana,
+                fecha_transaccion=timezone.now(),
+            )
+        except TransicionInvalida as e:
+            messages.error(request, str(e))
+            return redirect('donar_a_campana', id=id)
         messages.success(request, f'¡Donación asociada a la campaña "{campana.nombre}"!')
         return redirect('mis_prendas')
     prendas_usuario = Prenda.objects.filter(user=usuario, estado='DISPONIBLE')
@@ -221,14 +233,12 @@ def editar_campana(request, id):
             # Manejar la imagen de la campaña
             if 'imagen_campana' in request.FILES:
                 imagen = request.FILES['imagen_campana']
-                if validar_imagen(imagen):
-                    try:
-                        url_imagen = subir_imagen_campana(imagen, campana.nombre)
-                        campana.imagen_campana = url_imagen
-                    except Exception as e:
-                        messages.warning(request, f'Error al subir imagen: {str(e)}')
+                es_valida, mensaje_error = validar_imagen(imagen)
+                if es_valida:
+                    # ImageField en almacenamiento local, se guarda con la campaña
+                    campana.imagen_campana = imagen
                 else:
-                    messages.error(request, 'Imagen no válida. Formatos permitidos: JPG, PNG, GIF. Tamaño máx. 10MB')
+                    messages.error(request, f'Imagen no válida: {mensaje_error}')
 
             campana.save()
             messages.success(request, '¡Campaña actualizada exitosamente!')
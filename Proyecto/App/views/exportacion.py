@@ -0,0 +1,188 @@
+from datetime import datetime, time, timedelta
+import logging
+
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ..archivo import consultas_historicas, union_historica
+from ..models import ImpactoAmbiental, Prenda
+from ..decorators import role_required
+from ..exportacion_utils import respuesta_exportacion, FORMATOS_EXPORTACION
+
+# Configuración de logging
+logger = logging.getLogger(__name__)
+
+
+# Columnas exportadas: (encabezado, ruta de values_list). Las relaciones se
+# resuelven con JOIN en la misma consulta.
+COLUMNAS_TRANSACCIONES = [
+    ('id_transaccion', 'id_transaccion'),
+    ('fecha', 'fecha_transaccion'),
+    ('tipo', 'tipo__nombre_tipo'),
+    ('estado', 'estado'),
+    ('id_prenda', 'prenda_id'),
+    ('prenda', 'prenda__nombre'),
+    ('categoria', 'prenda__categoria'),
+    ('id_usuario_origen', 'user_origen_id'),
+    ('usuario_origen', 'user_origen__nombre'),
+    ('id_fundacion', 'fundacion_id'),
+    ('fundacion', 'fundacion__nombre'),
+    ('id_campana', 'campana_id'),
+    ('campana', 'campana__nombre'),
+    ('costo_envio', 'costo_envio'),
+    ('peso_kg', 'peso_kg'),
+]
+
+COLUMNAS_IMPACTO = [
+    ('id_impacto', 'id'),
+    ('id_prenda', 'prenda_id'),
+    ('prenda', 'prenda__nombre'),
+    ('categoria', 'prenda__categoria'),
+    ('carbono_evitado_kg', 'carbono_evitar_kg'),
+    ('energia_ahorrada_kwh', 'energia_ahorrada_kwh'),
+    ('fecha_calculo', 'fecha_calculo'),
+]
+
+COLUMNAS_PRENDAS = [
+    ('id_prenda', 'id_prenda'),
+    ('nombre', 'nombre'),
+    ('categoria', 'categoria'),
+    ('talla', 'talla'),
+    ('estado', 'estado'),
+    ('fecha_publicacion', 'fecha_publicacion'),
+    ('id_usuario', 'user_id'),
+    ('usuario', 'user__nombre'),
+]
+
+
+def _inicio_del_dia(valor):
+    """'2025-01-31' -> datetime con zona horaria a las 00:00, o None si no es una fecha."""
+    fecha = parse_date(valor) if valor else None
+    if fecha is None:
+        return None
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def _alcance_exportacion(request, usuario):
+    """
+    Lee los filtros de la exportación desde la query string.
+    Un representante solo puede exportar su propia fundación; un administrador
+    puede elegir cualquiera (o ninguna, para exportar todo).
+
+    Con ?archivo=1 se incluyen las transacciones archivadas.
+
+    Returns:
+        dict con fundacion_id, campana_id, desde, hasta (fin exclusivo) y archivo
+
+    Raises:
+        ValueError: Si algún parámetro no es válido
+    """
+    if usuario.es_representante_fundacion():
+        if not usuario.fundacion_asignada_id:
+            raise ValueError('No tienes una fundación asignada.')
+        fundacion_id = usuario.fundacion_asignada_id
+    else:
+        fundacion_id = request.GET.get('fundacion') or None
+
+    alcance = {
+        'fundacion_id': fundacion_id,
+        'campana_id': request.GET.get('campana') or None,
+        'desde': _inicio_del_dia(request.GET.get('desde')),
+        'hasta': None,
+        'archivo': request.GET.get('archivo') in ('1', 'true'),
+    }
+    for campo in ('fundacion_id', 'campana_id'):
+        if alcance[campo] is not None and not str(alcance[campo]).isdigit():
+            raise ValueError(f'El parámetro {campo.replace("_id", "")} debe ser un id numérico.')
+    if request.GET.get('desde') and alcance['desde'] is None:
+        raise ValueError('Fecha "desde" inválida (usa AAAA-MM-DD).')
+    if request.GET.get('hasta'):
+        hasta = _inicio_del_dia(request.GET['hasta'])
+        if hasta is None:
+            raise ValueError('Fecha "hasta" inválida (usa AAAA-MM-DD).')
+        alcance['hasta'] = hasta + timedelta(days=1)  # incluye el día completo
+    return alcance
+
+
+def _filtrar_transacciones(transacciones, alcance):
+    if alcance['fundacion_id']:
+        transacciones = transacciones.filter(fundacion_id=alcance['fundacion_id'])
+    if alcance['campana_id']:
+        transacciones = transacciones.filter(campana_id=alcance['campana_id'])
+    if alcance['desde']:
+        transacciones = transacciones.filter(fecha_transaccion__gte=alcance['desde'])
+    if alcance['hasta']:
+        transacciones = transacciones.filter(fecha_transaccion__lt=alcance['hasta'])
+    return transacciones
+
+
+def _transacciones_en_alcance(alcance):
+    """Transacciones en el alcance; con `archivo`, UNION ALL con las archivadas."""
+    return union_historica(lambda transacciones: _filtrar_transacciones(transacciones, alcance), alcance['archivo'])
+
+
+def _por_prenda_en_alcance(queryset, alcance, campo_prenda, campo_fecha):
+    """
+    Con fundación o campaña: filas cuyas prendas tienen transacciones en el
+    alcance (subconsulta, sin duplicados). Sin ellas (administrador exportando
+    todo): filtro directo por `campo_fecha`.
+    """
+    if alcance['fundacion_id'] or alcance['campana_id']:
+        en_alcance = Q()
+        for transacciones in consultas_historicas(
+            lambda transacciones: _filtrar_transacciones(transacciones, alcance).values('prenda_id'), alcance['archivo']
+        ):
+            en_alcance |= Q(**{f'{campo_prenda}__in': transacciones})
+        return queryset.filter(en_alcance)
+    if alcance['desde']:
+        queryset = queryset.filter(**{f'{campo_fecha}__gte': alcance['desde']})
+    if alcance['hasta']:
+        queryset = queryset.filter(**{f'{campo_fecha}__lt': alcance['hasta']})
+    return queryset
+
+
+def _exportar(request, nombre, construir_queryset, columnas):
+    """Valida formato y alcance y devuelve la descarga en streaming."""
+    usuario = request.usuario_actual  # cargado por role_required
+    formato = request.GET.get('formato', 'csv').lower()
+    if formato not in FORMATOS_EXPORTACION:
+        return JsonResponse(
+            {'error': f"Formato no soportado. Usa: {', '.join(FORMATOS_EXPORTACION)}"}, status=400
+        )
+    try:
+        alcance = _alcance_exportacion(request, usuario)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    logger.info(f"Exportación {nombre} ({formato}) por usuario {usuario.id_usuario}: {alcance}")
+    queryset = construir_queryset(alcance).order_by('pk')
+    sufijo = f"_fundacion_{alcance['fundacion_id']}" if alcance['fundacion_id'] else ''
+    return respuesta_exportacion(queryset, columnas, formato, f'{nombre}{sufijo}')
+
+
+@role_required('REPRESENTANTE_FUNDACION', 'ADMINISTRADOR')
+def exportar_transacciones(request):
+    """Descarga CSV/NDJSON de las transacciones de la fundación (o todas, para administradores)."""
+    return _exportar(request, 'transacciones', _transacciones_en_alcance, COLUMNAS_TRANSACCIONES)
+
+
+@role_required('REPRESENTANTE_FUNDACION', 'ADMINISTRADOR')
+def exportar_impacto(request):
+    """Descarga CSV/NDJSON del impacto ambiental de las prendas en el alcance."""
+    return _exportar(
+        request, 'impacto_ambiental',
+        lambda alcance: _por_prenda_en_alcance(ImpactoAmbiental.objects.all(), alcance, 'prenda_id', 'fecha_calculo'),
+        COLUMNAS_IMPACTO,
+    )
+
+
+@role_required('REPRESENTANTE_FUNDACION', 'ADMINISTRADOR')
+def exportar_prendas(request):
+    """Descarga CSV/NDJSON de las prendas en el alcance."""
+    return _exportar(
+        request, 'prendas',
+        lambda alcance: _por_prenda_en_alcance(Prenda.objects.all(), alcance, 'id_prenda', 'fecha_publicacion'),
+        COLUMNAS_PRENDAS,
+    )
@@ -29,6 +29,10 @@ from django.conf import settings
 
 from ..forms import RegistroForm, PerfilForm, PrendaForm
 from .auth import get_usuario_actual
+from ..subidas import programar_subida
+from ..transiciones import TransicionInvalida, cambiar_estado, cambiar_estado_lote
+from ..fragmentos import anotar_sellos, FRAGMENTOS_CACHE_SEGUNDOS
+from ..resumenes import PERIODOS, periodo_desde, resumen_fundacion
 from ..cloudinary_utils import (
     validar_imagen,
     subir_logo_fundacion,
@@ -44,7 +48,8 @@ def lista_fundaciones(request):
     fundaciones = Fundacion.objects.filter(activa=True)
     context = {
         'usuario': usuario,
-        'fundaciones': fundaciones,
+        'fundaciones': anotar_sellos(fundaciones),  # tarjetas cacheadas por fundación
+        'fragmentos_segundos': FRAGMENTOS_CACHE_SEGUNDOS,
     }
     return render(request, 'fundaciones/lista_fundaciones.html', context)
 
@@ -55,7 +60,7 @@ def detalle_fundacion(request, id_fundacion):
     # Donaciones recibidas por la fundación, ordenadas por más recientes
     donaciones = Transaccion.objects.filter(
         fundacion=fundacion,  # Cambiado: 'fundacion'
-        tipo__nombre_tipo='Donación'  # Cambiado: 'tipo__nombre_tipo'
+        tipo_id=TipoTransaccion.id_de(TipoTransaccion.DONACION),
     ).select_related('prenda', 'user_origen').order_by('-fecha_transaccion')  # Cambiado: 'prenda', 'user_origen', agregado select_related
 
     # Impacto ambiental total de todas las prendas donadas a esta fundación
@@ -88,48 +93,76 @@ def panel_fundacion(request):
     # Obtener donaciones recibidas
     donaciones_recibidas = Transaccion.objects.filter(
         fundacion=fundacion,
-        tipo__nombre_tipo='Donación'
-    ).select_related('prenda', 'user_origen')
-    
-    # Calcular impacto ambiental desde las prendas donadas
-    impacto = ImpactoAmbiental.objects.filter(
-        prenda__transaccion__fundacion=fundacion,
-        prenda__transaccion__tipo__nombre_tipo='Donación'
-    ).aggregate(
-        total_carbono=Sum('carbono_evitar_kg'),
-        total_energia=Sum('energia_ahorrada_kwh'),
-    )
+        tipo_id=TipoTransaccion.id_de(TipoTransaccion.DONACION),
+    ).select_related('prenda', 'user_origen').order_by('-fecha_transaccion')
     
     # Obtener campañas de la fundación
     campanas = CampanaFundacion.objects.filter(fundacion=fundacion).order_by('-fecha_inicio')
     
-    # Estadísticas generales
-    total_donaciones = donaciones_recibidas.count()
-    donaciones_pendientes = donaciones_recibidas.filter(estado='PENDIENTE').count()
-    donaciones_completadas = donaciones_recibidas.filter(estado='COMPLETADA').count()
+    # Estadísticas del periodo elegido, desde los resúmenes diarios (resumenes.py)
+    periodo, desde = periodo_desde(request.GET.get('periodo'))
+    resumen = resumen_fundacion(fundacion, desde)
     
     context = {
         'usuario': usuario,
         'fundacion': fundacion,
         'donaciones_recibidas': donaciones_recibidas[:10],  # Últimas 10
-        'total_donaciones': total_donaciones,
-        'donaciones_pendientes': donaciones_pendientes,
-        'donaciones_completadas': donaciones_completadas,
-        'impacto': impacto,
+        'total_donaciones': resumen['total'],
+        'donaciones_pendientes': resumen['por_estado'].get('PENDIENTE', 0),
+        'donaciones_completadas': resumen['por_estado'].get('COMPLETADA', 0),
+        'impacto': {'total_carbono': resumen['carbono_kg'], 'total_energia': resumen['energia_kwh']},
         'campanas': campanas,
+        'periodo': periodo,
+        'periodos': PERIODOS,
     }
     return render(request, 'fundaciones/panel_fundacion.html', context)
 
+# Acción masiva: (estado destino, estados desde los que se permite)
+ACCIONES_DONACIONES = {
+    'confirmar': ('COMPLETADA', ('EN_PROCESO',)),
+    'rechazar': ('RECHAZADA', ('PENDIENTE',)),
+}
+
+
 @representante_fundacion_required
 def gestionar_donaciones(request):
-    """Lista todas las donaciones a la fundación, permite confirmar o rechazar."""
+    """Lista las donaciones por atender; POST confirma o rechaza varias a la vez."""
     usuario = get_usuario_actual(request)
     fundacion = usuario.fundacion_asignada
-    donaciones = Transaccion.objects.filter(fundacion=fundacion, tipo__nombre_tipo='Donación', estado='PENDIENTE')
+    donaciones = Transaccion.objects.filter(
+        fundacion=fundacion, tipo_id=TipoTransaccion.id_de(TipoTransaccion.DONACION)
+    )
+
+    if request.method == 'POST':
+        accion = request.POST.get('accion')
+        ids = [valor for valor in request.POST.getlist('donaciones') if valor.isdigit()]
+        if accion not in ACCIONES_DONACIONES or not ids:
+            messages.error(request, 'Selecciona al menos una donación y una acción.')
+            return redirect('gestionar_donaciones')
+
+        nuevo_estado, desde = ACCIONES_DONACIONES[accion]
+        campos = {'fecha_entrega': timezone.now()} if nuevo_estado == 'COMPLETADA' else {}
+        # Agradecimientos y logros los despacha la bandeja de salida (eventos.py)
+        actualizadas, omitidas = cambiar_estado_lote(
+            donaciones.filter(pk__in=ids), nuevo_estado, desde=desde, actor=usuario, **campos
+        )
+
+        if actualizadas:
+            verbo = 'confirmadas' if nuevo_estado == 'COMPLETADA' else 'rechazadas'
+            messages.success(request, f'{len(actualizadas)} donaciones {verbo}.')
+        if omitidas:
+            motivo = 'aún no fueron enviadas' if nuevo_estado == 'COMPLETADA' else 'ya están en camino'
+            messages.warning(request, f'{len(omitidas)} donaciones se omitieron porque {motivo}.')
+        return redirect('gestionar_donaciones')
+
     context = {
         'usuario': usuario,
         'fundacion': fundacion,
-        'donaciones': donaciones,
+        'donaciones': (
+            donaciones.filter(estado__in=('PENDIENTE', 'EN_PROCESO'))
+            .select_related('prenda', 'user_origen')
+            .order_by('fecha_transaccion')
+        ),
     }
     return render(request, 'fundaciones/gestionar_donaciones.html', context)
 
@@ -137,10 +170,11 @@ def gestionar_donaciones(request):
 def confirmar_recepcion_donacion(request, id_transaccion):
     """Confirma la recepción de una donación y actualiza estados."""
     usuario = get_usuario_actual(request)
+    fundacion = usuario.fundacion_asignada
     transaccion = get_object_or_404(
         Transaccion,
         pk=id_transaccion,
-        fundacion=usuario.fundacion_asignada
+        fundacion=fundacion
     )
 
     if request.method != 'POST':
@@ -149,19 +183,15 @@ def confirmar_recepcion_donacion(request, id_transaccion):
     if transaccion.estado != 'EN_PROCESO':
         return JsonResponse({'error': 'La donación aún no ha sido marcada como entregada por el donante.'}, status=400)
 
-    transaccion.estado = 'COMPLETADA'
-    transaccion.fecha_entrega = timezone.now()
-    transaccion.save()
-    transaccion.actualizar_disponibilidad_prenda()
-
-    Mensaje.objects.create(
-        emisor=usuario,
-        receptor=transaccion.user_origen,
-        contenido=f"Gracias por tu donación de {transaccion.prenda.nombre}! Tu prenda ha sido recibida y será destinada a {transaccion.fundacion.nombre}.",
-        fecha_envio=timezone.now()
-    )
+    try:
+        # Transacción y prenda (DONADA) en una escritura cada una, con las filas
+        # bloqueadas; el agradecimiento y los logros los despacha eventos.py
+        transaccion = cambiar_estado(
+            transaccion, 'COMPLETADA', desde=('EN_PROCESO',), actor=usuario, fecha_entrega=timezone.now()
+        )
+    except TransicionInvalida as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-    verificar_logros(transaccion.user_origen)
     messages.success(request, 'Donación confirmada y donante notificado.')
     return redirect('gestionar_donaciones')
 
@@ -189,19 +219,37 @@ def enviar_mensaje_agradecimiento(request, id_usuario_donante):
     }
     return render(request, 'mensajes/enviar_mensaje_agradecimiento.html', context)
 
+# Filas de la tabla de donaciones en estadisticas_donaciones
+DONACIONES_EN_ESTADISTICAS = 50
+
+
 @representante_fundacion_required
 def estadisticas_donaciones(request):
     """Panel con estadísticas avanzadas de donaciones de la fundación."""
     usuario = get_usuario_actual(request)
     fundacion = usuario.fundacion_asignada
-    donaciones = Transaccion.objects.filter(fundacion=fundacion, tipo__nombre_tipo='Donación', prenda__isnull=False).select_related('prenda', 'user_origen')
-    resumen = donaciones.values('estado').annotate(total=Count('id_transaccion'))
-    prendas = Prenda.objects.filter(pk__in=Transaccion.objects.filter(fundacion=fundacion, prenda__isnull=False).values_list('prenda_id', flat=True))
+    periodo, desde = periodo_desde(request.GET.get('periodo'))
+    resumen = resumen_fundacion(fundacion, desde)
+    etiquetas = dict(Transaccion.ESTADO_CHOICES)
+
+    # La tabla muestra solo las más recientes; los totales salen del resumen
+    donaciones = Transaccion.objects.filter(
+        fundacion=fundacion, tipo_id=TipoTransaccion.id_de(TipoTransaccion.DONACION)
+    ).select_related('prenda', 'user_origen').order_by('-fecha_transaccion')
+    if desde is not None:
+        donaciones = donaciones.filter(fecha_transaccion__date__gte=desde)
     context = {
         'fundacion': fundacion,
-        'donaciones': donaciones,
-        'resumen': list(resumen),
-        'total_prendas': prendas.count()
+        'donaciones': donaciones[:DONACIONES_EN_ESTADISTICAS],
+        'resumen': [
+            {'estado': etiquetas.get(estado, estado), 'total': total}
+            for estado, total in sorted(resumen['por_estado'].items())
+        ],
+        'total_prendas': resumen['total'],
+        'por_categoria': resumen['por_categoria'],
+        'impacto': {'total_carbono': resumen['carbono_kg'], 'total_energia': resumen['energia_kwh']},
+        'periodo': periodo,
+        'periodos': PERIODOS,
     }
     return render(request, 'fundaciones/estadisticas_donaciones.html', context)
 
@@ -383,9 +431,9 @@ def editar_fundacion(request):
                 messages.error(request, f'Imagen del logo inválida: {mensaje_error}')
             else:
                 try:
-                    resultado = subir_logo_fundacion(request.FILES['imagen_fundacion'], fundacion.id_fundacion)
-                    fundacion.imagen_fundacion = resultado['secure_url']
-                    logger.info(f"Logo de fundación {fundacion.nombre} actualizado exitosamente")
+                    # Se sube en segundo plano; la URL se guarda al terminar
+                    programar_subida(request.FILES['imagen_fundacion'], 'fundacion', fundacion.id_fundacion)
+                    logger.info(f"Logo de fundación {fundacion.nombre} en cola de subida")
                 except Exception as e:
                     messages.error(request, f'Error al subir el logo: {str(e)}')
                     logger.error(f"Error al subir logo de fundación {fundacion.id_fundacion}: {str(e)}")
@@ -65,19 +65,12 @@ def panel_impacto(request):
     impacto_plataforma = obtener_impacto_total_plataforma()
     
     # Estadísticas de transacciones
-    total_transacciones = Transaccion.objects.filter(estado='COMPLETADA').count()
-    total_donaciones = Transaccion.objects.filter(
-        tipo__nombre_tipo='Donación',
-        estado='COMPLETADA'
-    ).count()
-    total_intercambios = Transaccion.objects.filter(
-        tipo__nombre_tipo='Intercambio',
-        estado='COMPLETADA'
-    ).count()
-    total_ventas = Transaccion.objects.filter(
-        tipo__nombre_tipo='Venta',
-        estado='COMPLETADA'
-    ).count()
+    # Una sola consulta, sin unir tipo_transaccion
+    totales = Transaccion.contar_por_tipo(Transaccion.objects.filter(estado='COMPLETADA'))
+    total_transacciones = totales['total']
+    total_donaciones = totales[TipoTransaccion.DONACION]
+    total_intercambios = totales[TipoTransaccion.INTERCAMBIO]
+    total_ventas = totales[TipoTransaccion.VENTA]
 
     # Top usuarios con más impacto
     from django.db.models import Sum, Count
@@ -128,9 +121,10 @@ def mi_impacto(request):
     ).select_related('prenda', 'tipo', 'user_origen', 'user_destino', 'fundacion')
 
     # Desglose por tipo
-    donaciones = mis_transacciones.filter(tipo__nombre_tipo='Donación').count()
-    intercambios = mis_transacciones.filter(tipo__nombre_tipo='Intercambio').count()
-    ventas = mis_transacciones.filter(tipo__nombre_tipo='Venta').count()
+    totales = Transaccion.contar_por_tipo(mis_transacciones)
+    donaciones = totales[TipoTransaccion.DONACION]
+    intercambios = totales[TipoTransaccion.INTERCAMBIO]
+    ventas = totales[TipoTransaccion.VENTA]
     
     # Ranking del usuario
     from django.db.models import Sum
@@ -13,6 +13,7 @@ from ..models import (
     Fundacion, Mensaje, ImpactoAmbiental, 
     Logro, UsuarioLogro, CampanaFundacion
 )
+from ..archivo import consultas_historicas
 from ..decorators import (
     login_required_custom,
     anonymous_required,
@@ -67,11 +68,12 @@ def verificar_logros(usuario):
         
         # Logro: Donador (1 donación completada)
         if logro.codigo == 'DONADOR':
-            donaciones = Transaccion.objects.filter(
+            # Las transacciones archivadas también cuentan
+            donaciones = sum(consulta.count() for consulta in consultas_historicas(lambda transacciones: transacciones.filter(
                 user_origen=usuario,
-                tipo__nombre_tipo='Donación',
+                tipo_id=TipoTransaccion.id_de(TipoTransaccion.DONACION),
                 estado='COMPLETADA'
-            ).count()
+            )))
             if donaciones >= 1:
                 UsuarioLogro.objects.create(
                     user=usuario,
@@ -93,11 +95,11 @@ def verificar_logros(usuario):
         
         # Logro: Intercambiador (5 intercambios completados)
         elif logro.codigo == 'INTERCAMBIADOR':
-            intercambios = Transaccion.objects.filter(
+            intercambios = sum(consulta.count() for consulta in consultas_historicas(lambda transacciones: transacciones.filter(
                 Q(user_origen=usuario) | Q(user_destino=usuario),
-                tipo__nombre_tipo='Intercambio',
+                tipo_id=TipoTransaccion.id_de(TipoTransaccion.INTERCAMBIO),
                 estado='COMPLETADA'
-            ).count()
+            )))
             if intercambios >= 5:
                 UsuarioLogro.objects.create(
                     user=usuario,
@@ -48,7 +48,12 @@ from ..carbon_utils import (
 )
 
 from ..clarifai_utils import analizar_imagen_completa
-from .auth import get_usuario_actual, obtener_permisos_usuario, es_propietario_prenda, puede_proponer_transaccion, puede_donar_prenda, puede_editar_prenda, puede_eliminar_prenda
+from ..subidas import programar_subida
+from ..busqueda import buscar_prendas_texto
+from ..facetas import FACETAS_CATALOGO, calcular_facetas
+from ..recomendaciones import prendas_similares
+from ..fragmentos import anotar_sellos, FRAGMENTOS_CACHE_SEGUNDOS
+from .auth import get_usuario_actual, obtener_permisos_usuario, anotar_permisos_prenda, es_propietario_prenda, puede_proponer_transaccion, puede_donar_prenda, puede_editar_prenda, puede_eliminar_prenda
 
 # Configuración de logging
 logger = logging.getLogger(__name__)
@@ -64,32 +69,26 @@ def lista_prendas(request):
 
     categoria = request.GET.get('categoria')
     talla = request.GET.get('talla')
-    estado = request.GET.get('estado')
+
+    # Conteos por filtro sobre el catálogo disponible (una consulta, cacheada)
+    facetas = calcular_facetas(
+        prendas, {'categoria': categoria, 'talla': talla}, 'lista_prendas', FACETAS_CATALOGO
+    )
 
     if categoria:
         prendas = prendas.filter(categoria=categoria)
     if talla:
         prendas = prendas.filter(talla=talla)
-    if estado:
-        prendas = prendas.filter(estado=estado)
 
-    # Enriquecer cada prenda con flags de permisos
+    # Flags de permisos calculados en la misma consulta (is_owner, can_propose...)
     permisos = obtener_permisos_usuario(usuario)
-    prendas_enriquecidas = []
-    for prenda in prendas:
-        prenda_data = {
-            'prenda': prenda,
-            'is_owner': es_propietario_prenda(usuario, prenda),
-            'can_propose': puede_proponer_transaccion(usuario, prenda),
-        }
-        prendas_enriquecidas.append(prenda_data)
+    prendas = anotar_permisos_prenda(prendas.select_related('user'), usuario)
 
     context = {
         'usuario': usuario,
-        'prendas': prendas_enriquecidas,
-        'categorias': ['Camiseta', 'Pantalón', 'Vestido', 'Chaqueta', 'Zapatos', 'Accesorios'],
-        'tallas': ['XS', 'S', 'M', 'L', 'XL', 'XXL'],
-        'estados': ['Nuevo', 'Excelente', 'Bueno', 'Usado'],
+        'prendas': anotar_sellos(prendas),  # tarjetas cacheadas por prenda
+        'fragmentos_segundos': FRAGMENTOS_CACHE_SEGUNDOS,
+        'facetas': facetas,
         **permisos,
     }
     return render(request, 'prendas/lista_prendas.html', context)
@@ -107,7 +106,7 @@ def detalle_prenda(request, id_prenda):
     # Buscar transacción actual
     transaccion_actual = Transaccion.objects.filter(
         prenda=prenda,
-        estado__in=['PENDIENTE', 'RESERVADA', 'EN_PROCESO']
+        estado__in=Transaccion.ESTADOS_ABIERTOS
     ).order_by('-fecha_transaccion').first()
 
     # Obtener permisos y flags
@@ -118,10 +117,14 @@ def detalle_prenda(request, id_prenda):
     can_edit = puede_editar_prenda(usuario, prenda)
     can_delete = puede_eliminar_prenda(usuario, prenda)
 
+    # "Más como esta": índice precalculado (ver recomendaciones.py)
+    similares = prendas_similares(prenda, excluir_usuario_id=usuario.id_usuario if usuario else None)
+
     context = {
         'usuario': usuario,
         'prenda': prenda,
         'impacto': impacto_obj,
+        'similares': similares,
         'transaccion_actual': transaccion_actual,
         'is_owner': is_owner,
         'can_propose': can_propose,
@@ -172,40 +175,12 @@ def crear_prenda(request):
             fecha_publicacion=timezone.now()
         )
         
-        # Subir imagen a Cloudinary si existe
+        # La imagen se sube en segundo plano (subidas.py); la prenda queda
+        # publicada de inmediato y recibe la URL cuando termina la subida
         if imagen:
-            try:
-                resultado = subir_imagen_prenda(imagen, prenda.id_prenda)
-                if resultado and resultado.get('secure_url'):
-                    prenda.imagen_prenda = resultado['secure_url']
-                    prenda.save()
-
-                    # ✨ ANÁLISIS CON CLARIFAI ✨
-                    try:
-                        analisis = analizar_imagen_completa(imagen_url=resultado['secure_url'])
-
-                        # Si la categoría sugerida es diferente, avisar al usuario
-                        if analisis['categoria_sugerida'] and analisis['categoria_sugerida'] != categoria:
-                            if analisis['confianza'] >= 0.7:
-                                messages.warning(
-                                    request,
-                                    f"Clarifai detectó que podría ser '{analisis['categoria_sugerida']}' "
-                                    f"con {analisis['confianza']*100:.0f}% de confianza. "
-                                    f"Puedes editar la categoría si lo deseas."
-                                )
-                    except Exception as e:
-                        print(f"Error al analizar con Clarifai: {e}")
-                        # Continuar sin análisis
-            except CloudinaryError as e:
-                # Cloudinary no está configurado (desarrollo local) - usar URL local simulada
-                try:
-                    # Para desarrollo local, simular una URL de imagen
-                    prenda.imagen_prenda = f"/media/prendas/{imagen.name}"
-                    prenda.save()
-                    logger.info(f"Imagen guardada localmente para prenda {prenda.id_prenda} (Cloudinary no disponible)")
-                except Exception as local_error:
-                    logger.warning(f"Error guardando imagen localmente: {str(local_error)}")
-        
+            programar_subida(imagen, 'prenda', prenda.id_prenda)
+            messages.info(request, 'Tu imagen se está procesando y aparecerá en unos segundos.')
+
         # Calcular impacto ambiental
         impacto = calcular_impacto_prenda(categoria=categoria, peso_kg=None)
         
@@ -304,22 +279,14 @@ def mis_prendas(request):
         return redirect('home')
 
     prendas = Prenda.objects.filter(user=usuario).order_by('-fecha_publicacion')
-    
-    # Enriquecer cada prenda con flags de permisos
+
+    # Flags de permisos calculados en la misma consulta (is_owner, can_edit...)
     permisos = obtener_permisos_usuario(usuario)
-    prendas_enriquecidas = []
-    for prenda in prendas:
-        prenda_data = {
-            'prenda': prenda,
-            'is_owner': es_propietario_prenda(usuario, prenda),
-            'can_edit': puede_editar_prenda(usuario, prenda),
-            'can_delete': puede_eliminar_prenda(usuario, prenda),
-        }
-        prendas_enriquecidas.append(prenda_data)
-    
+    prendas = anotar_permisos_prenda(prendas, usuario)
+
     context = {
         'usuario': usuario,
-        'prendas': prendas_enriquecidas,
+        'prendas': prendas,
         **permisos,
     }
     return render(request, 'prendas/mis_prendas.html', context)
@@ -331,27 +298,30 @@ def buscar_prendas(request):
     query = request.GET.get('q', '')
     categoria = request.GET.get('categoria')
     talla = request.GET.get('talla')
-    estado = request.GET.get('estado')
 
     prendas = Prenda.objects.filter(estado='DISPONIBLE')
+    # Índice de texto completo: resultados ordenados por relevancia
     if query:
-        prendas = prendas.filter(
-            Q(nombre__icontains=query) |
-            Q(descripcion__icontains=query)
-        )
+        prendas = buscar_prendas_texto(prendas, query)
+
+    # Conteos por filtro para el texto buscado (una consulta, cacheada)
+    facetas = calcular_facetas(
+        prendas, {'categoria': categoria, 'talla': talla}, f'buscar_prendas:{query.strip().lower()}', FACETAS_CATALOGO
+    )
+
     if categoria:
         prendas = prendas.filter(categoria=categoria)
     if talla:
         prendas = prendas.filter(talla=talla)
-    if estado:
-        prendas = prendas.filter(estado=estado)
+    if query:
+        prendas = prendas.order_by('-rango', '-fecha_publicacion')
+    else:
+        prendas = prendas.order_by('-fecha_publicacion')
 
     context = {
         'usuario': usuario,
-        'prendas': prendas.order_by('-fecha_publicacion'),
+        'prendas': prendas,
         'query': query,
-        'categorias': ['Camiseta', 'Pantalón', 'Vestido', 'Chaqueta', 'Zapatos', 'Accesorios'],
-        'tallas': ['XS', 'S', 'M', 'L', 'XL', 'XXL'],
-        'estados': ['Nuevo', 'Excelente', 'Bueno', 'Usado'],
+        'facetas': facetas,
     }
-    return render(request, 'prendas/buscar_prendas.html', context)
\ No newline at end of file
+    return render(request, 'prendas/buscar_prenda.html', context)
\ No newline at end of file
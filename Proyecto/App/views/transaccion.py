@@ -48,7 +48,7 @@ from ..carbon_utils import (
 
 from ..forms import RegistroForm, PerfilForm, PrendaForm
 from .auth import get_usuario_actual, puede_actualizar_transaccion
-from .logro import verificar_logros
+from ..transiciones import TransicionInvalida, cambiar_estado, crear_transaccion
 
 # Configuración de logging
 logger = logging.getLogger(__name__)
@@ -62,7 +62,7 @@ def proponer_intercambio(request, id_prenda):
     usuario = get_usuario_actual(request)
     prenda_destino = get_object_or_404(Prenda.objects.select_related('user'), id_prenda=id_prenda)  # Cambiado: 'pk=id_prenda', agregado select_related
 
-    if prenda_destino.user.id == usuario.id_usuario:  # Cambiado: 'prenda_destino.user.id == usuario.id'
+    if prenda_destino.user_id == usuario.id_usuario:
         messages.error(request, 'No puedes intercambiar con tu propia prenda.')
         return redirect('detalle_prenda', id_prenda=id_prenda)
     if prenda_destino.estado != 'DISPONIBLE':  # Cambiado: check directo en 'estado'
@@ -75,20 +75,22 @@ def proponer_intercambio(request, id_prenda):
         if prenda_origen.estado != 'DISPONIBLE':  # Cambiado: check directo
             messages.error(request, 'La prenda ofrecida ya no está disponible.')
             return redirect('detalle_prenda', id_prenda=id_prenda)
-        tipo_intercambio, _ = TipoTransaccion.objects.get_or_create(nombre_tipo='Intercambio', defaults={
-            'descripcion': 'Intercambio de prendas entre usuarios'
-        })
+        tipo_intercambio = TipoTransaccion.obtener(TipoTransaccion.INTERCAMBIO)
         try:
-            transaccion = Transaccion.objects.create(
-                prenda=prenda_destino,  # Cambiado: 'prenda=prenda_destino'
-                tipo=tipo_intercambio,  # Cambiado: 'tipo=tipo_intercambio'
-                user_origen=usuario,  # Cambiado: 'user_origen=usuario'
-                user_destino=prenda_destino.user,  # Cambiado: 'user_destino=prenda_destino.user'
+            transaccion = crear_transaccion(
+                prenda_destino,
+                tipo_intercambio,
+                actor=usuario,
+                user_origen=usuario,
+                user_destino=prenda_destino.user,
+                prenda_ofrecida=prenda_origen,
                 fecha_transaccion=timezone.now(),
-                estado='PENDIENTE'
             )
-            messages.success(request, f'¡Intercambio propuesto! Código de seguimiento: {transaccion.id}. Ahora puedes negociar con el otro usuario.')  # Cambiado: 'transaccion.id'
-            return redirect('conversacion', id_usuario=prenda_destino.user.id)  # Cambiado: 'prenda_destino.user.id'
+            messages.success(request, f'¡Intercambio propuesto! Código de seguimiento: {transaccion.pk}. Ahora puedes negociar con el otro usuario.')
+            return redirect('conversacion', id_usuario=prenda_destino.user_id)
+        except TransicionInvalida as e:
+            messages.error(request, str(e))
+            return redirect('detalle_prenda', id_prenda=id_prenda)
         except Exception as e:
             logger.error(f"Error creando intercambio para usuario {usuario.id_usuario}: {e}")
             messages.error(request, 'Error interno. Intenta nuevamente.')
@@ -104,7 +106,7 @@ def proponer_intercambio(request, id_prenda):
 @login_required_custom
 def marcar_intercambio_entregado(request, id_transaccion):
     usuario = get_usuario_actual(request)
-    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_origen'), id=id_transaccion)  # Cambiado: agregado select_related
+    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_origen'), pk=id_transaccion)  # Cambiado: agregado select_related
     
     permitido, error = puede_actualizar_transaccion(usuario, transaccion, 'origen')
     if not permitido:
@@ -113,17 +115,19 @@ def marcar_intercambio_entregado(request, id_transaccion):
         return JsonResponse({'error': 'La transacción no está en estado reservado.'}, status=400)
     
     try:
-        transaccion.marcar_en_proceso()
+        cambiar_estado(transaccion, 'EN_PROCESO', desde=('RESERVADA',), actor=usuario)
         messages.success(request, 'Has marcado la prenda como entregada.')
         return redirect('mis_transacciones')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        logger.error(f"Error marcando intercambio entregado {transaccion.id}: {e}")
+        logger.error(f"Error marcando intercambio entregado {transaccion.pk}: {e}")
         return JsonResponse({'error': 'Error interno'}, status=500)
 
 @login_required_custom
 def confirmar_recepcion_intercambio(request, id_transaccion):
     usuario = get_usuario_actual(request)
-    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_destino'), id=id_transaccion)  # Cambiado: agregado select_related
+    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_destino'), pk=id_transaccion)  # Cambiado: agregado select_related
     
     permitido, error = puede_actualizar_transaccion(usuario, transaccion, 'destino')
     if not permitido:
@@ -132,30 +136,34 @@ def confirmar_recepcion_intercambio(request, id_transaccion):
         return JsonResponse({'error': 'Debes esperar a que el propietario marque como entregada.'}, status=400)
     
     try:
-        transaccion.marcar_como_completada()
+        cambiar_estado(transaccion, 'COMPLETADA', desde=('EN_PROCESO',), actor=usuario)
         messages.success(request, '¡Intercambio completado con éxito!')
         return redirect('mis_transacciones')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        logger.error(f"Error confirmando recepción intercambio {transaccion.id}: {e}")
+        logger.error(f"Error confirmando recepción intercambio {transaccion.pk}: {e}")
         return JsonResponse({'error': 'Error interno'}, status=500)
 
 @login_required_custom
 def cancelar_intercambio(request, id_transaccion):
     usuario = get_usuario_actual(request)
-    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda'), id=id_transaccion)  # Cambiado: agregado select_related
+    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda'), pk=id_transaccion)  # Cambiado: agregado select_related
     
     permitido, error = puede_actualizar_transaccion(usuario, transaccion, 'origen')
     if not permitido:
         return JsonResponse({'error': error}, status=403)
-    if transaccion.estado not in ['PENDIENTE', 'RESERVADA', 'EN_PROCESO']:
+    if transaccion.estado not in Transaccion.ESTADOS_ABIERTOS:
         return JsonResponse({'error': 'No puedes cancelar una transacción finalizada.'}, status=400)
     
     try:
-        transaccion.cancelar()
+        cambiar_estado(transaccion, 'CANCELADA', desde=Transaccion.ESTADOS_ABIERTOS, actor=usuario)
         messages.success(request, 'Intercambio cancelado y prenda devuelta a disponible.')
         return redirect('mis_transacciones')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        logger.error(f"Error cancelando intercambio {transaccion.id}: {e}")
+        logger.error(f"Error cancelando intercambio {transaccion.pk}: {e}")
         return JsonResponse({'error': 'Error interno'}, status=500)
 
 @login_required_custom
@@ -164,7 +172,7 @@ def comprar_prenda(request, id_prenda):
     usuario = get_usuario_actual(request)
     prenda = get_object_or_404(Prenda.objects.select_related('user'), id_prenda=id_prenda)  # Cambiado: agregado select_related
     
-    if prenda.user.id == usuario.id_usuario:  # Cambiado: 'prenda.user.id == usuario.id'
+    if prenda.user_id == usuario.id_usuario:
         messages.error(request, "No puedes comprar tu propia prenda.")
         return redirect('detalle_prenda', id_prenda=id_prenda)
     if prenda.estado != 'DISPONIBLE':  # Cambiado: check directo
@@ -172,20 +180,21 @@ def comprar_prenda(request, id_prenda):
         return redirect('detalle_prenda', id_prenda=id_prenda)
 
     if request.method == 'POST':
-        tipo_venta, _ = TipoTransaccion.objects.get_or_create(
-            nombre_tipo='Venta', defaults={'descripcion': 'Venta de prenda entre usuarios'}
-        )
+        tipo_venta = TipoTransaccion.obtener(TipoTransaccion.VENTA)
         try:
-            transaccion = Transaccion.objects.create(
-                prenda=prenda,  # Cambiado: 'prenda=prenda'
-                tipo=tipo_venta,  # Cambiado: 'tipo=tipo_venta'
-                user_origen=prenda.user,  # Cambiado: 'user_origen=prenda.user'
-                user_destino=usuario,  # Cambiado: 'user_destino=usuario'
+            transaccion = crear_transaccion(
+                prenda,
+                tipo_venta,
+                actor=usuario,
+                user_origen=prenda.user,
+                user_destino=usuario,
                 fecha_transaccion=timezone.now(),
-                estado='PENDIENTE'
             )
-            messages.success(request, f'Solicitud de compra enviada. Código: {transaccion.id}. Ahora puedes negociar con el vendedor.')  # Cambiado: 'transaccion.id'
-            return redirect('conversacion', id_usuario=prenda.user.id)  # Cambiado: 'prenda.user.id'
+            messages.success(request, f'Solicitud de compra enviada. Código: {transaccion.pk}. Ahora puedes negociar con el vendedor.')
+            return redirect('conversacion', id_usuario=prenda.user_id)
+        except TransicionInvalida as e:
+            messages.error(request, str(e))
+            return redirect('detalle_prenda', id_prenda=id_prenda)
         except Exception as e:
             logger.error(f"Error creando compra para usuario {usuario.id_usuario}: {e}")
             messages.error(request, 'Error interno. Intenta nuevamente.')
@@ -196,7 +205,7 @@ def comprar_prenda(request, id_prenda):
 @login_required_custom
 def marcar_compra_entregado(request, id_transaccion):
     usuario = get_usuario_actual(request)
-    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_origen'), id=id_transaccion)  # Cambiado: agregado select_related
+    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_origen'), pk=id_transaccion)  # Cambiado: agregado select_related
     
     permitido, error = puede_actualizar_transaccion(usuario, transaccion, 'origen')
     if not permitido:
@@ -205,18 +214,20 @@ def marcar_compra_entregado(request, id_transaccion):
         return JsonResponse({'error': 'La transacción no está en estado reservado.'}, status=400)
     
     try:
-        transaccion.marcar_en_proceso()
+        cambiar_estado(transaccion, 'EN_PROCESO', desde=('RESERVADA',), actor=usuario)
         messages.success(request, 'Has marcado la prenda como entregada.')
         return redirect('mis_transacciones')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        logger.error(f"Error marcando compra entregada {transaccion.id}: {e}")
+        logger.error(f"Error marcando compra entregada {transaccion.pk}: {e}")
         return JsonResponse({'error': 'Error interno'}, status=500)
 
 @login_required_custom
 def marcar_donacion_enviada(request, id_transaccion):
     """Permite al donante marcar su donación como enviada."""
     usuario = get_usuario_actual(request)
-    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_origen'), id=id_transaccion)  # Cambiado: agregado select_related
+    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_origen'), pk=id_transaccion)  # Cambiado: agregado select_related
 
     permitido, error = puede_actualizar_transaccion(usuario, transaccion, 'origen')
     if not permitido:
@@ -227,17 +238,19 @@ def marcar_donacion_enviada(request, id_transaccion):
         return JsonResponse({'error': 'La transacción no está en un estado válido para marcar como enviada.'}, status=400)
 
     try:
-        transaccion.marcar_en_proceso()
+        cambiar_estado(transaccion, 'EN_PROCESO', desde=('PENDIENTE', 'RESERVADA'), actor=usuario)
         messages.success(request, 'Has marcado la donación como enviada. La fundación confirmará la recepción.')
         return redirect('mis_transacciones')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        logger.error(f"Error marcando donación enviada {transaccion.id}: {e}")
+        logger.error(f"Error marcando donación enviada {transaccion.pk}: {e}")
         return JsonResponse({'error': 'Error interno'}, status=500)
 
 @login_required_custom
 def confirmar_recepcion_compra(request, id_transaccion):
     usuario = get_usuario_actual(request)
-    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_destino'), id=id_transaccion)  # Cambiado: agregado select_related
+    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_destino'), pk=id_transaccion)  # Cambiado: agregado select_related
     
     permitido, error = puede_actualizar_transaccion(usuario, transaccion, 'destino')
     if not permitido:
@@ -246,30 +259,34 @@ def confirmar_recepcion_compra(request, id_transaccion):
         return JsonResponse({'error': 'Solo puedes confirmar si ya fue marcada como entregada.'}, status=400)
     
     try:
-        transaccion.marcar_como_completada()
+        cambiar_estado(transaccion, 'COMPLETADA', desde=('EN_PROCESO',), actor=usuario)
         messages.success(request, '¡Transacción completada con éxito!')
         return redirect('mis_transacciones')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        logger.error(f"Error confirmando recepción compra {transaccion.id}: {e}")
+        logger.error(f"Error confirmando recepción compra {transaccion.pk}: {e}")
         return JsonResponse({'error': 'Error interno'}, status=500)
 
 @login_required_custom
 def cancelar_compra(request, id_transaccion):
     usuario = get_usuario_actual(request)
-    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda'), id=id_transaccion)  # Cambiado: agregado select_related
+    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda'), pk=id_transaccion)  # Cambiado: agregado select_related
     
     permitido, error = puede_actualizar_transaccion(usuario, transaccion, 'origen')
     if not permitido:
         return JsonResponse({'error': error}, status=403)
-    if transaccion.estado not in ['PENDIENTE', 'RESERVADA', 'EN_PROCESO']:
+    if transaccion.estado not in Transaccion.ESTADOS_ABIERTOS:
         return JsonResponse({'error': 'No puedes cancelar una transacción finalizada.'}, status=400)
     
     try:
-        transaccion.cancelar()
+        cambiar_estado(transaccion, 'CANCELADA', desde=Transaccion.ESTADOS_ABIERTOS, actor=usuario)
         messages.success(request, 'Transacción cancelada y prenda devuelta a disponible.')
         return redirect('mis_transacciones')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        logger.error(f"Error cancelando compra {transaccion.id}: {e}")
+        logger.error(f"Error cancelando compra {transaccion.pk}: {e}")
         return JsonResponse({'error': 'Error interno'}, status=500)
 
 @login_required_custom
@@ -277,7 +294,7 @@ def donar_prenda(request, id_prenda):
     """Permite a un usuario donar una prenda propia a una fundación activa."""
     usuario = get_usuario_actual(request)
     prenda = get_object_or_404(Prenda.objects.select_related('user'), pk=id_prenda)  # Cambiado: agregado select_related
-    if prenda.user.id != usuario.id_usuario:  # Cambiado: 'prenda.user.id != usuario.id'
+    if prenda.user_id != usuario.id_usuario:
         messages.error(request, 'Solo puedes donar tus propias prendas.')
         return redirect('detalle_prenda', id_prenda=id_prenda)
     if prenda.estado != 'DISPONIBLE':  # Cambiado: check directo
@@ -289,26 +306,23 @@ def donar_prenda(request, id_prenda):
             messages.error(request, 'Debes seleccionar una fundación válida.')
             return redirect('donar_prenda', id_prenda=id_prenda)
         fundacion = get_object_or_404(Fundacion.objects.select_related('representante'), pk=fundacion_id, activa=True)  # Cambiado: agregado select_related
-        tipo_donacion, _ = TipoTransaccion.objects.get_or_create(nombre_tipo='Donación', defaults={
-            'descripcion': 'Donación de prenda a fundación'
-        })
+        tipo_donacion = TipoTransaccion.obtener(TipoTransaccion.DONACION)
         try:
-            transaccion = Transaccion.objects.create(
-                prenda=prenda,  # Cambiado: 'prenda=prenda'
-                tipo=tipo_donacion,  # Cambiado: 'tipo=tipo_donacion'
-                user_origen=usuario,  # Cambiado: 'user_origen=usuario'
-                fundacion=fundacion,  # Cambiado: 'fundacion=fundacion'
+            # Queda PENDIENTE y la prenda RESERVADA (Transaccion.estado_prenda)
+            transaccion = crear_transaccion(
+                prenda,
+                tipo_donacion,
+                actor=usuario,
+                user_origen=usuario,
+                fundacion=fundacion,
                 fecha_transaccion=timezone.now(),
-                estado='PENDIENTE'
             )
-            prenda.marcar_como_reservada()
-            # Verificar logros
-            nuevos_logros = verificar_logros(usuario)  # Asumiendo que existe
-            if nuevos_logros:
-                for logro in nuevos_logros:
-                    messages.success(request, f'🏆 ¡Nuevo logro desbloqueado: {logro.nombre}!')
-            messages.success(request, f'¡Prenda donada exitosamente a {fundacion.nombre}! Código de seguimiento: {transaccion.id}')  # Cambiado: 'transaccion.id'
+            # Los logros los revisa la bandeja de salida cuando la donación se completa
+            messages.success(request, f'¡Prenda donada exitosamente a {fundacion.nombre}! Código de seguimiento: {transaccion.pk}')
             return redirect('mis_transacciones')
+        except TransicionInvalida as e:
+            messages.error(request, str(e))
+            return redirect('detalle_prenda', id_prenda=id_prenda)
         except Exception as e:
             logger.error(f"Error donando prenda {prenda.pk} por usuario {usuario.id_usuario}: {e}")
             messages.error(request, 'Error interno. Intenta nuevamente.')
@@ -349,9 +363,9 @@ def mis_transacciones(request):
 def actualizar_estado_transaccion(request, id_transaccion):
     """Permite actualizar el estado de una transacción."""
     usuario = get_usuario_actual(request)
-    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_destino', 'user_origen'), id=id_transaccion)  # Cambiado: agregado select_related
-    if transaccion.user_destino and transaccion.user_destino.id != usuario.id_usuario:  # Cambiado: 'user_destino'
-        if transaccion.user_origen.id != usuario.id_usuario:  # Cambiado: 'user_origen'
+    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_destino', 'user_origen'), pk=id_transaccion)  # Cambiado: agregado select_related
+    if transaccion.user_destino_id and transaccion.user_destino_id != usuario.id_usuario:
+        if transaccion.user_origen_id != usuario.id_usuario:
             return JsonResponse({'error': 'No autorizado'}, status=403)
     
     if request.method == 'POST':
@@ -359,34 +373,23 @@ def actualizar_estado_transaccion(request, id_transaccion):
         if not nuevo_estado or nuevo_estado not in dict(Transaccion.ESTADO_CHOICES):
             return JsonResponse({'error': 'Estado inválido'}, status=400)
         
-        if transaccion.estado == 'PENDIENTE':
-            if nuevo_estado == 'ACEPTADA':
-                try:
-                    transaccion.prenda.marcar_como_reservada()  # Cambiado: 'prenda'
-                    transaccion.estado = nuevo_estado
-                    transaccion.save()
-                    messages.success(request, 'Has aceptado la propuesta. La prenda ahora está reservada.')
-                except Exception as e:
-                    logger.error(f"Error aceptando transacción {transaccion.id}: {e}")
-                    return JsonResponse({'error': 'Error interno'}, status=500)
-            elif nuevo_estado == 'RECHAZADA':
-                try:
-                    transaccion.estado = nuevo_estado
-                    transaccion.save()
-                    messages.success(request, 'Has rechazado la propuesta. La prenda sigue disponible.')
-                except Exception as e:
-                    logger.error(f"Error rechazando transacción {transaccion.id}: {e}")
-                    return JsonResponse({'error': 'Error interno'}, status=500)
-            else:
-                return JsonResponse({'error': 'Desde PENDIENTE solo puedes aceptar (ACEPTADA) o rechazar (RECHAZADA).'}, status=400)
+        if transaccion.estado == 'PENDIENTE' and nuevo_estado not in ('ACEPTADA', 'RECHAZADA'):
+            return JsonResponse({'error': 'Desde PENDIENTE solo puedes aceptar (ACEPTADA) o rechazar (RECHAZADA).'}, status=400)
+        try:
+            # Aceptar reserva la prenda; rechazar o cancelar la libera (en la misma escritura)
+            transaccion = cambiar_estado(transaccion, nuevo_estado, actor=usuario)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"Error actualizando estado transacción {transaccion.pk}: {e}")
+            return JsonResponse({'error': 'Error interno'}, status=500)
+
+        if nuevo_estado == 'ACEPTADA':
+            messages.success(request, 'Has aceptado la propuesta. La prenda ahora está reservada.')
+        elif nuevo_estado == 'RECHAZADA':
+            messages.success(request, 'Has rechazado la propuesta. La prenda sigue disponible.')
         else:
-            try:
-                transaccion.estado = nuevo_estado
-                transaccion.save()
-                messages.success(request, f'Estado de la transacción actualizado a: {transaccion.get_estado_display()}')
-            except Exception as e:
-                logger.error(f"Error actualizando estado transacción {transaccion.id}: {e}")
-                return JsonResponse({'error': 'Error interno'}, status=500)
+            messages.success(request, f'Estado de la transacción actualizado a: {transaccion.get_estado_display()}')
         
         return redirect('mis_transacciones')
     return JsonResponse({'error': 'Método no permitido'}, status=405)
@@ -395,9 +398,9 @@ def actualizar_estado_transaccion(request, id_transaccion):
 def reportar_disputa(request, id_transaccion):
     """Permite al comprador/receptor reportar un problema con la prenda."""
     usuario = get_usuario_actual(request)
-    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_destino'), id=id_transaccion)  # Cambiado: agregado select_related
+    transaccion = get_object_or_404(Transaccion.objects.select_related('prenda', 'user_destino'), pk=id_transaccion)  # Cambiado: agregado select_related
     
-    if not transaccion.user_destino or transaccion.user_destino.id != usuario.id_usuario:  # Cambiado: 'user_destino'
+    if transaccion.user_destino_id != usuario.id_usuario:
         messages.error(request, 'Solo el receptor puede reportar problemas.')
         return redirect('mis_transacciones')
     
@@ -412,16 +415,19 @@ def reportar_disputa(request, id_transaccion):
             return redirect('mis_transacciones')
         
         try:
-            transaccion.estado = 'EN_DISPUTA'
-            transaccion.en_disputa = True
-            transaccion.razon_disputa = razon.strip()
-            transaccion.reportado_por = usuario
-            transaccion.fecha_disputa = timezone.now()
-            transaccion.save()
+            cambiar_estado(
+                transaccion, 'EN_DISPUTA', actor=usuario,
+                en_disputa=True,
+                razon_disputa=razon.strip(),
+                reportado_por=usuario,
+                fecha_disputa=timezone.now(),
+            )
             messages.success(request, 'Tu reporte ha sido registrado. El equipo de administración revisará la disputa.')
             return redirect('mis_transacciones')
+        except TransicionInvalida as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
-            logger.error(f"Error reportando disputa en transacción {transaccion.id}: {e}")
+            logger.error(f"Error reportando disputa en transacción {transaccion.pk}: {e}")
             messages.error(request, 'Error interno. Intenta nuevamente.')
     
     context = {
@@ -447,12 +453,15 @@ def resolver_disputa(request, id_transaccion):
             return JsonResponse({'error': 'Resolución inválida'}, status=400)
         
         try:
-            transaccion.estado = resolucion
-            transaccion.save()
+            transaccion = cambiar_estado(
+                transaccion, resolucion, desde=('EN_DISPUTA',), actor=get_usuario_actual(request)
+            )
             messages.success(request, f'Disputa resuelta como {transaccion.get_estado_display()}')
             return redirect('admin:index')
+        except TransicionInvalida as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
-            logger.error(f"Error resolviendo disputa en transacción {transaccion.id}: {e}")
+            logger.error(f"Error resolviendo disputa en transacción {transaccion.pk}: {e}")
             return JsonResponse({'error': 'Error interno'}, status=500)
     
     # Obtener mensajes entre los usuarios
@@ -228,6 +228,75 @@ SECURE_REFERRER_POLICY = 'strict-origin-when-cross-origin'  # Sugerencia: Mejora
 # SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 # SECURE_HSTS_PRELOAD = True
 
+# ==============================================================================
+# CONFIGURACIÓN DE DJANGO REST FRAMEWORK
+# ==============================================================================
+
+REST_FRAMEWORK = {
+    # Paginación por cursor en todos los listados de la API
+    'DEFAULT_PAGINATION_CLASS': 'App.api.api_pagination.EcoPrendaCursorPagination',
+    'PAGE_SIZE': 20,
+    # JSON con orjson (respaldo automático al módulo json si no está instalado)
+    'DEFAULT_RENDERER_CLASSES': [
+        'App.api.api_renderers.EcoPrendaJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'App.api.api_renderers.EcoPrendaJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+if os.environ.get('REDIS_URL'):
+    # Producción (varios workers de gunicorn): caché compartida en Redis, así
+    # invalidar una tarjeta o una estadística vale para todos los procesos. Las
+    # lecturas de tarjetas (get_many) son un viaje de red, no una consulta SQL;
+    # Redis expulsa lo menos usado según su maxmemory-policy (render.yaml)
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'ecoprenda',
+        }
+    }
+else:
+    # Sin Redis (desarrollo local, un proceso): caché en memoria. Las tarjetas
+    # de los listados (App/fragmentos.py) ocupan dos entradas por objeto: el
+    # límite por defecto de Django (300) no alcanza
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ecoprenda',
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRADAS', '10000'))},
+        }
+    }
+
+# Segundos que se cachean las estadísticas agregadas de la API (0 = sin caché)
+API_ESTADISTICAS_CACHE_SEGUNDOS = int(os.getenv('API_ESTADISTICAS_CACHE_SEGUNDOS', '60'))
+
+# Segundos que vive una tarjeta cacheada de prenda/campaña/fundación
+FRAGMENTOS_CACHE_SEGUNDOS = int(os.getenv('FRAGMENTOS_CACHE_SEGUNDOS', '600'))
+
+# Tareas en segundo plano (App/tareas.py): hilos del pool y modo en línea
+TAREAS_HILOS = int(os.getenv('TAREAS_HILOS', '2'))
+TAREAS_SINCRONAS = os.getenv('TAREAS_SINCRONAS', 'False') == 'True'
+
+# Subidas de imágenes en segundo plano (App/subidas.py). Sin SUBIDAS_BACKEND se
+# usa Cloudinary si está configurado y, si no, copia local en MEDIA_ROOT
+SUBIDAS_BACKEND = os.getenv('SUBIDAS_BACKEND') or None
+SUBIDAS_DIR = os.getenv('SUBIDAS_DIR', os.path.join(BASE_DIR, 'tmp', 'subidas'))
+SUBIDAS_MAX_INTENTOS = int(os.getenv('SUBIDAS_MAX_INTENTOS', '4'))
+SUBIDAS_TIMEOUT = int(os.getenv('SUBIDAS_TIMEOUT', '60'))
+
+# Bandeja de salida de transacciones (App/eventos.py): reintentos por evento
+# antes de dejarlo para revisión manual (`manage.py despachar_eventos`)
+EVENTOS_MAX_INTENTOS = int(os.getenv('EVENTOS_MAX_INTENTOS', '5'))
+
+# Transacciones terminadas hace más de estos meses pasan al archivo
+# (App/archivo.py, `manage.py archivar_transacciones`)
+ARCHIVO_MESES = int(os.getenv('ARCHIVO_MESES', '12'))
+
 # ==============================================================================
 # CONFIGURACIÓN DE LOGGING
 # ==============================================================================
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Mide el ahorro de la caché de tarjetas (fragmentos.py) en /prendas/,
+/campanas-solidarias y /fundaciones/.
+
+Crea una base de datos de prueba temporal, la llena con datos sintéticos y
+compara cada página con la caché vacía (todas las tarjetas se renderizan)
+contra la caché caliente (solo se leen los sellos y los fragmentos).
+
+Ejecución: python benchmark_fragmentos.py [prendas] [repeticiones]
+Con REDIS_URL definida mide la caché de producción (Redis); sin ella, la
+caché en memoria del proceso.
+"""
+
+import os
+import sys
+import time
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto.settings')
+django.setup()
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+
+from App.contadores import reconciliar_prendas_donadas
+from App.models import CampanaFundacion, Fundacion, Prenda, TipoTransaccion, Transaccion, Usuario
+
+
+def sembrar(prendas):
+    usuario = Usuario.objects.create(nombre='Benchmark', correo='bench@ecoprenda.cl', contrasena='x')
+    fundaciones = Fundacion.objects.bulk_create(
+        Fundacion(nombre=f'Fundación {i}', direccion=f'Calle {i}', telefono='+56 9 1234 5678',
+                  correo_contacto=f'f{i}@ecoprenda.cl')
+        for i in range(max(5, prendas // 20))
+    )
+    campanas = [
+        CampanaFundacion.objects.create(
+            fundacion=fundaciones[i % len(fundaciones)], nombre=f'Campaña {i}',
+            descripcion='Recolección de ropa de invierno ' * 5, objetivo_prendas=50,
+            categorias_solicitadas='Chaqueta,Pantalón',
+        )
+        for i in range(max(5, prendas // 10))
+    ]
+    creadas = Prenda.objects.bulk_create(
+        Prenda(user=usuario, nombre=f'Prenda {i}', descripcion='Prenda en buen estado, poco uso ' * 3,
+               categoria=('Camiseta', 'Pantalón', 'Chaqueta')[i % 3], talla=('S', 'M', 'L')[i % 3])
+        for i in range(prendas)
+    )
+    donacion, _ = TipoTransaccion.objects.get_or_create(nombre_tipo='Donación')
+    Transaccion.objects.bulk_create(
+        Transaccion(prenda=prenda, tipo=donacion, user_origen=usuario, estado='COMPLETADA',
+                    campana=campanas[i % len(campanas)], fundacion=campanas[i % len(campanas)].fundacion)
+        for i, prenda in enumerate(creadas[: prendas // 4])
+    )
+    reconciliar_prendas_donadas()  # bulk_create no pasa por los eventos
+    return usuario
+
+
+def medir(cliente, url, repeticiones, vaciar):
+    tiempos, consultas = [], 0
+    for _ in range(repeticiones):
+        if vaciar:
+            cache.clear()
+        with CaptureQueriesContext(connection) as contexto:
+            inicio = time.perf_counter()
+            respuesta = cliente.get(url)
+            tiempos.append(time.perf_counter() - inicio)
+        assert respuesta.status_code == 200, (url, respuesta.status_code)
+        consultas = len(contexto.captured_queries)
+    return min(tiempos), consultas
+
+
+def main():
+    prendas = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    setup_test_environment()
+    nombre_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        usuario = sembrar(prendas)
+        cliente = Client()
+        sesion = cliente.session
+        sesion['id_usuario'] = usuario.id_usuario
+        sesion.save()
+
+        print(f'Tarjetas cacheadas: {prendas} prendas sembradas, mejor de {repeticiones}')
+        for url in ('/prendas/', '/campanas-solidarias', '/fundaciones/'):
+            frio, consultas_frio = medir(cliente, url, repeticiones, vaciar=True)
+            cliente.get(url)
+            caliente, consultas_caliente = medir(cliente, url, repeticiones, vaciar=False)
+            print(f'  {url:<22} sin caché {frio * 1000:8.1f} ms ({consultas_frio:3} consultas)'
+                  f' | con caché {caliente * 1000:8.1f} ms ({consultas_caliente:3} consultas)'
+                  f' | {frio / caliente:5.1f}x')
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
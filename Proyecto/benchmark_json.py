@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Microbenchmark de serialización JSON de la API.
+Compara el JSONRenderer de DRF (módulo json) con EcoPrendaJSONRenderer (orjson)
+sobre listados con la forma de /api/transacciones/por_tipo/ y
+/api/fundaciones/{id}/donaciones/, incluyendo campos Decimal.
+
+Ejecución: python benchmark_json.py [filas] [repeticiones]
+"""
+
+import io
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto.settings')
+django.setup()
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from App.api import api_renderers
+from App.api.api_renderers import EcoPrendaJSONRenderer, EcoPrendaJSONParser
+
+
+def generar_transacciones(filas):
+    """Filas con la forma de TransaccionSerializer (prenda anidada, Decimal sin convertir)."""
+    fecha = datetime(2025, 1, 1, tzinfo=timezone.utc).isoformat()
+    return [
+        {
+            'id_transaccion': i,
+            'prenda': {
+                'id_prenda': i,
+                'nombre': f'Prenda {i}',
+                'categoria': 'Camiseta',
+                'talla': 'M',
+                'estado': 'DONADA',
+            },
+            'tipo': 1,
+            'tipo_nombre': 'Donación',
+            'user_origen': i,
+            'usuario_origen_nombre': f'Usuario {i}',
+            'user_destino': None,
+            'usuario_destino_nombre': None,
+            'fundacion': 1,
+            'fundacion_nombre': 'Fundación Ñuñoa',
+            'campana': 1,
+            'campana_nombre': 'Invierno solidario',
+            'fecha_transaccion': fecha,
+            'estado': 'COMPLETADA',
+            'costo_envio': Decimal('2990.00'),
+            'carbono_evitar_kg': Decimal('5.50'),
+        }
+        for i in range(filas)
+    ]
+
+
+def medir(nombre, funcion, repeticiones):
+    segundos = min(timeit.repeat(funcion, number=repeticiones, repeat=3)) / repeticiones
+    print(f'  {nombre:<34} {segundos * 1000:8.3f} ms')
+    return segundos
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    datos = generar_transacciones(filas)
+
+    drf = JSONRenderer()
+    rapido = EcoPrendaJSONRenderer()
+    cuerpo = rapido.render(datos)
+    parser = EcoPrendaJSONParser()
+
+    print(f'Serialización de {filas} transacciones ({len(cuerpo) / 1024:.0f} KiB), '
+          f'orjson {"disponible" if api_renderers.orjson else "NO instalado"}')
+    base = medir('DRF JSONRenderer (json)', lambda: drf.render(datos), repeticiones)
+    nuevo = medir('EcoPrendaJSONRenderer', lambda: rapido.render(datos), repeticiones)
+    print(f'  {"aceleración":<34} {base / nuevo:8.1f}x')
+
+    print('Lectura del mismo cuerpo')
+    base = medir('DRF JSONParser (json)', lambda: JSONParser().parse(io.BytesIO(cuerpo)), repeticiones)
+    nuevo = medir('EcoPrendaJSONParser', lambda: parser.parse(io.BytesIO(cuerpo)), repeticiones)
+    print(f'  {"aceleración":<34} {base / nuevo:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()